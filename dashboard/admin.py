@@ -1,8 +1,98 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib import admin
-from .models import Product, SalesData
+from django.core.cache import cache
+
+from .models import Product, SalesData, DailySalesArchive, ExportJob, ChangeLog, ChangeCursor
+from .pagination import EstimatedCountPaginator
+from .search import search_product_ids
+from . import versioning
 
 # Register your models here.
 
+
+# ============================================================================
+# LARGE-TABLE MODE
+# ============================================================================
+
+class CachedDatesMixin:
+    """
+    QuerySet mixin whose dates() results are cached until sales data changes.
+
+    The admin's date hierarchy asks for the distinct years, months or days
+    of the current list (a DISTINCT over the whole filtered table); the
+    buckets only change when sales do, so they are cached per query and
+    sales data version.
+    """
+    
+    def dates(self, field_name, kind, order='ASC'):
+        sql, params = self.query.sql_with_params()
+        version = versioning.current(versioning.SALES)[0]
+        digest = hashlib.sha1(repr((sql, params, field_name, kind, order)).encode('utf-8')).hexdigest()
+        key = f'admin-dates:{self.model._meta.label_lower}:{digest}:{version}'
+        
+        compute = super().dates
+        return cache.get_or_set(
+            key, lambda: list(compute(field_name, kind, order)),
+            getattr(settings, 'ADMIN_DATE_HIERARCHY_CACHE_SECONDS', 3600),
+        )
+
+
+_cached_dates_classes = {}
+
+
+def with_cached_dates(qs):
+    """
+    qs with CachedDatesMixin on top of its own class, so the model's
+    QuerySet behaviour (e.g. ChangeLoggedQuerySet.update() reaching the
+    change feed for admin actions) is kept.
+    """
+    base = qs.__class__
+    if base not in _cached_dates_classes:
+        _cached_dates_classes[base] = type(f'CachedDates{base.__name__}', (CachedDatesMixin, base), {})
+    return _cached_dates_classes[base](model=qs.model, query=qs.query, using=qs._db, hints=qs._hints)
+
+
+class ProductCategoryFilter(admin.SimpleListFilter):
+    """
+    Category filter whose choices come from the (small, indexed) product
+    table, instead of a DISTINCT over every sale joined to its product.
+    """
+    title = 'category'
+    parameter_name = 'category'
+    
+    def lookups(self, request, model_admin):
+        categories = Product.objects.order_by('category').values_list('category', flat=True).distinct()
+        return [(category, category.title()) for category in categories]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            product_ids = Product.objects.filter(category=self.value()).values_list('pk', flat=True)
+            return queryset.filter(product_id__in=list(product_ids))
+        return queryset
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables with millions of rows: estimated page
+    counts, no second unfiltered COUNT, products joined into the list
+    query, product search through the full-text index and cached date
+    hierarchy buckets.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_select_related = ['product']
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return with_cached_dates(qs)
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(product_id__in=search_product_ids(search_term)), False
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'price', 'cost']
@@ -11,8 +101,42 @@ class ProductAdmin(admin.ModelAdmin):
 
 
 @admin.register(SalesData)
-class SalesDataAdmin(admin.ModelAdmin):
+class SalesDataAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['product', 'date', 'quantity', 'revenue', 'profit']
-    list_filter = ['date', 'product__category']
+    list_filter = ['date', ProductCategoryFilter]
     search_fields = ['product__name']
     date_hierarchy = 'date'
+
+
+@admin.register(DailySalesArchive)
+class DailySalesArchiveAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['product', 'date', 'transactions', 'quantity', 'revenue', 'profit']
+    list_filter = [ProductCategoryFilter]
+    search_fields = ['product__name']
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'format', 'status', 'user', 'data_version', 'total_rows', 'created_at', 'finished_at']
+    list_filter = ['status', 'format']
+    readonly_fields = ['file_path', 'error', 'started_at', 'finished_at']
+
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_display = ['seq', 'entity', 'object_id', 'op', 'changed_at']
+    list_filter = ['entity', 'op']
+    readonly_fields = ['seq', 'entity', 'object_id', 'op', 'data', 'changed_at']
+    
+    def has_add_permission(self, request):
+        return False  # append-only; written by the application
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ChangeCursor)
+class ChangeCursorAdmin(admin.ModelAdmin):
+    list_display = ['name', 'position', 'updated_at']
@@ -0,0 +1,194 @@
+"""
+Vectorized Anomaly Detection
+
+Builds a product x day revenue matrix (hot and archived sales, zero for
+days without sales) and scores every cell at once with NumPy sliding
+windows instead of looping over products and days:
+
+* rolling z-score: how far a day is from the mean of the `window` days
+  before it, in standard deviations of those days,
+* seasonal residual: how far a day is from the mean of the same weekday
+  over the `window // SEASON` weeks before it, in the same units.
+
+A day is an anomaly when both scores pass the threshold, so ordinary
+weekday patterns do not trigger alerts.  Positive scores are spikes,
+negative scores drops.
+
+The matrix and the rolling windows over it grow with the number of days,
+so a scan covers at most ANOMALY_MAX_DAYS days.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from django.conf import settings
+from django.db.models import Sum
+
+from .models import Product, SalesData, DailySalesArchive
+
+
+SEASON = 7             # weekly seasonality
+DEFAULT_WINDOW = 28    # days of history behind every score
+DEFAULT_THRESHOLD = 3.0
+DEFAULT_DAYS = 30
+DEFAULT_MAX_DAYS = 366
+
+# Windows with almost no variation would turn tiny changes into huge
+# scores, so the deviation is never taken below this share of the mean.
+MIN_RELATIVE_STD = 0.05
+
+
+def max_days():
+    return getattr(settings, 'ANOMALY_MAX_DAYS', DEFAULT_MAX_DAYS)
+
+
+def daily_revenue_matrix(start, end, product_ids=None):
+    """
+    Revenue per product per day from start to end (inclusive).
+
+    Returns (products, days, matrix) where products is a list of Product
+    rows, days a list of dates and matrix a (products x days) float array.
+    One GROUP BY per storage tier.
+    """
+    products = Product.objects.order_by('name')
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    products = list(products)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+    matrix = np.zeros((len(products), len(days)))
+    row_of = {p.pk: i for i, p in enumerate(products)}
+
+    for model in (SalesData, DailySalesArchive):
+        qs = model.objects.filter(date__gte=start, date__lte=end)
+        if product_ids is not None:
+            qs = qs.filter(product_id__in=product_ids)
+
+        rows = list(qs.order_by().values_list('product_id', 'date').annotate(total=Sum('revenue')))
+        if not rows:
+            continue
+
+        # Products created after the Product query are not in the matrix
+        rows = [row for row in rows if row[0] in row_of]
+        if not rows:
+            continue
+
+        product_id, day, total = zip(*rows)
+        r = np.array([row_of[p] for p in product_id])
+        c = np.array([(d - start).days for d in day])
+        np.add.at(matrix, (r, c), np.array(total, dtype=float))
+
+    return products, days, matrix
+
+
+def _scale(std, mean):
+    return np.maximum(std, np.abs(mean) * MIN_RELATIVE_STD)
+
+
+def rolling_zscores(matrix, window=DEFAULT_WINDOW):
+    """
+    Z-score of every cell against the `window` cells before it in its row.
+
+    Returns (scores, means, stds), each shaped like matrix; the first
+    `window` columns have no history and are NaN.
+    """
+    Y = np.atleast_2d(np.asarray(matrix, dtype=float))
+    scores = np.full(Y.shape, np.nan)
+    means = np.full(Y.shape, np.nan)
+    stds = np.full(Y.shape, np.nan)
+    if Y.shape[1] <= window:
+        return scores, means, stds
+
+    # windows[:, t] covers columns t .. t + window - 1, the history of t + window
+    windows = sliding_window_view(Y, window, axis=1)[:, :-1]
+    mean = windows.mean(axis=2)
+    std = _scale(windows.std(axis=2), mean)
+
+    current = Y[:, window:]
+    means[:, window:] = mean
+    stds[:, window:] = std
+    scores[:, window:] = np.divide(current - mean, std, out=np.zeros_like(mean), where=std > 0)
+    return scores, means, stds
+
+
+def seasonal_residuals(matrix, window=DEFAULT_WINDOW, season=SEASON):
+    """
+    Residual of every cell against the mean of the same position in the
+    previous `window // season` seasons, divided by the rolling deviation
+    of the `window` cells before it.
+
+    Returns (scores, expected) shaped like matrix; columns without enough
+    history are NaN.
+    """
+    Y = np.atleast_2d(np.asarray(matrix, dtype=float))
+    span = max(window // season, 1) * season
+    scores = np.full(Y.shape, np.nan)
+    expected = np.full(Y.shape, np.nan)
+    if Y.shape[1] <= span:
+        return scores, expected
+
+    # Every season-th cell of the span before t is the same weekday as t
+    same_weekday = sliding_window_view(Y, span, axis=1)[:, :-1, ::season]
+    baseline = same_weekday.mean(axis=2)
+
+    history = sliding_window_view(Y, span, axis=1)[:, :-1]
+    std = _scale(history.std(axis=2), history.mean(axis=2))
+
+    residual = Y[:, span:] - baseline
+    expected[:, span:] = baseline
+    scores[:, span:] = np.divide(residual, std, out=np.zeros_like(residual), where=std > 0)
+    return scores, expected
+
+
+def detect_anomalies(start=None, end=None, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD,
+                     product_ids=None):
+    """
+    Anomalous product days from start to end (default: the last
+    DEFAULT_DAYS days), most extreme first.
+
+    History before start is loaded so that the first days of the range
+    are scored too.  Each anomaly is a dict with product, category, date,
+    revenue, expected, seasonal_expected, zscore, seasonal_score and kind
+    ('spike' or 'drop').
+    """
+    end = end or date.today()
+    start = start or end - timedelta(days=DEFAULT_DAYS - 1)
+    span = max(window, max(window // SEASON, 1) * SEASON)
+
+    try:
+        history_start = start - timedelta(days=span)
+    except OverflowError:
+        history_start = date.min   # ranges starting in year 1 have less history
+    products, days, matrix = daily_revenue_matrix(history_start, end, product_ids)
+    if not products:
+        return []
+
+    zscores, means, _ = rolling_zscores(matrix, window)
+    seasonal, seasonal_expected = seasonal_residuals(matrix, window)
+
+    flagged = (
+        (np.abs(np.nan_to_num(zscores)) >= threshold)
+        & (np.abs(np.nan_to_num(seasonal)) >= threshold)
+        & (np.sign(zscores) == np.sign(seasonal))
+    )
+    flagged[:, :span] = False
+
+    rows, cols = np.nonzero(flagged)
+    order = np.argsort(-np.abs(zscores[rows, cols]), kind='stable')
+
+    anomalies = []
+    for i in order:
+        r, c = rows[i], cols[i]
+        anomalies.append({
+            'product': products[r].name,
+            'category': products[r].category,
+            'date': days[c],
+            'revenue': float(matrix[r, c]),
+            'expected': float(means[r, c]),
+            'seasonal_expected': float(seasonal_expected[r, c]),
+            'zscore': float(zscores[r, c]),
+            'seasonal_score': float(seasonal[r, c]),
+            'kind': 'spike' if zscores[r, c] > 0 else 'drop',
+        })
+    return anomalies
@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def reinstall_search_index(sender, using, **kwargs):
+    """Re-create FTS triggers that a table rebuild may have dropped"""
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from .search import install_search_index
+
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('dashboard', '0005_product_search_index') in applied:
+        install_search_index(connection)
 
 
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects model signal handlers)
+        post_migrate.connect(reinstall_search_index, sender=self)
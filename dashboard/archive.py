@@ -0,0 +1,149 @@
+"""
+Hot/Cold Storage for Sales Data
+
+Recent transactions stay in SalesData (hot, full detail).  Old transactions
+are compacted into DailySalesArchive (cold, one row per product per day) so
+the hot table stays small.  Totals are kept exact: quantity, revenue, cost,
+profit and the number of transactions are summed into the archive row.
+
+The helpers below combine both tables so reports keep showing all-time
+figures after an archive run.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum, Count, Value, DecimalField, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import SalesData, DailySalesArchive
+from . import versioning, changelog
+
+
+TOTAL_FIELDS = ['quantity', 'revenue', 'cost', 'profit']
+ROLLUP_FIELDS = ['total_quantity', 'total_revenue', 'total_cost', 'total_profit', 'total_transactions']
+BATCH_SIZE = 1000
+
+
+def _chunks(ids):
+    for i in range(0, len(ids), BATCH_SIZE):
+        yield ids[i:i + BATCH_SIZE]
+
+
+def compact_sales(cutoff):
+    """
+    Move every SalesData row dated before ``cutoff`` into the archive.
+
+    Rows are grouped per product per day and merged into any archive row
+    that already exists for that day.  Returns (rows_archived, days_written).
+    """
+    with transaction.atomic():
+        # Capture the rows once and roll up and delete exactly those: a
+        # second date__lt=cutoff filter would also catch rows committed in
+        # between (READ COMMITTED) and delete them without archiving them.
+        ids = list(
+            SalesData.objects.filter(date__lt=cutoff).order_by('id').values_list('id', flat=True)
+        )
+        if not ids:
+            return 0, 0
+
+        merged = {}
+        for chunk in _chunks(ids):
+            for row in (
+                SalesData.objects.filter(pk__in=chunk).order_by().values('product_id', 'date').annotate(
+                    total_quantity=Sum('quantity'),
+                    total_revenue=Sum('revenue'),
+                    total_cost=Sum('cost'),
+                    total_profit=Sum('profit'),
+                    total_transactions=Count('id'),
+                )
+            ):
+                key = (row['product_id'], row['date'])
+                if key in merged:
+                    for field in ROLLUP_FIELDS:
+                        merged[key][field] += row[field]
+                else:
+                    merged[key] = row
+        rollup = list(merged.values())
+
+        first_day = min(row['date'] for row in rollup)
+        existing = {
+            (a.product_id, a.date): a
+            for a in DailySalesArchive.objects.filter(date__gte=first_day, date__lt=cutoff)
+        }
+
+        to_create = []
+        to_update = []
+        for row in rollup:
+            archived = existing.get((row['product_id'], row['date']))
+            if archived is None:
+                archived = DailySalesArchive(product_id=row['product_id'], date=row['date'])
+                to_create.append(archived)
+            else:
+                to_update.append(archived)
+
+            archived.quantity += row['total_quantity']
+            archived.revenue += row['total_revenue']
+            archived.cost += row['total_cost']
+            archived.profit += row['total_profit']
+            archived.transactions += row['total_transactions']
+
+        DailySalesArchive.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        DailySalesArchive.objects.bulk_update(
+            to_update, TOTAL_FIELDS + ['transactions'], batch_size=BATCH_SIZE
+        )
+
+        archived_rows = sum(row['total_transactions'] for row in rollup)
+        with changelog.deleting_as('archive'):
+            for chunk in _chunks(ids):
+                SalesData.objects.filter(pk__in=chunk).delete()
+        versioning.bump(versioning.SALES)
+
+    return archived_rows, len(rollup)
+
+
+def period_totals(start=None, end=None, product_name=None):
+    """
+    Return summed quantity, revenue, cost, profit and transaction count for
+    hot and archived sales together, optionally limited by date and product.
+    """
+    hot = SalesData.objects.all()
+    cold = DailySalesArchive.objects.all()
+    if start:
+        hot, cold = hot.filter(date__gte=start), cold.filter(date__gte=start)
+    if end:
+        hot, cold = hot.filter(date__lte=end), cold.filter(date__lte=end)
+    if product_name:
+        hot = hot.filter(product__name__iexact=product_name)
+        cold = cold.filter(product__name__iexact=product_name)
+
+    sums = {field: Sum(field) for field in TOTAL_FIELDS}
+    hot_totals = hot.aggregate(transactions=Count('id'), **sums)
+    cold_totals = cold.aggregate(transactions=Sum('transactions'), **sums)
+
+    return {
+        field: (hot_totals[field] or 0) + (cold_totals[field] or 0)
+        for field in TOTAL_FIELDS + ['transactions']
+    }
+
+
+def annotate_product_totals(queryset):
+    """
+    Annotate a Product queryset with ``total_sales`` and ``units_sold``
+    summed over hot and archived sales.
+    """
+    archived = DailySalesArchive.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    archived_revenue = archived.annotate(total=Sum('revenue')).values('total')
+    archived_units = archived.annotate(total=Sum('quantity')).values('total')
+
+    money = DecimalField(max_digits=14, decimal_places=2)
+    return queryset.annotate(
+        total_sales=(
+            Coalesce(Sum('sales__revenue'), Value(Decimal('0')), output_field=money)
+            + Coalesce(Subquery(archived_revenue), Value(Decimal('0')), output_field=money)
+        ),
+        units_sold=(
+            Coalesce(Sum('sales__quantity'), Value(0), output_field=IntegerField())
+            + Coalesce(Subquery(archived_units), Value(0), output_field=IntegerField())
+        ),
+    )
@@ -0,0 +1,47 @@
+"""
+Cached User Lookup
+
+AuthenticationMiddleware loads request.user on every request.  With the
+default ModelBackend that is one User query per page, on top of the
+session query.  CachedModelBackend keeps users in the USER_CACHE_ALIAS
+cache for USER_CACHE_TIMEOUT seconds instead.
+
+Cached entries are removed whenever a User is saved or deleted (see
+signals.py), so password changes, deactivation and staff changes apply
+on the next request.  The session auth hash check still runs against the
+cached user, so a password change also ends other sessions as usual.
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_CACHE_ALIAS', 'default')]
+
+
+def user_cache_key(user_id):
+    return f'dashboard:auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    """Drop a user from the cache"""
+    _cache().delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() is served from the cache"""
+
+    def get_user(self, user_id):
+        cache = _cache()
+        key = user_cache_key(user_id)
+
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,195 @@
+"""
+Forecast Backtesting
+
+Replays history with a rolling forecast origin: for every period t after
+an initial training window, each model is fitted on the periods before t
+and its 1..horizon step forecasts are compared with what actually
+happened.  Errors are reported per horizon step and per product as
+
+- MAE:  mean absolute error
+- MAPE: mean absolute percentage error (periods without sales skipped)
+- RMSE: root mean squared error
+
+Every (product, model) replay is an independent partition for
+ParallelReportRunner (parallel.backtest_series), so long histories and
+large catalogs are spread over a process pool.  The total of all
+products, the series PredictionReport forecasts, is backtested alongside
+the products but kept out of the pooled per-horizon figures.
+
+A replay refits every model once per origin, so its cost grows with the
+number of periods: ranges over BACKTEST_MAX_PERIODS are refused.  Results
+are kept in the BACKTEST_CACHE_ALIAS cache per data version.  The eval
+page only reads that cache; on a miss it starts the replay on a background
+thread (BACKTEST_RUN_IN_PROCESS) and `manage.py backtest_forecasts` fills
+the same cache from outside the web process.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, connection
+
+from .models import Product, SalesData, DailySalesArchive
+from .parallel import ParallelReportRunner, backtest_series
+
+
+DEFAULT_HORIZON = 3
+MAX_HORIZON = 12
+DEFAULT_MAX_PERIODS = 400
+TOTAL_KEY = 'All products'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _sale_date(order):
+    dates = [
+        model.objects.order_by(order).values_list('date', flat=True).first()
+        for model in (SalesData, DailySalesArchive)
+    ]
+    return [d for d in dates if d]
+
+
+def first_sale_date():
+    """Date of the earliest hot or archived sale, or None"""
+    dates = _sale_date('date')
+    return min(dates) if dates else None
+
+
+def last_sale_date():
+    """Date of the latest hot or archived sale, or None"""
+    dates = _sale_date('-date')
+    return max(dates) if dates else None
+
+
+def max_periods():
+    return getattr(settings, 'BACKTEST_MAX_PERIODS', DEFAULT_MAX_PERIODS)
+
+
+def result_cache():
+    return caches[getattr(settings, 'BACKTEST_CACHE_ALIAS', 'default')]
+
+
+def cache_timeout():
+    return getattr(settings, 'BACKTEST_CACHE_SECONDS', 3600)
+
+
+def submit(report):
+    """
+    Replay report on the background thread, unless the same replay is
+    already running.  Returns True if it was started.
+    """
+    running_key = report.cache_key() + ':running'
+    if not result_cache().add(running_key, True, cache_timeout()):
+        return False
+
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='backtest')
+    _pool.submit(_run_in_thread, report, running_key)
+    return True
+
+
+def _run_in_thread(report, running_key):
+    close_old_connections()
+    try:
+        report.process_data()
+    finally:
+        result_cache().delete(running_key)
+        connection.close()
+
+
+def revenue_series_by_product(granularity, start, end):
+    """
+    Zero-filled revenue per period for every product, plus TOTAL_KEY.
+
+    Returns (periods, {name: values}).
+    """
+    from .periods import periods_in_range, revenue_by_period
+
+    periods = periods_in_range(granularity, start, end)
+    totals = revenue_by_period(granularity, start, end, by_product=True)
+
+    series = {
+        name: [float(totals.get((product_id, p), 0)) for p in periods]
+        for product_id, name in Product.objects.order_by('name').values_list('id', 'name')
+    }
+    series[TOTAL_KEY] = np.sum(list(series.values()), axis=0).tolist() if series else [0.0] * len(periods)
+    return periods, series
+
+
+def default_min_train(n_periods, season):
+    """Initial training window: one season, but at most half the history"""
+    return max(2, min(season, n_periods // 2))
+
+
+def error_metrics(abs_error, squared_error, percent_error, count, percent_count):
+    """MAE, RMSE and MAPE (percent) from error sums; None where nothing was measured"""
+    return {
+        'mae': abs_error / count if count else None,
+        'rmse': float(np.sqrt(squared_error / count)) if count else None,
+        'mape': percent_error / percent_count * 100 if percent_count else None,
+        'forecasts': int(count),
+    }
+
+
+def _pooled(results):
+    """Error sums of several backtest_series results added per horizon step"""
+    return {
+        field: np.sum([r[field] for r in results], axis=0)
+        for field in ('abs_error', 'squared_error', 'percent_error', 'count', 'percent_count')
+    }
+
+
+def _metrics(sums, step=None):
+    pick = (lambda v: v[step]) if step is not None else (lambda v: v.sum())
+    return error_metrics(*(float(pick(np.asarray(sums[f]))) for f in (
+        'abs_error', 'squared_error', 'percent_error', 'count', 'percent_count',
+    )))
+
+
+def run_backtest(series, models, season, horizon=DEFAULT_HORIZON, min_train=None, runner=None):
+    """
+    Backtest every model on every series.
+
+    Returns {
+        'by_horizon': {model: [metrics for step 1..horizon, pooled over products]},
+        'overall':    {model: metrics pooled over products and steps},
+        'by_product': {model: {series key: metrics over all steps, with 'steps'}},
+        'n_periods', 'min_train', 'horizon': the replay's dimensions,
+    }
+    """
+    n_periods = len(next(iter(series.values()), []))
+    if min_train is None:
+        min_train = default_min_train(n_periods, season)
+
+    partitions = [
+        (key, model, values, season, horizon, min_train)
+        for model in models
+        for key, values in series.items()
+    ]
+    runner = runner or ParallelReportRunner()
+    results = runner.map(backtest_series, partitions)
+
+    report = {
+        'by_horizon': {}, 'overall': {}, 'by_product': {},
+        'n_periods': n_periods, 'min_train': min_train, 'horizon': horizon,
+    }
+    for model in models:
+        model_results = [r for r in results if r['model'] == model]
+        products = [r for r in model_results if r['key'] != TOTAL_KEY]
+        pooled = _pooled(products) if products else _pooled(model_results)
+
+        report['by_horizon'][model] = [
+            dict(_metrics(pooled, step), horizon=step + 1) for step in range(horizon)
+        ]
+        report['overall'][model] = _metrics(pooled)
+        report['by_product'][model] = {
+            r['key']: dict(_metrics(r), steps=[_metrics(r, step) for step in range(horizon)])
+            for r in model_results
+        }
+    return report
@@ -0,0 +1,175 @@
+"""
+Server-Side Chart Rendering (Matplotlib)
+
+Renders the dashboard charts to PNG or SVG for emailed reports and PDF
+exports.  Three things keep this cheap and safe under load:
+
+- Disk cache: images are stored under CHART_CACHE_DIR, keyed by chart
+  name, format, parameters and the current data version, so a chart is
+  only drawn again after the data changes.
+- Bounded pool: drawing runs in a small thread pool (CHART_RENDER_WORKERS).
+  At most CHART_MAX_PENDING renders may be queued; beyond that callers get
+  ChartBusy instead of tying up a request thread waiting.
+- Data stays in the request: series are computed from the database in the
+  calling thread, and workers only receive plain lists to draw.
+
+Figures are built with the object-oriented API (Figure + Agg canvas), not
+pyplot, because pyplot's global state is not thread-safe.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+CHARTS = ('trend', 'distribution', 'market')
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+class ChartBusy(Exception):
+    """Raised when the render pool is saturated or a render times out"""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def _get_pool():
+    """Create the shared render pool on first use"""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, 'CHART_RENDER_WORKERS', 2)
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chart-render')
+            _slots = threading.BoundedSemaphore(getattr(settings, 'CHART_MAX_PENDING', 8))
+    return _pool, _slots
+
+
+def cache_dir():
+    path = Path(getattr(settings, 'CHART_CACHE_DIR', Path(tempfile.gettempdir()) / 'dashboard-charts'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def cache_path(chart, fmt, params, version):
+    """
+    Disk location for a rendered chart.
+
+    The name is <chart>-<params digest>-<data version>.<fmt>, so older
+    versions of the same chart can be found and removed.
+    """
+    key = '|'.join([f'{k}={params[k]}' for k in sorted(params)])
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return cache_dir() / f'{chart}-{digest}-{version}.{fmt}'
+
+
+def _remove_stale(path):
+    """Delete cached renders of the same chart made for older data versions"""
+    chart_prefix = path.name.rsplit('-', 1)[0]
+    for old in path.parent.glob(f'{chart_prefix}-*{path.suffix}'):
+        if old != path:
+            try:
+                old.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# ============================================================================
+# DRAWING (runs in the pool; receives plain lists only)
+# ============================================================================
+
+def _draw_trend(fig, data):
+    ax = fig.add_subplot()
+    ax.plot(data['labels'], data['values'], color='#14b8a6', marker='o', linewidth=2)
+    ax.fill_between(range(len(data['values'])), data['values'], color='#14b8a6', alpha=0.15)
+    ax.set_title(data.get('title', 'Monthly Sales Trend'))
+    ax.set_ylabel('Revenue (₱)')
+    ax.grid(axis='y', alpha=0.3)
+
+
+def _draw_distribution(fig, data):
+    ax = fig.add_subplot()
+    ax.bar(range(len(data['values'])), data['values'], color='#00C2A2')
+    ax.set_xticks(range(len(data['labels'])))
+    ax.set_xticklabels(data['labels'], rotation=45, ha='right', fontsize=7)
+    ax.set_title(data.get('title', 'Sales Distribution'))
+    ax.set_ylabel('Transactions')
+    ax.grid(axis='y', alpha=0.3)
+
+
+def _draw_market(fig, data):
+    ax = fig.add_subplot()
+    if data['values']:
+        wedges, _, _ = ax.pie(
+            data['values'], colors=data['colors'], startangle=90,
+            autopct=lambda pct: f'{pct:.1f}%' if pct >= 3 else '',
+            pctdistance=0.8, wedgeprops={'width': 0.4},
+        )
+        ax.legend(wedges, data['labels'], loc='center left', bbox_to_anchor=(1, 0.5), frameon=False)
+    ax.set_title(data.get('title', 'Market Share by Revenue'))
+    ax.axis('equal')
+
+
+DRAWERS = {
+    'trend': _draw_trend,
+    'distribution': _draw_distribution,
+    'market': _draw_market,
+}
+
+
+def draw(chart, fmt, data, path):
+    """Render one chart to bytes and store it atomically at path"""
+    fig = Figure(figsize=(8, 4.5), dpi=100)
+    FigureCanvasAgg(fig)
+    DRAWERS[chart](fig, data)
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format=fmt)
+    content = buffer.getvalue()
+
+    # Write to a temp file and rename, so readers never see a partial image
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as handle:
+        handle.write(content)
+    os.replace(tmp_path, path)
+    _remove_stale(path)
+
+    return content
+
+
+def render(chart, fmt, data, path):
+    """
+    Draw a chart in the bounded pool and return its bytes.
+
+    Raises ChartBusy if too many renders are already pending or the render
+    does not finish within CHART_RENDER_TIMEOUT seconds.
+    """
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise ChartBusy('Too many charts are being rendered')
+
+    try:
+        future = pool.submit(draw, chart, fmt, data, path)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda f: slots.release())
+
+    try:
+        return future.result(timeout=getattr(settings, 'CHART_RENDER_TIMEOUT', 10))
+    except FutureTimeout:
+        raise ChartBusy('Chart rendering timed out')
@@ -0,0 +1,224 @@
+"""
+Background Exports
+
+Full CSV/JSON exports are written to files by a background worker instead
+of inside the web request.  The flow is:
+
+1. request_export() creates an ExportJob - or returns the user's existing
+   one when an export of the same format is already finished (or in
+   progress) for the current data version, so unchanged data is never
+   exported twice.  Jobs left pending or running for longer than
+   EXPORT_JOB_TIMEOUT (a crash, a restart of the in-process pool) are
+   marked failed and requested again.
+2. A worker claims the job, streams SalesData to a file under EXPORT_DIR
+   and records progress as it goes.
+3. The user follows the job on its status page and downloads the file.
+4. Every finished export prunes files older than EXPORT_MAX_AGE, so old
+   data versions do not pile up; their jobs then 404 on download and are
+   regenerated when requested again.
+
+Jobs run either on an in-process thread pool (EXPORT_RUN_IN_PROCESS, the
+default for local use) or in a separate `process_exports` worker.
+"""
+
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ExportJob, SalesData
+from . import versioning
+
+
+CSV_HEADER = ['ID', 'Date', 'Product', 'Category', 'Quantity', 'Revenue', 'Cost', 'Profit']
+CHUNK_SIZE = 2000
+DEFAULT_JOB_TIMEOUT = 1800
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def export_dir():
+    path = Path(getattr(settings, 'EXPORT_DIR', Path(tempfile.gettempdir()) / 'dashboard-exports'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def prune(max_age=None):
+    """Delete export files (and leftover temp files) not written for max_age seconds"""
+    if max_age is None:
+        max_age = getattr(settings, 'EXPORT_MAX_AGE', DEFAULT_MAX_AGE)
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in export_dir().iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def request_export(fmt, user=None):
+    """Return the user's job for this format and data version, creating one if needed"""
+    version = versioning.data_version()
+    expire_stale_jobs()
+
+    jobs = ExportJob.objects.filter(format=fmt, data_version=version, user=user).exclude(status='failed')
+    for job in jobs:
+        if job.status != 'done' or (job.file_path and os.path.exists(job.file_path)):
+            return job, False
+
+    job = ExportJob.objects.create(format=fmt, data_version=version, user=user)
+    if getattr(settings, 'EXPORT_RUN_IN_PROCESS', True):
+        _submit(job.pk)
+    return job, True
+
+
+def expire_stale_jobs(timeout=None):
+    """
+    Mark jobs pending or running for longer than timeout seconds as failed,
+    so they are not handed out for their data version forever.  Returns the
+    number of jobs expired.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'EXPORT_JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return ExportJob.objects.filter(
+        Q(status='pending', created_at__lt=cutoff) | Q(status='running', started_at__lt=cutoff)
+    ).update(status='failed', error='Export timed out', finished_at=timezone.now())
+
+
+def _submit(job_id):
+    """Run a job on the shared in-process pool once the transaction commits"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'EXPORT_WORKERS', 1),
+                thread_name_prefix='export',
+            )
+    transaction.on_commit(lambda: _pool.submit(_run_in_thread, job_id))
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        if claim(job_id):
+            run_job(ExportJob.objects.get(pk=job_id))
+    finally:
+        connection.close()
+
+
+def claim_next_job():
+    """Atomically mark the oldest pending job as running and return it"""
+    for job_id in ExportJob.objects.filter(status='pending').order_by('created_at').values_list('pk', flat=True):
+        if claim(job_id):
+            return ExportJob.objects.get(pk=job_id)
+    return None
+
+
+def claim(job_id):
+    """Move a job from pending to running; False if another worker got it"""
+    return ExportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    ) == 1
+
+
+def run_job(job):
+    """Generate the export file for a claimed job, recording progress and errors"""
+    sales = SalesData.objects.select_related('product').order_by('-date')
+    total = sales.count()
+    ExportJob.objects.filter(pk=job.pk).update(total_rows=total)
+
+    path = export_dir() / job.filename
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as handle:
+            writer = _write_csv if job.format == 'csv' else _write_json
+            writer(handle, sales, total, lambda done: _report_progress(job.pk, done))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        ExportJob.objects.filter(pk=job.pk).update(
+            status='failed', error=str(e), finished_at=timezone.now()
+        )
+        return
+
+    finished = ExportJob.objects.filter(pk=job.pk, status='running').update(
+        status='done', processed_rows=total, file_path=str(path), finished_at=timezone.now()
+    )
+    if not finished:
+        # Expired while it ran; a newer job replaces it
+        os.remove(path)
+    prune()
+
+
+def _report_progress(job_id, done):
+    ExportJob.objects.filter(pk=job_id).update(processed_rows=done)
+
+
+def _write_csv(handle, sales, total, progress):
+    writer = csv.writer(handle)
+    writer.writerow(CSV_HEADER)
+
+    done = 0
+    for sale in sales.iterator(chunk_size=CHUNK_SIZE):
+        writer.writerow([
+            sale.id,
+            sale.date,
+            sale.product.name,
+            sale.product.category,
+            sale.quantity,
+            sale.revenue,
+            sale.cost,
+            sale.profit,
+        ])
+        done += 1
+        if done % CHUNK_SIZE == 0:
+            progress(done)
+
+
+def _write_json(handle, sales, total, progress):
+    # Same structure as the export_json view, written one record at a time
+    handle.write('{\n')
+    handle.write(f'  "export_date": {json.dumps(datetime.now().isoformat())},\n')
+    handle.write(f'  "total_records": {total},\n')
+    handle.write('  "sales": [')
+
+    done = 0
+    for sale in sales.iterator(chunk_size=CHUNK_SIZE):
+        record = {
+            'id': sale.id,
+            'date': sale.date.isoformat(),
+            'product': {
+                'name': sale.product.name,
+                'category': sale.product.category,
+                'price': float(sale.product.price),
+            },
+            'quantity': sale.quantity,
+            'revenue': float(sale.revenue),
+            'cost': float(sale.cost),
+            'profit': float(sale.profit),
+        }
+        handle.write(',' if done else '')
+        handle.write('\n    ' + json.dumps(record))
+        done += 1
+        if done % CHUNK_SIZE == 0:
+            progress(done)
+
+    handle.write('\n  ]\n}\n')
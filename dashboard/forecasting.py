@@ -0,0 +1,205 @@
+"""
+Batched Forecasting with NumPy
+
+Fits a straight-line trend to many revenue series at once.  Each row of the
+input matrix is one series (e.g. one product) and each column one period
+(e.g. one month).  The ordinary least squares solution has a closed form, so
+all rows are solved together with a few vectorized operations instead of
+fitting one scikit-learn estimator per series.  The results match
+sklearn.linear_model.LinearRegression fitted on (period index, value).
+
+Single series can also be fitted with one of the MODELS below (linear
+trend, seasonal naive, additive Holt-Winters).  Fitted models are small
+picklable objects, so model_store.py can persist them and forecasting a
+series becomes load-and-predict.
+"""
+
+import numpy as np
+
+
+def fit_linear_trends(matrix):
+    """
+    Fit y = intercept + slope * t for every row of ``matrix``.
+
+    Returns (slopes, intercepts) as 1-D arrays with one entry per row.
+    Rows need at least two periods; with fewer the slope is 0 and the
+    intercept is the row mean.
+    """
+    Y = np.atleast_2d(np.asarray(matrix, dtype=float))
+    n_series, n_periods = Y.shape
+
+    if n_periods < 2:
+        intercepts = Y.mean(axis=1) if n_periods else np.zeros(n_series)
+        return np.zeros(n_series), intercepts
+
+    t = np.arange(n_periods, dtype=float)
+    t_centered = t - t.mean()
+    y_mean = Y.mean(axis=1)
+
+    # slope = sum((t - t_mean) * (y - y_mean)) / sum((t - t_mean)^2)
+    slopes = (Y - y_mean[:, None]) @ t_centered / (t_centered @ t_centered)
+    intercepts = y_mean - slopes * t.mean()
+
+    return slopes, intercepts
+
+
+def forecast_linear(matrix, horizon=3):
+    """
+    Forecast the next ``horizon`` periods of every row of ``matrix``.
+
+    Returns a dict of arrays: 'predictions' (rows x horizon), 'slopes'
+    and 'intercepts'.
+    """
+    Y = np.atleast_2d(np.asarray(matrix, dtype=float))
+    slopes, intercepts = fit_linear_trends(Y)
+
+    future = np.arange(Y.shape[1], Y.shape[1] + horizon, dtype=float)
+    predictions = intercepts[:, None] + slopes[:, None] * future[None, :]
+
+    return {
+        'predictions': predictions,
+        'slopes': slopes,
+        'intercepts': intercepts,
+    }
+
+
+# ============================================================================
+# SINGLE-SERIES MODELS
+# ============================================================================
+
+# Periods per season for each calendar granularity
+SEASON_LENGTHS = {
+    'day': 7,
+    'week': 52,
+    'month': 12,
+    'quarter': 4,
+}
+
+
+class LinearTrendModel:
+    """Straight-line trend (same fit as fit_linear_trends)"""
+
+    name = 'linear'
+    label = 'Linear Regression'
+
+    def fit(self, y, season=None):
+        y = np.asarray(y, dtype=float)
+        slopes, intercepts = fit_linear_trends(y)
+        self.slope = float(slopes[0])
+        self.intercept = float(intercepts[0])
+        self.n_periods = len(y)
+        return self
+
+    def predict(self, horizon=3):
+        future = np.arange(self.n_periods, self.n_periods + horizon, dtype=float)
+        return self.intercept + self.slope * future
+
+
+class SeasonalNaiveModel:
+    """
+    Repeats the last full season (e.g. next March = last March).  With
+    less than one season of history it repeats the last value.
+    """
+
+    name = 'seasonal_naive'
+    label = 'Seasonal Naive'
+
+    def fit(self, y, season=1):
+        y = np.asarray(y, dtype=float)
+        self.n_periods = len(y)
+        season = season if season and len(y) >= season else 1
+        self.last_season = y[-season:] if len(y) else np.zeros(1)
+        # Change per period between the last two seasons, for display
+        if len(y) >= 2 * season:
+            self.slope = float((y[-season:].sum() - y[-2 * season:-season].sum()) / season ** 2)
+        else:
+            self.slope = 0.0
+        return self
+
+    def predict(self, horizon=3):
+        return np.resize(self.last_season, horizon)
+
+
+class HoltWintersModel:
+    """
+    Additive Holt-Winters (level, trend and seasonal components).
+
+    The smoothing parameters are chosen by grid search on the one-step
+    ahead squared error; the recursion runs once over the series for all
+    parameter combinations at the same time.  Series shorter than two
+    seasons are fitted without the seasonal component (Holt's linear
+    method).
+    """
+
+    name = 'holt_winters'
+    label = 'Holt-Winters'
+
+    GRID = np.array([0.1, 0.3, 0.5, 0.7, 0.9])
+
+    def fit(self, y, season=1):
+        y = np.asarray(y, dtype=float)
+        self.n_periods = len(y)
+        seasonal = bool(season) and season > 1 and len(y) >= 2 * season
+        self.season = season if seasonal else 1
+
+        if len(y) < 2:
+            self.level, self.slope = (float(y[0]) if len(y) else 0.0), 0.0
+            self.seasonals = np.zeros(1)
+            self.params = (0.0, 0.0, 0.0)
+            return self
+
+        gammas = self.GRID if seasonal else np.zeros(1)
+        alpha, beta, gamma = (
+            grid.ravel() for grid in np.meshgrid(self.GRID, self.GRID, gammas, indexing='ij')
+        )
+        combos = len(alpha)
+
+        m = self.season
+        if seasonal:
+            # Initial state from the first two seasons: the trend from their
+            # means, the seasonals from the detrended first season
+            first_mean = y[:m].mean()
+            slope = (y[m:2 * m].mean() - first_mean) / m
+            line = first_mean + slope * (np.arange(m) - (m - 1) / 2)
+            level = np.full(combos, line[-1])
+            trend = np.full(combos, slope)
+            seasonals = np.tile(y[:m] - line, (combos, 1))
+            start = m
+        else:
+            level = np.full(combos, y[0])
+            trend = np.full(combos, y[1] - y[0])
+            seasonals = np.zeros((combos, 1))
+            start = 1
+
+        errors = np.zeros(combos)
+        for t in range(start, len(y)):
+            s = seasonals[:, t % m]
+            errors += (y[t] - (level + trend + s)) ** 2
+            new_level = alpha * (y[t] - s) + (1 - alpha) * (level + trend)
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            seasonals[:, t % m] = gamma * (y[t] - new_level) + (1 - gamma) * s
+            level = new_level
+
+        best = int(np.argmin(errors))
+        self.params = (float(alpha[best]), float(beta[best]), float(gamma[best]))
+        self.level = float(level[best])
+        self.slope = float(trend[best])
+        # Rotate so that seasonals[0] belongs to the first future period
+        self.seasonals = np.roll(seasonals[best], -(len(y) % m))
+        return self
+
+    def predict(self, horizon=3):
+        steps = np.arange(1, horizon + 1)
+        return self.level + self.slope * steps + np.resize(self.seasonals, horizon)
+
+
+MODELS = {
+    model.name: model
+    for model in (LinearTrendModel, SeasonalNaiveModel, HoltWintersModel)
+}
+DEFAULT_MODEL = 'linear'
+
+
+def fit_model(name, y, season=1):
+    """Fit the named model to one series"""
+    return MODELS[name]().fit(y, season)
@@ -92,3 +92,12 @@ class SalesDataForm(forms.ModelForm):
             'cost': 'Cost (₱)',
             'date': 'Sale Date',
         }
+
+
+class BulkSalesRowForm(forms.Form):
+    """Validates one row of a bulk sales upload (product is resolved separately)"""
+    
+    date = forms.DateField()
+    quantity = forms.IntegerField(min_value=1)
+    revenue = forms.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    cost = forms.DecimalField(max_digits=12, decimal_places=2, min_value=0)
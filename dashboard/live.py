@@ -0,0 +1,232 @@
+"""
+Live Dashboard Updates (Server-Sent Events)
+
+Open dashboards subscribe to /live/ instead of reloading the sales page.
+One Notifier per process watches the data version and, when it changes,
+computes a snapshot once (overall totals, the current month's revenue and
+market share) and fans out only the values that changed to every
+subscriber's queue.
+
+- Writes made in this process wake the notifier right away (signals.py
+  calls notify() on commit); writes from other processes are picked up by
+  polling the data version every LIVE_POLL_INTERVAL seconds.  The poll is
+  one small query and only runs while someone is subscribed.
+- Each subscriber has a bounded queue.  A client that falls behind has its
+  queue replaced by a fresh snapshot, so it never sees a gap and never
+  holds up the others.
+"""
+
+import asyncio
+import json
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .archive import period_totals
+from .periods import period_label, revenue_by_period
+from .versioning import data_version
+from . import series
+
+
+def build_snapshot():
+    """Totals, current month and market share, as JSON-ready values"""
+    totals = period_totals()
+    revenue = float(totals['revenue'])
+    cost = float(totals['cost'])
+
+    today = date.today()
+    month_start = today.replace(day=1)
+    month_revenue = revenue_by_period('month', month_start, today).get(month_start, 0)
+
+    products, revenues, percentages = series.market_share()
+
+    return {
+        'totals': {
+            'revenue': round(revenue, 2),
+            'cost': round(cost, 2),
+            'profit': round(revenue - cost, 2),
+            'margin': round((revenue - cost) / revenue * 100, 1) if revenue > 0 else 0,
+            'transactions': totals['transactions'],
+        },
+        'current_month': {
+            'period': month_start.isoformat(),
+            'label': period_label(month_start, 'month'),
+            'revenue': round(float(month_revenue), 2),
+        },
+        'market_share': {
+            name: {'revenue': round(rev, 2), 'percent': round(pct, 2)}
+            for name, rev, pct in zip(products, revenues, percentages)
+        },
+    }
+
+
+def snapshot_delta(old, new):
+    """
+    The parts of `new` that differ from `old`: changed totals fields, the
+    current month if it changed, and market share entries that changed
+    (removed products map to None).
+    """
+    if old is None:
+        return new
+
+    delta = {}
+    totals = {k: v for k, v in new['totals'].items() if old['totals'].get(k) != v}
+    if totals:
+        delta['totals'] = totals
+    if new['current_month'] != old['current_month']:
+        delta['current_month'] = new['current_month']
+
+    shares = {k: v for k, v in new['market_share'].items() if old['market_share'].get(k) != v}
+    shares.update({k: None for k in old['market_share'] if k not in new['market_share']})
+    if shares:
+        delta['market_share'] = shares
+    return delta
+
+
+def format_event(event, data, event_id=None):
+    """One SSE message"""
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+class Notifier:
+    """Shared watcher that fans out snapshot deltas to subscriber queues"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.snapshot = None
+        self.version = None
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self._lock = None
+
+    @property
+    def poll_interval(self):
+        return getattr(settings, 'LIVE_POLL_INTERVAL', 2)
+
+    @property
+    def queue_size(self):
+        return getattr(settings, 'LIVE_QUEUE_SIZE', 32)
+
+    async def subscribe(self):
+        """Register a subscriber; returns (queue, current snapshot)"""
+        self._ensure_running()
+        await self.refresh()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue, self.snapshot
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def notify(self):
+        """Wake the watcher now; safe to call from any thread"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    async def refresh(self):
+        """Rebuild the snapshot if the data version moved and broadcast the delta"""
+        async with self._lock:
+            version = await sync_to_async(data_version)()
+            if version == self.version:
+                return
+
+            snapshot = await sync_to_async(build_snapshot)()
+            previous = self.snapshot
+            self.snapshot, self.version = snapshot, version
+            if previous is not None:
+                delta = snapshot_delta(previous, snapshot)
+                if delta:
+                    self.broadcast('delta', delta)
+
+    def broadcast(self, event, data):
+        message = (event, data, self.version)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind: drop its backlog and resync from scratch
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(('snapshot', self.snapshot, self.version))
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = loop.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            if not self.subscribers:
+                # Nobody listening: stop polling until the next subscriber
+                self._task = None
+                return
+            try:
+                await self.refresh()
+            except Exception:
+                # A failed poll (e.g. database locked) is retried on the next tick
+                pass
+
+
+notifier = Notifier()
+
+
+def notify():
+    """Tell the shared notifier that data changed in this process"""
+    notifier.notify()
+
+
+def notify_on_commit(using='default'):
+    """
+    notify() once the current transaction commits (right away outside
+    one).  Registered at most once per transaction, like
+    versioning.bump_once.
+    """
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block and any(func is notify for _, func, _ in connection.run_on_commit):
+        return
+    transaction.on_commit(notify, using=using)
+
+
+def retry_line():
+    """Tells the browser how long to wait before reconnecting"""
+    return f"retry: {getattr(settings, 'LIVE_RETRY_MS', 5000)}\n"
+
+
+async def event_stream():
+    """
+    SSE messages for one subscriber: a snapshot first, then deltas, with a
+    comment line every LIVE_HEARTBEAT seconds to keep proxies from closing
+    the connection.
+    """
+    heartbeat = getattr(settings, 'LIVE_HEARTBEAT', 15)
+
+    queue, snapshot = await notifier.subscribe()
+    try:
+        yield retry_line() + format_event('snapshot', snapshot, notifier.version)
+        while True:
+            try:
+                event, data, version = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event, data, version)
+    finally:
+        notifier.unsubscribe(queue)
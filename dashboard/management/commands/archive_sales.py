@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.archive import compact_sales
+from datetime import datetime, timedelta
+
+
+class Command(BaseCommand):
+    help = 'Compact sales older than a cutoff into per-day-per-product archive rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            help='Archive sales dated before this day (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Archive sales older than this many days (default: 365, ignored if --before is given)',
+        )
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--before must be a date in YYYY-MM-DD format')
+        else:
+            cutoff = datetime.now().date() - timedelta(days=options['days'])
+
+        archived_rows, days_written = compact_sales(cutoff)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived_rows} sales records dated before {cutoff} '
+            f'into {days_written} daily archive rows'
+        ))
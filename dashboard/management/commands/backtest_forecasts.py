@@ -0,0 +1,81 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.backtest import run_backtest
+from dashboard.forecasting import MODELS, SEASON_LENGTHS
+from dashboard.parallel import ParallelReportRunner
+from dashboard.reports import BacktestReport
+
+
+class Command(BaseCommand):
+    help = 'Backtest the revenue forecasting models with a rolling forecast origin (and store the results for the eval page)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--granularity', default='month', help='day, week, month or quarter (default: month)')
+        parser.add_argument('--from', dest='date_from', help='First day of history (YYYY-MM-DD, default: first sale)')
+        parser.add_argument('--to', dest='date_to', help='Last day of history (YYYY-MM-DD, default: today)')
+        parser.add_argument('--horizon', type=int, default=3, help='Periods ahead to forecast (default: 3)')
+        parser.add_argument('--model', action='append', choices=list(MODELS), help='Model to test (repeatable, default: all)')
+        parser.add_argument('--workers', type=int, help='Worker processes (default: REPORT_WORKERS)')
+        parser.add_argument('--products', action='store_true', help='Also print accuracy per product')
+
+    def handle(self, *args, **options):
+        def parse(value):
+            if not value:
+                return None
+            try:
+                return datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f'Invalid date: {value}')
+
+        runner = ParallelReportRunner(max_workers=options['workers'], threshold=0) if options['workers'] else None
+        try:
+            report = BacktestReport(
+                granularity=options['granularity'], start=parse(options['date_from']), end=parse(options['date_to']),
+                models=options['model'], horizon=options['horizon'], runner=runner,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        report.fetch_data()  # always replay here, then store it for the eval page
+        started = time.perf_counter()
+        results = run_backtest(
+            report.data, report.models, SEASON_LENGTHS[report.granularity], report.horizon, runner=runner,
+        )
+        elapsed = time.perf_counter() - started
+        report.store(results)
+
+        self.stdout.write(
+            f'{report.start} to {report.end}: {results["n_periods"]} {report.granularity}s, '
+            f'training window {results["min_train"]}, horizon {report.horizon}'
+        )
+        header = f"{'Model':<18} {'Step':>5} {'MAE':>16} {'MAPE':>8} {'RMSE':>16} {'Forecasts':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for model in report.models:
+            rows = results['by_horizon'][model] + [dict(results['overall'][model], horizon='all')]
+            for row in rows:
+                self.stdout.write(
+                    f"{MODELS[model].label:<18} {str(row['horizon']):>5} {self.number(row['mae']):>16} "
+                    f"{self.percent(row['mape']):>8} {self.number(row['rmse']):>16} {row['forecasts']:>10}"
+                )
+
+        if options['products']:
+            for model in report.models:
+                self.stdout.write('')
+                self.stdout.write(self.style.MIGRATE_HEADING(MODELS[model].label))
+                for key, m in results['by_product'][model].items():
+                    self.stdout.write(
+                        f"  {key:<28} MAE {self.number(m['mae']):>16}  MAPE {self.percent(m['mape']):>8}  "
+                        f"RMSE {self.number(m['rmse']):>16}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS(f'Replayed {len(report.data) * len(report.models)} series in {elapsed:.2f}s'))
+
+    @staticmethod
+    def number(value):
+        return f'{value:,.2f}' if value is not None else 'n/a'
+
+    @staticmethod
+    def percent(value):
+        return f'{value:.1f}%' if value is not None else 'n/a'
@@ -0,0 +1,106 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from dashboard.profiling import QueryProfiler
+
+
+# Name -> (SESSION_ENGINE, AUTHENTICATION_BACKENDS)
+PROFILES = {
+    'db (default)': (
+        'django.contrib.sessions.backends.db',
+        ['django.contrib.auth.backends.ModelBackend'],
+    ),
+    'cached_db + user cache': (
+        'django.contrib.sessions.backends.cached_db',
+        ['dashboard.auth.CachedModelBackend'],
+    ),
+    'cache + user cache': (
+        'django.contrib.sessions.backends.cache',
+        ['dashboard.auth.CachedModelBackend'],
+    ),
+}
+
+VIEWS = ['sales', 'market', 'data', 'eval', 'product_forecasts', 'product_create', 'salesdata_create']
+
+AUTH_TABLES = ('django_session', 'auth_user')
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request query counts of the dashboard views under each session/auth profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Measured requests per view (default: 5)')
+        parser.add_argument('--user', help='Username to log in as (default: first superuser)')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError('No user to log in as. Create a superuser or pass --user.')
+
+        results = {}
+        for name, (engine, backends) in PROFILES.items():
+            self.stdout.write(f'Measuring {name}...')
+            with override_settings(SESSION_ENGINE=engine, AUTHENTICATION_BACKENDS=backends):
+                results[name] = self.measure(user, options['repeat'])
+
+        self.report(results)
+
+    def measure(self, user, repeat):
+        """Average (queries, auth queries, ms) per request for each view"""
+        caches['auth'].clear()
+        client = Client()
+        client.force_login(user)
+
+        measured = {}
+        for view in VIEWS:
+            url = reverse(view)
+            client.get(url)  # warm up caches
+
+            profiler = QueryProfiler()
+            start = time.perf_counter()
+            with profiler.install():
+                for _ in range(repeat):
+                    client.get(url)
+            elapsed = (time.perf_counter() - start) * 1000
+
+            auth = sum(1 for q in profiler.queries if any(t in q['sql'] for t in AUTH_TABLES))
+            measured[view] = (
+                len(profiler.queries) / repeat,
+                auth / repeat,
+                elapsed / repeat,
+            )
+        return measured
+
+    def report(self, results):
+        names = list(results)
+        baseline = results[names[0]]
+
+        self.stdout.write('')
+        self.stdout.write('Queries per request (auth queries in brackets), average ms')
+        header = f"{'View':<20}" + ''.join(f'{name:>26}' for name in names)
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for view in VIEWS:
+            cells = []
+            for name in names:
+                queries, auth, ms = results[name][view]
+                cells.append(f'{queries:>7.1f} [{auth:.1f}] {ms:>8.1f} ms')
+            self.stdout.write(f'{view:<20}' + ''.join(f'{cell:>26}' for cell in cells))
+
+        self.stdout.write('')
+        base_total = sum(q for q, _, _ in baseline.values())
+        for name in names[1:]:
+            total = sum(q for q, _, _ in results[name].values())
+            saved = (base_total - total) / len(VIEWS)
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: {saved:.1f} fewer queries per request than {names[0]}'
+            ))
@@ -0,0 +1,126 @@
+import threading
+import time
+from datetime import date
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from dashboard.models import Product, SalesData
+from dashboard.writequeue import WriteQueue, WriteQueueFull, WriteTimeout
+
+
+class Command(BaseCommand):
+    help = 'Measure concurrent sales write throughput with and without the write-behind queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32, help='Concurrent writers (default: 32)')
+        parser.add_argument('--writes', type=int, default=25, help='Writes per thread (default: 25)')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark sales instead of deleting them')
+
+    def handle(self, *args, **options):
+        product = Product.objects.order_by('pk').first()
+        if product is None:
+            raise CommandError('No products. Run populate_sales first.')
+
+        self.created = []
+        results = {}
+        try:
+            for mode in ('direct', 'queued'):
+                self.stdout.write(f"Measuring {mode} ({options['threads']} threads x {options['writes']} writes)...")
+                results[mode] = self.measure(mode, product, options['threads'], options['writes'])
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+        self.report(results)
+
+    def cleanup(self):
+        """
+        Delete the sales this run created, by pk, so sales saved by anyone
+        else meanwhile are kept.  The deletes go to the change feed like any
+        other (it is append-only, so the benchmark's creates stay in it).
+        """
+        for i in range(0, len(self.created), 500):
+            SalesData.objects.filter(pk__in=self.created[i:i + 500]).delete()
+        self.created = []
+
+    def measure(self, mode, product, threads, writes):
+        """Writes/s, failures and latency percentiles for one mode"""
+        write_queue = WriteQueue(max_pending=max(threads * 2, 1)) if mode == 'queued' else None
+        latencies = []
+        failures = []
+        lock = threading.Lock()
+        start_line = threading.Barrier(threads + 1)
+
+        def write_sale():
+            # Same work as the create form: insert plus signal handlers, one transaction
+            with transaction.atomic():
+                sale = SalesData.objects.create(
+                    product=product, date=date.today(), quantity=1,
+                    revenue=product.price, cost=product.cost,
+                )
+            with lock:
+                self.created.append(sale.pk)
+            return sale
+
+        def worker():
+            start_line.wait()
+            try:
+                for _ in range(writes):
+                    started = time.perf_counter()
+                    try:
+                        if write_queue is None:
+                            write_sale()
+                        else:
+                            write_queue.run(write_sale)
+                        ok = True
+                    except (DatabaseError, WriteQueueFull, WriteTimeout) as exc:
+                        ok = False
+                        error = type(exc).__name__ + ': ' + str(exc)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        if not ok:
+                            failures.append(error)
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        start_line.wait()
+        started = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        duration = time.perf_counter() - started
+
+        ms = np.array(latencies) * 1000
+        return {
+            'writes': len(latencies) - len(failures),
+            'failures': len(failures),
+            'per_second': (len(latencies) - len(failures)) / duration if duration else 0,
+            'p50': float(np.percentile(ms, 50)) if len(ms) else 0,
+            'p95': float(np.percentile(ms, 95)) if len(ms) else 0,
+            'max': float(ms.max()) if len(ms) else 0,
+            'batches': write_queue.batches if write_queue else None,
+            'first_failure': failures[0] if failures else '',
+        }
+
+    def report(self, results):
+        header = f"{'Mode':<10} {'Writes':>7} {'Failed':>7} {'Writes/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'Batches':>8}"
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for mode, r in results.items():
+            batches = '-' if r['batches'] is None else str(r['batches'])
+            self.stdout.write(
+                f"{mode:<10} {r['writes']:>7} {r['failures']:>7} {r['per_second']:>10.1f} "
+                f"{r['p50']:>9.1f} {r['p95']:>9.1f} {r['max']:>9.1f} {batches:>8}"
+            )
+        for mode, r in results.items():
+            if r['first_failure']:
+                self.stdout.write(self.style.WARNING(f"{mode}: first failure: {r['first_failure']}"))
+
+        if 'direct' in results and 'queued' in results and results['direct']['per_second']:
+            speedup = results['queued']['per_second'] / results['direct']['per_second']
+            self.stdout.write(self.style.SUCCESS(f'Write-behind queue: {speedup:.1f}x the direct throughput'))
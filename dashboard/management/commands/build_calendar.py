@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.periods import build_calendar, default_calendar_range
+from datetime import datetime
+
+
+class Command(BaseCommand):
+    help = 'Fill the calendar dimension table used for day/week/month/quarter reporting'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day (YYYY-MM-DD, default: Jan 1 of CALENDAR_FIRST_YEAR)')
+        parser.add_argument('--end', help='Last day (YYYY-MM-DD, default: Dec 31, CALENDAR_YEARS_AHEAD years from now)')
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Replace existing days, e.g. after changing FISCAL_YEAR_START_MONTH',
+        )
+
+    def handle(self, *args, **options):
+        default_start, default_end = default_calendar_range()
+        try:
+            start = self.parse(options['start']) or default_start
+            end = self.parse(options['end']) or default_end
+        except ValueError:
+            raise CommandError('--start and --end must be dates in YYYY-MM-DD format')
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        written = build_calendar(start, end, rebuild=options['rebuild'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Calendar covers {start} to {end} ({written} days written)'
+        ))
+
+    def parse(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
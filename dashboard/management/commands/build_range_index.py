@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+from dashboard import rangeindex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the prefix-sum index used for date-range totals'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = rangeindex.rebuild()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(index.product_ids)} products x {index.days} days '
+            f'({index.start} to {index.last_day}) in {elapsed:.2f}s -> {rangeindex.index_path()}'
+        ))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.anomalies import detect_anomalies, DEFAULT_DAYS, DEFAULT_WINDOW, DEFAULT_THRESHOLD
+from dashboard.models import Product
+from datetime import datetime, timedelta
+import time
+
+
+class Command(BaseCommand):
+    help = 'List product days whose revenue is a spike or drop against recent history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help=f'First day (YYYY-MM-DD, default: {DEFAULT_DAYS} days before --to)')
+        parser.add_argument('--to', dest='end', help='Last day (YYYY-MM-DD, default: today)')
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=DEFAULT_WINDOW,
+            help=f'Days of history behind each score (default: {DEFAULT_WINDOW})',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help=f'Score in standard deviations that counts as an anomaly (default: {DEFAULT_THRESHOLD})',
+        )
+        parser.add_argument('--product', help='Only check this product (name, case-insensitive)')
+
+    def handle(self, *args, **options):
+        try:
+            end = self.parse(options['end']) or datetime.now().date()
+            start = self.parse(options['start']) or end - timedelta(days=DEFAULT_DAYS - 1)
+        except ValueError:
+            raise CommandError('--from and --to must be dates in YYYY-MM-DD format')
+        if start > end:
+            raise CommandError('--from must not be after --to')
+        if options['window'] < 2:
+            raise CommandError('--window must be at least 2')
+
+        product_ids = None
+        if options['product']:
+            product_ids = list(Product.objects.filter(name__iexact=options['product']).values_list('pk', flat=True))
+            if not product_ids:
+                raise CommandError(f"No product named '{options['product']}'")
+
+        started = time.perf_counter()
+        anomalies = detect_anomalies(start, end, options['window'], options['threshold'], product_ids)
+        elapsed = time.perf_counter() - started
+
+        for a in anomalies:
+            line = (
+                f"{a['date']}  {a['product']:<30} {a['kind']:<5}  "
+                f"₱{a['revenue']:>14,.2f}  expected ₱{a['expected']:>14,.2f}  "
+                f"z={a['zscore']:+6.2f}  seasonal={a['seasonal_score']:+6.2f}"
+            )
+            self.stdout.write(self.style.WARNING(line) if a['kind'] == 'drop' else line)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(anomalies)} anomalies from {start} to {end} ({elapsed * 1000:.0f} ms)'
+        ))
+
+    def parse(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
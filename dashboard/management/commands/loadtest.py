@@ -0,0 +1,332 @@
+import asyncio
+import random
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from dashboard.models import Product, SalesData
+
+
+# View name -> (weight, method, path).  Paths may use {product} for a random product id.
+DEFAULT_MIX = {
+    'sales': (30, 'GET', '/'),
+    'market': (15, 'GET', '/market/'),
+    'data': (20, 'GET', '/data/'),
+    'eval': (10, 'GET', '/eval/'),
+    'export_csv': (3, 'GET', '/export-csv/'),
+    'export_json': (5, 'GET', '/export-json/'),
+    'salesdata_create': (12, 'POST', '/salesdata/create/'),
+    'product_update': (5, 'POST', '/product/{product}/update/'),
+}
+
+WRITE_VIEWS = {'salesdata_create', 'product_update'}
+
+
+class Command(BaseCommand):
+    help = 'Load-test the dashboard in-process with concurrent logged-in clients (ASGI or WSGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Total requests to send (default: 500)')
+        parser.add_argument('--duration', type=float, help='Run for this many seconds instead of a fixed request count')
+        parser.add_argument('--concurrency', type=int, default=50, help='Concurrent clients (default: 50)')
+        parser.add_argument('--user', help='Username to log in as (default: first superuser, or a temporary user)')
+        parser.add_argument(
+            '--mix',
+            help='Comma-separated view=weight pairs overriding the default mix, e.g. "sales=5,data=1"',
+        )
+        parser.add_argument('--read-only', action='store_true', help='Leave the CRUD posts out of the mix')
+        parser.add_argument('--wsgi', action='store_true', help='Drive the WSGI application (threads) instead of ASGI')
+        parser.add_argument('--cleanup', action='store_true', help='Delete sales records created during the run')
+        parser.add_argument('--seed', type=int, help='Random seed for a repeatable request sequence')
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.values('id', 'name', 'category', 'price', 'cost'))
+        if not products:
+            raise CommandError('No products found. Run populate_sales first.')
+
+        mix = self.build_mix(options)
+        user, temporary_user = self.get_user(options['user'])
+        rng = random.Random(options['seed'])
+
+        try:
+            cookies = self.login_cookies(user)
+            if options['wsgi']:
+                from djangowebapp.wsgi import application
+                send = WSGITransport(application, cookies).request
+            else:
+                from djangowebapp.asgi import application
+                send = ASGITransport(application, cookies).request
+
+            last_sale_id = SalesData.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+            self.stdout.write(
+                f"Load test: {'WSGI' if options['wsgi'] else 'ASGI'}, "
+                f"{options['concurrency']} clients, "
+                + (f"{options['duration']}s" if options['duration'] else f"{options['requests']} requests")
+            )
+
+            results, elapsed = asyncio.run(self.run(send, mix, products, rng, options))
+
+            if options['cleanup']:
+                deleted, _ = SalesData.objects.filter(id__gt=last_sale_id).delete()
+                self.stdout.write(f'Cleanup: deleted {deleted} sales records created during the run')
+        finally:
+            if temporary_user:
+                user.delete()
+
+        self.report(results, elapsed)
+
+    def build_mix(self, options):
+        mix = dict(DEFAULT_MIX)
+        if options['mix']:
+            weights = {}
+            for pair in options['mix'].split(','):
+                name, _, weight = pair.partition('=')
+                name = name.strip()
+                if name not in DEFAULT_MIX:
+                    raise CommandError(f"Unknown view '{name}'. Choose from: {', '.join(DEFAULT_MIX)}")
+                try:
+                    weights[name] = float(weight)
+                except ValueError:
+                    raise CommandError(f"Invalid weight for '{name}': {weight!r}")
+            mix = {name: (w,) + DEFAULT_MIX[name][1:] for name, w in weights.items()}
+
+        if options['read_only']:
+            mix = {name: spec for name, spec in mix.items() if name not in WRITE_VIEWS}
+        mix = {name: spec for name, spec in mix.items() if spec[0] > 0}
+        if not mix:
+            raise CommandError('The request mix is empty')
+        return mix
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username), False
+            except User.DoesNotExist:
+                raise CommandError(f"User '{username}' does not exist")
+
+        user = User.objects.filter(is_superuser=True).first()
+        if user:
+            return user, False
+        return User.objects.create_user(username=f'loadtest-{int(time.time())}', password=None), True
+
+    def login_cookies(self, user):
+        """Session and CSRF cookies for a logged-in client"""
+        client = Client()
+        client.force_login(user)
+        client.get('/salesdata/create/', HTTP_HOST=host())  # sets the CSRF cookie
+        return {key: morsel.value for key, morsel in client.cookies.items()}
+
+    def build_request(self, name, mix, products, rng):
+        _, method, path = mix[name]
+        product = rng.choice(products)
+        path = path.format(product=product['id'])
+
+        body = b''
+        if name == 'salesdata_create':
+            quantity = rng.randint(1, 10)
+            body = urlencode({
+                'product': product['id'],
+                'quantity': quantity,
+                'revenue': product['price'] * quantity,
+                'cost': product['cost'] * quantity,
+                'date': datetime.now().date().isoformat(),
+            }).encode()
+        elif name == 'product_update':
+            body = urlencode({
+                'name': product['name'],
+                'category': product['category'],
+                'price': product['price'],
+                'cost': product['cost'],
+            }).encode()
+
+        return method, path, body
+
+    async def run(self, send, mix, products, rng, options):
+        names = list(mix)
+        weights = [mix[name][0] for name in names]
+        results = {name: [] for name in names}
+        errors = {name: 0 for name in names}
+
+        total = options['requests']
+        deadline = time.perf_counter() + options['duration'] if options['duration'] else None
+        issued = 0
+
+        async def client():
+            nonlocal issued
+            while True:
+                if deadline is not None:
+                    if time.perf_counter() >= deadline:
+                        return
+                elif issued >= total:
+                    return
+                issued += 1
+
+                name = rng.choices(names, weights)[0]
+                method, path, body = self.build_request(name, mix, products, rng)
+
+                start = time.perf_counter()
+                try:
+                    status = await send(method, path, body)
+                except Exception:
+                    status = 500
+                results[name].append(time.perf_counter() - start)
+                if status >= 400:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+
+        return {name: (results[name], errors[name]) for name in names}, elapsed
+
+    def report(self, results, elapsed):
+        all_latencies = [t for latencies, _ in results.values() for t in latencies]
+        total_errors = sum(e for _, e in results.values())
+        if not all_latencies:
+            self.stdout.write(self.style.WARNING('No requests completed'))
+            return
+
+        self.stdout.write('')
+        self.stdout.write(f"{'View':<18}{'Requests':>10}{'Errors':>8}{'Req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        self.stdout.write('-' * 75)
+
+        rows = list(results.items()) + [('TOTAL', (all_latencies, total_errors))]
+        for name, (latencies, errors) in rows:
+            if not latencies:
+                continue
+            p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+            line = (
+                f"{name:<18}{len(latencies):>10}{errors:>8}{len(latencies) / elapsed:>9.1f}"
+                f"{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}"
+            )
+            self.stdout.write(self.style.SUCCESS(line) if name == 'TOTAL' else line)
+
+        self.stdout.write('')
+        self.stdout.write(f'{len(all_latencies)} requests in {elapsed:.2f}s ({len(all_latencies) / elapsed:.1f} req/s)')
+
+
+def host():
+    """A Host header the app accepts"""
+    allowed = [h for h in settings.ALLOWED_HOSTS if h not in ('*',) and not h.startswith('.')]
+    return allowed[0] if allowed else 'localhost'
+
+
+def cookie_header(cookies):
+    return '; '.join(f'{key}={value}' for key, value in cookies.items())
+
+
+class ASGITransport:
+    """Minimal in-process HTTP client for an ASGI application"""
+
+    def __init__(self, app, cookies):
+        self.app = app
+        self.cookies = cookies
+        self.csrf_token = cookies.get(settings.CSRF_COOKIE_NAME, '')
+
+    async def request(self, method, path, body=b''):
+        headers = [
+            (b'host', host().encode()),
+            (b'cookie', cookie_header(self.cookies).encode()),
+        ]
+        if method == 'POST':
+            headers += [
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (b'content-length', str(len(body)).encode()),
+                (b'x-csrftoken', self.csrf_token.encode()),
+            ]
+
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 50000),
+            'server': ('localhost', 80),
+        }
+
+        request_sent = False
+        disconnect = asyncio.Event()
+        status = None
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body' and not message.get('more_body', False):
+                disconnect.set()
+
+        await self.app(scope, receive, send)
+        return status
+
+
+class WSGITransport:
+    """Runs requests against a WSGI application on worker threads"""
+
+    def __init__(self, app, cookies):
+        self.app = app
+        self.cookies = cookies
+        self.csrf_token = cookies.get(settings.CSRF_COOKIE_NAME, '')
+
+    def _call(self, method, path, body):
+        from io import BytesIO
+
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_HOST': host(),
+            'HTTP_COOKIE': cookie_header(self.cookies),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': BytesIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if method == 'POST':
+            environ['CONTENT_TYPE'] = 'application/x-www-form-urlencoded'
+            environ['CONTENT_LENGTH'] = str(len(body))
+            environ['HTTP_X_CSRFTOKEN'] = self.csrf_token
+
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+
+        response = self.app(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return status[0]
+
+    async def request(self, method, path, body=b''):
+        return await asyncio.to_thread(self._call, method, path, body)
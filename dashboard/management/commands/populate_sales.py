@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from dashboard.models import Product, SalesData
+from dashboard import versioning, changelog
 from datetime import datetime, timedelta
 import random
 from decimal import Decimal
@@ -33,7 +34,7 @@ class Command(BaseCommand):
         start_date = end_date - timedelta(days=365)
         
         current_date = start_date
-        sales_count = 0
+        sales = []
         
         while current_date <= end_date:
             # Create random sales for each product
@@ -43,20 +44,21 @@ class Command(BaseCommand):
                 
                 for _ in range(num_sales):
                     quantity = random.randint(1, 10)
-                    revenue = product.price * quantity
-                    cost = product.cost * quantity
-                    profit = revenue - cost
                     
-                    SalesData.objects.create(
+                    # Profit and margin are computed by the database
+                    sales.append(SalesData(
                         product=product,
                         date=current_date,
                         quantity=quantity,
-                        revenue=revenue,
-                        cost=cost,
-                        profit=profit
-                    )
-                    sales_count += 1
+                        revenue=product.price * quantity,
+                        cost=product.cost * quantity,
+                    ))
             
             current_date += timedelta(days=1)
         
-        self.stdout.write(self.style.SUCCESS(f'Successfully created {sales_count} sales records'))
+        SalesData.objects.bulk_create(sales, batch_size=1000)
+        # bulk_create sends no post_save
+        changelog.record_many(sales, 'create')
+        versioning.bump(versioning.SALES)
+        
+        self.stdout.write(self.style.SUCCESS(f'Successfully created {len(sales)} sales records'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from dashboard.exports import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background export jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs that are pending now, then exit',
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between checks for new jobs (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Waiting for export jobs...' if not options['once'] else 'Processing pending export jobs...')
+
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            run_job(job)
+            job.refresh_from_db()
+            style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+            self.stdout.write(style(f'Export #{job.pk} ({job.format}): {job.status} - {job.total_rows} rows'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from dashboard import model_store
+
+
+class Command(BaseCommand):
+    help = 'Delete stored forecast models not rewritten for FORECAST_MODEL_MAX_AGE seconds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, help='Age in seconds (default: FORECAST_MODEL_MAX_AGE)')
+
+    def handle(self, *args, **options):
+        removed = model_store.prune(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} model files from {model_store.store_dir()}'))
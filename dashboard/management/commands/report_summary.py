@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from dashboard.reports import ReportBatch, SalesReport, MarketShareReport, PredictionReport
+
+
+class Command(BaseCommand):
+    help = 'Print the sales, market share and prediction report summaries from one shared scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--granularity', default='month', help='Prediction buckets: day, week, month or quarter')
+        parser.add_argument('--compare', action='store_true', help='Also fetch each report separately and compare')
+
+    def handle(self, *args, **options):
+        def reports():
+            return [SalesReport(), MarketShareReport(), PredictionReport(granularity=options['granularity'])]
+
+        shared = reports()
+        elapsed, queries = self.measure(lambda: ReportBatch(shared).run())
+
+        for report in shared:
+            summary = report.get_summary()
+            self.stdout.write(self.style.MIGRATE_HEADING(report.get_title()))
+            for key, value in (summary or {}).items():
+                if key in ('title', 'timestamp'):
+                    continue
+                if key == 'products':
+                    value = ', '.join(f"{p['product']} {p['percentage']:.1f}%" for p in value)
+                elif key == 'top_product' and value:
+                    value = value['product']
+                self.stdout.write(f'  {key}: {value}')
+
+        self.stdout.write('')
+        self.stdout.write(f'Shared scan: {elapsed * 1000:.1f} ms, {queries} queries')
+
+        if options['compare']:
+            def separately():
+                for report in reports():
+                    report.fetch_data()
+                    report.process_data()
+            elapsed_separate, queries_separate = self.measure(separately)
+            self.stdout.write(f'Separately:  {elapsed_separate * 1000:.1f} ms, {queries_separate} queries')
+
+    def measure(self, func):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+        return elapsed, len(captured.captured_queries)
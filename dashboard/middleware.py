@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from .routers import use_replica, reset_replica
+from .profiling import QueryProfiler, profiling_requested
+
+
+PRIMARY_PIN_COOKIE = 'db_primary_pin'
+
+
+class ReportReadMiddleware:
+    """
+    Route report and export views to the read replica.
+
+    After a user's own write (any non-GET/HEAD request) a short-lived cookie
+    pins their reads to the primary, so they always see what they just saved
+    even if the replica is lagging behind.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.report_views = set(getattr(settings, 'REPORT_READ_VIEWS', []))
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+    def __call__(self, request):
+        # Set and reset the flag in this frame: under ASGI, process_view and
+        # the view run in copied contexts, so a token taken there cannot be
+        # reset here.
+        token = use_replica() if self._is_report_read(request) else None
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                reset_replica(token)
+
+        if request.method not in ('GET', 'HEAD'):
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE, '1',
+                max_age=self.pin_seconds, httponly=True, samesite='Lax'
+            )
+
+        return response
+
+    def _is_report_read(self, request):
+        if request.method not in ('GET', 'HEAD') or PRIMARY_PIN_COOKIE in request.COOKIES:
+            return False
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            return False
+        return url_name in self.report_views
+
+
+class SQLProfilerMiddleware:
+    """
+    Record the SQL of a request when a staff user adds ?sql_profile=1.
+
+    The profiler is attached as request.sql_profiler; base.html renders its
+    report in a collapsible panel at the bottom of the page.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling_requested(request):
+            return self.get_response(request)
+
+        request.sql_profiler = QueryProfiler()
+        with request.sql_profiler.install():
+            return self.get_response(request)
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-19 14:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_alter_product_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transactions', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_sales', to='dashboard.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Sales Archive',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'date'), name='unique_archive_product_date')],
+            },
+        ),
+    ]
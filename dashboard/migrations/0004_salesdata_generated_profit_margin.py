@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-19 14:20
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Replace the stored profit column with database-generated columns.
+
+    A regular field can't be altered into a GeneratedField, so profit is
+    dropped and re-added.  No data has to be copied: the database computes
+    profit (and the new margin) from revenue and cost for every existing
+    row when the column is added.
+    """
+
+    dependencies = [
+        ('dashboard', '0003_dailysalesarchive'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='salesdata',
+            name='profit',
+        ),
+        migrations.AddField(
+            model_name='salesdata',
+            name='profit',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('revenue'), '-', models.F('cost')), output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+        migrations.AddField(
+            model_name='salesdata',
+            name='margin',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(revenue=0, then=models.Value(0.0)), default=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(models.F('revenue'), '-', models.F('cost')), models.FloatField()), '*', models.Value(100)), '/', django.db.models.functions.comparison.Cast(models.F('revenue'), models.FloatField()))), output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+    ]
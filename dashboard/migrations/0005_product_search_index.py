@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-19 14:40
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from dashboard.search import install_search_index
+    install_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from dashboard.search import uninstall_search_index
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_salesdata_generated_profit_margin'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
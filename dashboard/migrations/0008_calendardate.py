@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-19 14:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_calendar(apps, schema_editor):
+    from dashboard.periods import build_calendar
+    build_calendar(model=apps.get_model('dashboard', 'CalendarDate'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarDate',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('year', models.IntegerField()),
+                ('quarter', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('iso_year', models.IntegerField()),
+                ('iso_week', models.IntegerField()),
+                ('day_of_week', models.IntegerField()),
+                ('week_start', models.DateField(db_index=True)),
+                ('month_start', models.DateField(db_index=True)),
+                ('quarter_start', models.DateField(db_index=True)),
+                ('fiscal_year', models.IntegerField()),
+                ('fiscal_period', models.IntegerField()),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='salesdata',
+            index=models.Index(fields=['date'], name='salesdata_date_idx'),
+        ),
+        # Virtual relations: no database columns, they join on `date`
+        migrations.AddField(
+            model_name='salesdata',
+            name='calendar',
+            field=models.ForeignObject(from_fields=['date'], on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='dashboard.calendardate', to_fields=['date']),
+        ),
+        migrations.AddField(
+            model_name='dailysalesarchive',
+            name='calendar',
+            field=models.ForeignObject(from_fields=['date'], on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='dashboard.calendardate', to_fields=['date']),
+        ),
+        migrations.RunPython(fill_calendar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-19 15:10
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_feed(apps, schema_editor):
+    """Start the feed with one 'create' per existing row, so consumers can bootstrap from seq 0"""
+    ChangeLog = apps.get_model('dashboard', 'ChangeLog')
+    sources = [
+        ('product', apps.get_model('dashboard', 'Product'), ['name', 'category', 'price', 'cost']),
+        ('sales', apps.get_model('dashboard', 'SalesData'), ['product_id', 'date', 'quantity', 'revenue', 'cost']),
+    ]
+    for entity, model, fields in sources:
+        batch = []
+        for row in model.objects.order_by('pk').values('pk', *fields).iterator(chunk_size=2000):
+            pk = row.pop('pk')
+            batch.append(ChangeLog(entity=entity, object_id=pk, op='create', data=row))
+            if len(batch) >= 2000:
+                ChangeLog.objects.bulk_create(batch)
+                batch = []
+        ChangeLog.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_calendardate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(choices=[('sales', 'Sales Data'), ('product', 'Product')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete'), ('archive', 'Archive')], max_length=10)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['entity', 'seq'], name='changelog_entity_seq_idx')],
+            },
+        ),
+        migrations.RunPython(seed_feed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_changelog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='category',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+    ]
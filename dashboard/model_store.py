@@ -0,0 +1,153 @@
+"""
+Persisted Forecast Models
+
+Fitted forecasting models are stored with joblib under FORECAST_MODEL_DIR,
+one file per group of series (e.g. "every product, monthly") and model
+type.  Each file records the data version and the window (date range) it
+was checked against and, per series, a fingerprint of the values the
+model was fitted on:
+
+- same data version and window: the stored models are used as they are,
+  without querying the series;
+- newer data version or another window: the series are loaded and only
+  those whose values changed are refitted; the others are kept and
+  re-stamped.
+
+So a forecast request is normally load-and-predict, and a sale refits only
+the series it belongs to.  Each window has its own file, so users looking
+at different ranges do not overwrite each other's models; a group keeps
+its FORECAST_MODEL_WINDOWS most recently written windows, and a new window
+starts from the fingerprints of the newest one.  Files not written for
+FORECAST_MODEL_MAX_AGE seconds (groups of deleted products, say) are
+removed by `manage.py prune_forecast_models`, not on the request path.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from django.conf import settings
+
+from .forecasting import fit_model
+from .versioning import data_version
+
+
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+DEFAULT_WINDOWS = 4
+
+
+def store_dir():
+    path = Path(getattr(settings, 'FORECAST_MODEL_DIR', Path(tempfile.gettempdir()) / 'dashboard-models'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _digest(value):
+    return hashlib.sha1(repr(value).encode('utf-8')).hexdigest()[:16]
+
+
+def store_path(group_key, model_name, window=None):
+    """<model>-<digest of the group key>-<digest of the window>.joblib"""
+    return store_dir() / f'{model_name}-{_digest(group_key)}-{_digest(window)}.joblib'
+
+
+def group_paths(group_key, model_name):
+    """The group's window files, most recently written first"""
+    paths = []
+    for path in store_dir().glob(f'{model_name}-{_digest(group_key)}-*.joblib'):
+        try:
+            paths.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            pass
+    return [path for _, path in sorted(paths, reverse=True)]
+
+
+def fingerprint(values):
+    """Digest of a series' values"""
+    return hashlib.sha1(np.asarray(values, dtype=float).tobytes()).hexdigest()
+
+
+def _load(path):
+    try:
+        return joblib.load(path)
+    except (FileNotFoundError, EOFError, ValueError):
+        return None
+
+
+def _dump(path, entry):
+    # Write to a temp file and rename, so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    os.close(fd)
+    joblib.dump(entry, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def prune(max_age=None):
+    """Delete model files (and leftover temp files) not written for max_age seconds"""
+    if max_age is None:
+        max_age = getattr(settings, 'FORECAST_MODEL_MAX_AGE', DEFAULT_MAX_AGE)
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in store_dir().iterdir():
+        if path.suffix not in ('.joblib', '.tmp'):
+            continue
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def fitted_models(group_key, model_name, load_series, season=1, window=None):
+    """
+    Fitted models for every series in a group.
+
+    group_key names the series (what they are and their granularity) and
+    window the range they cover; together they pick the file.
+    load_series() returns {series_id: values}; it is only called when the
+    data version changed since the window was last checked, or for a new
+    window.  Returns
+    ({series_id: model}, stats) where stats counts the series that were
+    'loaded' as stored, 'fitted' anew and 'kept' after their values were
+    found unchanged.
+    """
+    path = store_path(group_key, model_name, window)
+    version = data_version()
+    entry = _load(path)
+    stats = {'loaded': 0, 'fitted': 0, 'kept': 0}
+
+    if entry is not None and entry['version'] == version and entry.get('window') == window:
+        stats['loaded'] = len(entry['models'])
+        return {key: model for key, (_, model) in entry['models'].items()}, stats
+
+    siblings = group_paths(group_key, model_name) if entry is None else []
+    if entry is None and siblings:
+        # A new window: series whose values match the newest window are kept
+        entry = _load(siblings[0])
+
+    stored = entry['models'] if entry is not None else {}
+    models = {}
+    for key, values in load_series().items():
+        digest = fingerprint(values)
+        if key in stored and stored[key][0] == digest:
+            models[key] = stored[key]
+            stats['kept'] += 1
+        else:
+            models[key] = (digest, fit_model(model_name, values, season))
+            stats['fitted'] += 1
+
+    _dump(path, {'version': version, 'window': window, 'models': models})
+    # Only a new window adds a file; drop the group's least recent ones
+    keep = getattr(settings, 'FORECAST_MODEL_WINDOWS', DEFAULT_WINDOWS) - 1
+    for stale in siblings[keep:]:
+        try:
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+    return {key: model for key, (_, model) in models.items()}, stats
@@ -1,14 +1,41 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import F, Case, When, Value
+from django.db.models.functions import Cast
 from django.utils import timezone
 
 # Create your models here.
 
+class ChangeLoggedQuerySet(models.QuerySet):
+    """
+    QuerySet whose set-based writes reach the change feed.
+    
+    update() (and bulk_update(), which runs on it) sends no model signals,
+    so it records an 'update' per affected row and bumps the data version
+    itself (changelog.record_updates), in the same transaction.
+    """
+    
+    def update(self, **kwargs):
+        from .changelog import record_updates
+        
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            record_updates(self.model, pks, self.db)
+        return rows
+    
+    update.alters_data = True
+
+
 class Product(models.Model):
     name = models.CharField(max_length=100, unique=True)
-    category = models.CharField(max_length=50)
+    category = models.CharField(max_length=50, db_index=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     cost = models.DecimalField(max_digits=10, decimal_places=2)
     
+    objects = ChangeLoggedQuerySet.as_manager()
+    
     def save(self, *args, **kwargs):
         """Normalize product name to title case before saving"""
         self.name = self.name.strip().title()
@@ -21,18 +48,71 @@ class Product(models.Model):
         ordering = ['name']
 
 
+class CalendarDate(models.Model):
+    """
+    Date dimension: one row per calendar day with its reporting buckets.
+
+    Sales tables join to it on their date column (see SalesData.calendar),
+    so trends at any granularity are a single GROUP BY on one of the
+    *_start columns.  Filled by the build_calendar command.
+    """
+    date = models.DateField(primary_key=True)
+    year = models.IntegerField()
+    quarter = models.IntegerField()
+    month = models.IntegerField()
+    iso_year = models.IntegerField()
+    iso_week = models.IntegerField()
+    day_of_week = models.IntegerField()  # 1 = Monday (ISO)
+    week_start = models.DateField(db_index=True)  # Monday of the ISO week
+    month_start = models.DateField(db_index=True)
+    quarter_start = models.DateField(db_index=True)
+    fiscal_year = models.IntegerField()
+    fiscal_period = models.IntegerField()  # 1-12, counted from FISCAL_YEAR_START_MONTH
+    
+    def __str__(self):
+        return self.date.isoformat()
+    
+    class Meta:
+        ordering = ['date']
+
+
 class SalesData(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales')
     date = models.DateField(default=timezone.now)
     quantity = models.IntegerField()
     revenue = models.DecimalField(max_digits=12, decimal_places=2)
     cost = models.DecimalField(max_digits=12, decimal_places=2)
-    profit = models.DecimalField(max_digits=12, decimal_places=2)
+    # Computed by the database, so bulk_create / bulk_update / update()
+    # keep them correct without going through save()
+    profit = models.GeneratedField(
+        expression=F('revenue') - F('cost'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+    )
+    margin = models.GeneratedField(  # Profit as a percentage of revenue
+        expression=Case(
+            When(revenue=0, then=Value(0.0)),
+            default=(
+                Cast(F('revenue') - F('cost'), models.FloatField()) * 100
+                / Cast(F('revenue'), models.FloatField())
+            ),
+        ),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+    )
+    # Virtual join to the date dimension (no column; uses `date`)
+    calendar = models.ForeignObject(
+        CalendarDate, on_delete=models.DO_NOTHING, related_name='+',
+        from_fields=['date'], to_fields=['date'],
+    )
+    
+    objects = ChangeLoggedQuerySet.as_manager()
     
     def save(self, *args, **kwargs):
-        """Auto-calculate profit before saving"""
-        self.profit = self.revenue - self.cost
+        """Save, then let profit and margin reload from the database on next access"""
         super().save(*args, **kwargs)
+        for field in ('profit', 'margin'):
+            self.__dict__.pop(field, None)
     
     def __str__(self):
         return f"{self.product.name} - {self.date}"
@@ -40,3 +120,135 @@ class SalesData(models.Model):
     class Meta:
         ordering = ['-date']
         verbose_name_plural = "Sales Data"
+        indexes = [
+            models.Index(fields=['date'], name='salesdata_date_idx'),
+        ]
+
+
+class DailySalesArchive(models.Model):
+    """Compacted cold storage: one row per product per day for old sales"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='archived_sales')
+    date = models.DateField()
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transactions = models.IntegerField(default=0)
+    # Virtual join to the date dimension (no column; uses `date`)
+    calendar = models.ForeignObject(
+        CalendarDate, on_delete=models.DO_NOTHING, related_name='+',
+        from_fields=['date'], to_fields=['date'],
+    )
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.date} (archived)"
+    
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = "Daily Sales Archive"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='unique_archive_product_date'),
+        ]
+
+
+class DataVersion(models.Model):
+    """Counter bumped whenever a group of tables changes (used for cache keys)"""
+    key = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only change feed for SalesData and Product (see changelog.py).
+    
+    seq is an AUTOINCREMENT key, so it only ever grows and is never
+    reused; consumers remember the last seq they processed and ask for
+    everything after it.  data holds the row's values after the change
+    (its last values for deletes).
+    """
+    
+    ENTITY_CHOICES = [
+        ('sales', 'Sales Data'),
+        ('product', 'Product'),
+    ]
+    OP_CHOICES = [
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+        ('archive', 'Archive'),  # moved into DailySalesArchive
+    ]
+    
+    seq = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    changed_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"#{self.seq} {self.op} {self.entity} {self.object_id}"
+    
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['entity', 'seq'], name='changelog_entity_seq_idx'),
+        ]
+
+
+class ChangeCursor(models.Model):
+    """Last change feed position processed by a named consumer"""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class ExportJob(models.Model):
+    """A full CSV/JSON export generated in the background"""
+    
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('json', 'JSON'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    data_version = models.CharField(max_length=50)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    file_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    @property
+    def progress(self):
+        """Percentage of rows written (0-100)"""
+        if self.status == 'done':
+            return 100
+        if not self.total_rows:
+            return 0
+        return int(self.processed_rows * 100 / self.total_rows)
+    
+    @property
+    def filename(self):
+        return f"sales_data_{self.pk}.{self.format}"
+    
+    def __str__(self):
+        return f"Export #{self.pk} ({self.format}, {self.status})"
+    
+    class Meta:
+        ordering = ['-created_at']
@@ -0,0 +1,134 @@
+"""
+Top Movers: Period-over-Period Comparison
+
+Compares each product's revenue and units in the current period (the last
+`days` days up to `end`) with the period of the same length just before
+it.  Everything is computed by one SQL statement:
+
+1. hot and archived sales in both periods are unioned and summed per
+   product and period,
+2. a product x period grid fills in zeros for products without sales,
+3. LAG() puts the previous period next to the current one,
+4. RANK() windows order products by change overall and within their
+   category, and SUM() windows add category totals.
+
+With top_k, only the top-K gainers and losers are returned, plus one row
+per category so that every category's totals are still available.
+"""
+
+from datetime import date, timedelta
+
+from django.db import connections, router
+
+from .models import SalesData
+
+
+MOVERS_SQL = """
+WITH sales AS (
+    SELECT product_id, date, quantity, revenue
+    FROM dashboard_salesdata
+    WHERE date >= %(previous_start)s AND date <= %(end)s
+    UNION ALL
+    SELECT product_id, date, quantity, revenue
+    FROM dashboard_dailysalesarchive
+    WHERE date >= %(previous_start)s AND date <= %(end)s
+),
+totals AS (
+    SELECT product_id,
+           CASE WHEN date >= %(current_start)s THEN 0 ELSE 1 END AS period,
+           SUM(revenue) AS revenue,
+           SUM(quantity) AS units
+    FROM sales
+    GROUP BY product_id, period
+),
+grid AS (
+    SELECT p.id AS product_id, p.name, p.category, k.period,
+           COALESCE(t.revenue, 0) AS revenue,
+           COALESCE(t.units, 0) AS units
+    FROM dashboard_product p
+    CROSS JOIN (SELECT 0 AS period UNION ALL SELECT 1) k
+    LEFT JOIN totals t ON t.product_id = p.id AND t.period = k.period
+),
+compared AS (
+    SELECT product_id, name, category, period, revenue, units,
+           LAG(revenue, 1, 0) OVER w AS previous_revenue,
+           LAG(units, 1, 0) OVER w AS previous_units
+    FROM grid
+    WINDOW w AS (PARTITION BY product_id ORDER BY period DESC)
+),
+ranked AS (
+    SELECT product_id, name, category,
+           revenue, previous_revenue, revenue - previous_revenue AS delta,
+           units, previous_units, units - previous_units AS units_delta,
+           RANK() OVER (ORDER BY revenue - previous_revenue DESC) AS gain_rank,
+           RANK() OVER (ORDER BY revenue - previous_revenue ASC) AS loss_rank,
+           RANK() OVER (PARTITION BY category ORDER BY revenue - previous_revenue DESC) AS category_rank,
+           ROW_NUMBER() OVER (PARTITION BY category) AS category_row,
+           SUM(revenue) OVER (PARTITION BY category) AS category_revenue,
+           SUM(previous_revenue) OVER (PARTITION BY category) AS category_previous_revenue
+    FROM compared
+    WHERE period = 0
+)
+SELECT product_id, name, category,
+       revenue, previous_revenue, delta,
+       units, previous_units, units_delta,
+       gain_rank, loss_rank, category_rank,
+       category_revenue, category_previous_revenue
+FROM ranked
+WHERE %(top_k)s IS NULL OR gain_rank <= %(top_k)s OR loss_rank <= %(top_k)s
+   OR category_row = 1
+ORDER BY delta DESC, name
+"""
+
+COLUMNS = [
+    'product_id', 'name', 'category',
+    'revenue', 'previous_revenue', 'delta',
+    'units', 'previous_units', 'units_delta',
+    'gain_rank', 'loss_rank', 'category_rank',
+    'category_revenue', 'category_previous_revenue',
+]
+
+
+def comparison_periods(days, end=None):
+    """((current_start, end), (previous_start, previous_end)) for a period length"""
+    end = end or date.today()
+    current_start = end - timedelta(days=days - 1)
+    previous_end = current_start - timedelta(days=1)
+    previous_start = previous_end - timedelta(days=days - 1)
+    return (current_start, end), (previous_start, previous_end)
+
+
+def _percent(delta, previous):
+    return delta * 100 / previous if previous else None
+
+
+def top_movers(days=30, end=None, top_k=None):
+    """
+    Per-product comparison of the last `days` days against the `days`
+    before, as dicts ordered by revenue change.  Each row also carries its
+    category's totals.  With top_k, rows outside the top K gainers and
+    losers are only kept as the first row of their category and are
+    marked with in_top_k=False.
+    """
+    (current_start, end), (previous_start, _) = comparison_periods(days, end)
+    params = {
+        'current_start': current_start.isoformat(),
+        'previous_start': previous_start.isoformat(),
+        'end': end.isoformat(),
+        'top_k': top_k,
+    }
+
+    connection = connections[router.db_for_read(SalesData)]
+    with connection.cursor() as cursor:
+        cursor.execute(MOVERS_SQL, params)
+        rows = [dict(zip(COLUMNS, row)) for row in cursor.fetchall()]
+
+    for row in rows:
+        row['in_top_k'] = top_k is None or row['gain_rank'] <= top_k or row['loss_rank'] <= top_k
+        for field in ('revenue', 'previous_revenue', 'delta', 'category_revenue', 'category_previous_revenue'):
+            row[field] = float(row[field] or 0)
+        row['percent'] = _percent(row['delta'], row['previous_revenue'])
+        row['category_delta'] = row['category_revenue'] - row['category_previous_revenue']
+        row['category_percent'] = _percent(row['category_delta'], row['category_previous_revenue'])
+
+    return rows
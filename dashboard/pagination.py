@@ -0,0 +1,122 @@
+"""
+Pagination for Large Tables
+
+COUNT(*) over millions of rows is often the slowest query on a page.
+EstimatedCountPaginator counts exactly only up to ADMIN_EXACT_COUNT_LIMIT
+rows (a COUNT over a LIMITed subquery, which stops early); beyond that it
+uses the table's estimated size for unfiltered lists and the limit itself
+for filtered ones.
+
+An estimated count may be too low, so it does not bound the pages: any
+page whose slice of the queryset has rows is served, and the page range
+offers the next page while more rows follow.
+"""
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_row_count(model, using='default'):
+    """
+    Approximate number of rows in a model's table without scanning it.
+
+    PostgreSQL: the planner's reltuples.  SQLite: sqlite_stat1 after
+    ANALYZE, otherwise the largest rowid (exact minus deleted rows).
+    Returns None when no estimate is available.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+
+        if connection.vendor == 'sqlite':
+            row = None
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():  # created by the first ANALYZE
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+            if row and row[0]:
+                return int(row[0].split()[0])
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+            row = cursor.fetchone()
+            return row[0] or 0
+
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count is exact for small results and estimated for large ones"""
+
+    @cached_property
+    def _counted(self):
+        """(count, whether it is an estimate)"""
+        limit = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000)
+        queryset = self.object_list
+
+        exact = queryset.order_by()[:limit + 1].count()
+        if exact <= limit:
+            return exact, False
+
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None:
+                return max(estimate, exact), True
+        return exact, True
+
+    @property
+    def count(self):
+        return self._counted[0]
+
+    @property
+    def estimated(self):
+        return self._counted[1]
+
+    def validate_number(self, number):
+        """Like Paginator.validate_number, without the upper bound when the count is estimated"""
+        if not self.estimated:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        """Page `number`, limited by the actual slice when the count is estimated"""
+        if not self.estimated:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = self.object_list[bottom:bottom + self.per_page]
+        if number > 1 and not object_list:
+            raise EmptyPage(self.error_messages['no_results'])
+        return self._get_page(object_list, number, self)
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        """Page links around `number`, continued past an estimated count while rows follow"""
+        number = self.validate_number(number)
+        last = 0
+        for page in super().get_elided_page_range(number, on_each_side=on_each_side, on_ends=on_ends):
+            last = page if page != self.ELLIPSIS else last
+            yield page
+        if not self.estimated or number < self.num_pages:
+            return
+
+        if number > last:
+            # Short ranges are listed whole, without pages past the count
+            if number - on_each_side > last + 1:
+                yield self.ELLIPSIS
+            yield from range(max(last + 1, number - on_each_side), number + 1)
+        following = number * self.per_page
+        if self.object_list[following:following + 1].exists():
+            yield number + 1
@@ -0,0 +1,115 @@
+"""
+Parallel Report Computation
+
+ParallelReportRunner spreads CPU-bound report work (statistics, trend fits)
+over a process pool.  The work is split into partitions - usually one per
+product or per time range - and each partition is handled by a plain
+function that receives only NumPy arrays, so workers never touch the
+database.  Small inputs are run serially in the calling process, where
+starting a pool would cost more than it saves.
+
+Worker functions live in this module (not reports.py) because they must be
+importable by a fresh worker process without setting up Django.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+DEFAULT_PARALLEL_THRESHOLD = 32
+
+
+class ParallelReportRunner:
+    """
+    Run a function over many partitions, in parallel when it pays off.
+
+    Settings (all optional):
+        REPORT_WORKERS             - process count (default: CPU count)
+        REPORT_PARALLEL_THRESHOLD  - minimum partitions before using a pool
+    """
+
+    def __init__(self, max_workers=None, threshold=None):
+        from django.conf import settings
+
+        if max_workers is None:
+            max_workers = getattr(settings, 'REPORT_WORKERS', None) or os.cpu_count() or 1
+        if threshold is None:
+            threshold = getattr(settings, 'REPORT_PARALLEL_THRESHOLD', DEFAULT_PARALLEL_THRESHOLD)
+
+        self.max_workers = max(1, int(max_workers))
+        self.threshold = threshold
+
+    def should_parallelize(self, partitions):
+        """Return True if the input is large enough to use the process pool"""
+        return self.max_workers > 1 and len(partitions) >= self.threshold
+
+    def map(self, func, partitions):
+        """Apply func to every partition; results keep the input order"""
+        partitions = list(partitions)
+
+        if not self.should_parallelize(partitions):
+            return [func(part) for part in partitions]
+
+        # A few chunks per worker keeps the pool busy without paying
+        # inter-process overhead for every single partition
+        chunksize = max(1, len(partitions) // (self.max_workers * 4))
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(func, partitions, chunksize=chunksize))
+
+    def run(self, func, partitions, merge=None):
+        """Map func over partitions, then combine the partial results with merge"""
+        results = self.map(func, partitions)
+        return merge(results) if merge else results
+
+
+# ============================================================================
+# WORKER FUNCTIONS (pure NumPy, picklable)
+# ============================================================================
+
+def backtest_series(partition):
+    """
+    Rolling-origin backtest of one forecasting model on one series.
+
+    partition is (key, model_name, values, season, horizon, min_train).
+    For every origin t from min_train to len(values) - 1 the model is
+    fitted on values[:t] and its 1..horizon step forecasts are compared
+    with the actual values that follow.  Returns error sums per horizon
+    step, so results for several series can be pooled before averaging.
+    """
+    from .forecasting import fit_model
+
+    key, model_name, values, season, horizon, min_train = partition
+    values = np.asarray(values, dtype=float)
+
+    abs_error = np.zeros(horizon)
+    squared_error = np.zeros(horizon)
+    percent_error = np.zeros(horizon)
+    count = np.zeros(horizon, dtype=int)
+    percent_count = np.zeros(horizon, dtype=int)
+
+    for origin in range(max(min_train, 2), len(values)):
+        actual = values[origin:origin + horizon]
+        forecast = fit_model(model_name, values[:origin], season).predict(horizon)[:len(actual)]
+        error = forecast - actual
+        steps = len(actual)
+
+        abs_error[:steps] += np.abs(error)
+        squared_error[:steps] += error ** 2
+        count[:steps] += 1
+        # MAPE is undefined for periods without sales
+        nonzero = actual != 0
+        percent_error[:steps][nonzero] += np.abs(error[nonzero] / actual[nonzero])
+        percent_count[:steps] += nonzero
+
+    return {
+        'key': key,
+        'model': model_name,
+        'abs_error': abs_error.tolist(),
+        'squared_error': squared_error.tolist(),
+        'percent_error': percent_error.tolist(),
+        'count': count.tolist(),
+        'percent_count': percent_count.tolist(),
+    }
+
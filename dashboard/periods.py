@@ -0,0 +1,282 @@
+"""
+Calendar Dimension and Time Buckets
+
+CalendarDate holds one row per day with the start of its ISO week, month
+and quarter plus its fiscal period.  Sales and archive rows join to it on
+their date, so revenue per day/week/month/quarter is one GROUP BY on the
+matching *_start column (one query per storage tier, hot and archived)
+instead of one query per period.
+
+The join is an inner join, so a sale dated outside the calendar would drop
+out of every total.  ensure_calendar() extends the calendar to cover the
+first and last sale date before the bucketed queries run.
+
+Views and reports read the bucket and range from the query string:
+
+    ?granularity=day|week|month|quarter&from=YYYY-MM-DD&to=YYYY-MM-DD
+"""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Min, Sum
+
+from . import versioning
+from .models import CalendarDate, SalesData, DailySalesArchive
+
+
+GRANULARITIES = {
+    'day': 'date',
+    'week': 'week_start',
+    'month': 'month_start',
+    'quarter': 'quarter_start',
+}
+DEFAULT_GRANULARITY = 'month'
+
+# How many buckets the default range covers for each granularity
+DEFAULT_PERIODS = {
+    'day': 30,
+    'week': 12,
+    'month': 12,
+    'quarter': 8,
+}
+
+
+# ============================================================================
+# BUILDING THE DIMENSION
+# ============================================================================
+
+def calendar_row(day, fiscal_start_month=1):
+    """Field values of the CalendarDate row for one day"""
+    iso_year, iso_week, iso_weekday = day.isocalendar()
+    quarter = (day.month - 1) // 3 + 1
+
+    # Fiscal years are named after the calendar year they end in
+    fiscal_period = (day.month - fiscal_start_month) % 12 + 1
+    fiscal_year = day.year + (1 if fiscal_start_month > 1 and day.month >= fiscal_start_month else 0)
+
+    return {
+        'date': day,
+        'year': day.year,
+        'quarter': quarter,
+        'month': day.month,
+        'iso_year': iso_year,
+        'iso_week': iso_week,
+        'day_of_week': iso_weekday,
+        'week_start': day - timedelta(days=iso_weekday - 1),
+        'month_start': day.replace(day=1),
+        'quarter_start': date(day.year, 3 * (quarter - 1) + 1, 1),
+        'fiscal_year': fiscal_year,
+        'fiscal_period': fiscal_period,
+    }
+
+
+def default_calendar_range():
+    """From CALENDAR_FIRST_YEAR to the end of CALENDAR_YEARS_AHEAD years from now"""
+    first_year = getattr(settings, 'CALENDAR_FIRST_YEAR', 2000)
+    years_ahead = getattr(settings, 'CALENDAR_YEARS_AHEAD', 10)
+    return date(first_year, 1, 1), date(date.today().year + years_ahead, 12, 31)
+
+
+def build_calendar(start=None, end=None, model=CalendarDate, rebuild=False):
+    """
+    Insert CalendarDate rows for every day from start to end (inclusive).
+
+    Existing days are kept unless rebuild is set, in which case the whole
+    range is replaced (needed after changing FISCAL_YEAR_START_MONTH).
+    Returns the number of rows written.
+    """
+    default_start, default_end = default_calendar_range()
+    start = start or default_start
+    end = end or default_end
+    fiscal_start_month = getattr(settings, 'FISCAL_YEAR_START_MONTH', 1)
+
+    if rebuild:
+        model.objects.filter(date__gte=start, date__lte=end).delete()
+        existing = set()
+    else:
+        existing = set(model.objects.filter(date__gte=start, date__lte=end).values_list('date', flat=True))
+
+    rows = []
+    day = start
+    while day <= end:
+        if day not in existing:
+            rows.append(model(**calendar_row(day, fiscal_start_month)))
+        day += timedelta(days=1)
+
+    model.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+def sales_date_span():
+    """(first, last) sale date across hot and archived sales, or None without sales"""
+    spans = [model.objects.aggregate(first=Min('date'), last=Max('date')) for model in (SalesData, DailySalesArchive)]
+    firsts = [span['first'] for span in spans if span['first']]
+    lasts = [span['last'] for span in spans if span['last']]
+    return (min(firsts), max(lasts)) if firsts else None
+
+
+def ensure_calendar():
+    """
+    Extend the calendar so it covers every sale date.
+
+    Sales dated before CALENDAR_FIRST_YEAR or past CALENDAR_YEARS_AHEAD
+    would otherwise be missing from every bucketed total.  The span only
+    changes when sales do, so the check runs once per sales data version.
+    Returns the number of days added.
+    """
+    key = f'dashboard:calendar:covered:{versioning.current(versioning.SALES)[0]}'
+    if cache.get(key):
+        return 0
+
+    written = 0
+    span = sales_date_span()
+    if span:
+        first, last = span
+        bounds = CalendarDate.objects.aggregate(first=Min('date'), last=Max('date'))
+        if bounds['first'] is None:
+            written = build_calendar(first, last)
+        else:
+            if first < bounds['first']:
+                written += build_calendar(first, bounds['first'] - timedelta(days=1))
+            if last > bounds['last']:
+                written += build_calendar(bounds['last'] + timedelta(days=1), last)
+
+    cache.set(key, True, None)
+    return written
+
+
+# ============================================================================
+# PERIOD PARAMETERS
+# ============================================================================
+
+def shift_back(day, granularity, periods):
+    """Start of the bucket `periods - 1` buckets before the one containing `day`"""
+    bucket = bucket_start(day, granularity)
+    if granularity == 'day':
+        return bucket - timedelta(days=periods - 1)
+    if granularity == 'week':
+        return bucket - timedelta(weeks=periods - 1)
+
+    months = 1 if granularity == 'month' else 3
+    index = bucket.year * 12 + bucket.month - 1 - months * (periods - 1)
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def bucket_start(day, granularity):
+    """First day of the bucket containing `day` (same rule as CalendarDate)"""
+    row = calendar_row(day)
+    return row[GRANULARITIES[granularity]]
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def resolve_period(granularity=DEFAULT_GRANULARITY, start=None, end=None):
+    """
+    Fill in defaults for a bucketed range.
+
+    Unknown granularities fall back to the default.  Without a start, the
+    range covers DEFAULT_PERIODS buckets ending at `end` (today by default).
+    Returns (granularity, start, end).
+    """
+    if granularity not in GRANULARITIES:
+        granularity = DEFAULT_GRANULARITY
+
+    end = end or date.today()
+    if start is None:
+        start = shift_back(end, granularity, DEFAULT_PERIODS[granularity])
+    if start > end:
+        start, end = end, start
+
+    return granularity, start, end
+
+
+def period_params(params):
+    """Read granularity, from and to from a QueryDict; invalid dates are ignored"""
+    return resolve_period(
+        params.get('granularity', DEFAULT_GRANULARITY),
+        _parse_date(params.get('from')),
+        _parse_date(params.get('to')),
+    )
+
+
+def period_query(params):
+    """'&granularity=...&from=...&to=...' for the keys present, to carry over in links"""
+    present = [(key, params[key]) for key in ('granularity', 'from', 'to') if params.get(key)]
+    return '&' + urlencode(present) if present else ''
+
+
+def period_label(period, granularity):
+    """Display label for a bucket start date"""
+    if granularity == 'day':
+        return period.strftime('%b %d')
+    if granularity == 'week':
+        iso_year, iso_week, _ = period.isocalendar()
+        return f'{iso_year}-W{iso_week:02d}'
+    if granularity == 'quarter':
+        return f'{period.year} Q{(period.month - 1) // 3 + 1}'
+    return period.strftime('%b %Y')
+
+
+# ============================================================================
+# BUCKETED TOTALS
+# ============================================================================
+
+def periods_in_range(granularity, start, end):
+    """Every bucket start from start to end, in order (from the dimension)"""
+    ensure_calendar()
+    field = GRANULARITIES[granularity]
+    return list(
+        CalendarDate.objects.filter(date__gte=start, date__lte=end)
+        .order_by(field).values_list(field, flat=True).distinct()
+    )
+
+
+def revenue_by_period(granularity, start, end, product_name=None, by_product=False):
+    """
+    Revenue per bucket across hot and archived sales.
+
+    Returns {period_start: revenue}, or {(product_id, period_start): revenue}
+    with by_product.  Each storage tier is one GROUP BY over the calendar
+    join; periods without sales are absent.
+    """
+    ensure_calendar()
+    field = 'calendar__' + GRANULARITIES[granularity]
+    group_by = ['product_id', field] if by_product else [field]
+
+    totals = {}
+    for model in (SalesData, DailySalesArchive):
+        qs = model.objects.filter(date__gte=start, date__lte=end)
+        if product_name:
+            qs = qs.filter(product__name__iexact=product_name)
+
+        rows = qs.order_by().values(*group_by).annotate(total=Sum('revenue'))
+        for row in rows:
+            key = (row['product_id'], row[field]) if by_product else row[field]
+            totals[key] = totals.get(key, Decimal('0')) + row['total']
+
+    return totals
+
+
+def revenue_series(granularity, start, end, product_name=None):
+    """
+    Revenue for every bucket in the range, oldest first, zero-filled.
+
+    Returns (periods, labels, values).
+    """
+    periods = periods_in_range(granularity, start, end)
+    totals = revenue_by_period(granularity, start, end, product_name)
+
+    labels = [period_label(p, granularity) for p in periods]
+    values = [float(totals.get(p, 0)) for p in periods]
+    return periods, labels, values
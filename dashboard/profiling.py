@@ -0,0 +1,147 @@
+"""
+SQL Query Profiler
+
+A staff-only debugging aid, switched on per request by adding
+?sql_profile=1 to any dashboard URL.  SQLProfilerMiddleware installs an
+execute wrapper on every database connection for the duration of the
+request and records each statement with its timing.  base.html then shows
+a collapsible panel with:
+
+- every query, its duration and the connection it ran on
+- the EXPLAIN QUERY PLAN of each distinct SELECT
+- repeated query shapes (the same statement with different parameters,
+  usually an N+1 loop over a queryset)
+- full table scans reported by the planner
+"""
+
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+PROFILE_PARAM = 'sql_profile'
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+_FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\w+)\b(?!.*\bUSING\b)')
+
+
+def query_shape(sql):
+    """Normalise a statement so queries differing only by values compare equal"""
+    shape = _IN_LIST.sub('IN (...)', sql)
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = shape.replace('%s', '?')
+    return _SPACES.sub(' ', shape).strip()
+
+
+class QueryProfiler:
+    """Collects the SQL run while it is active and analyses it afterwards"""
+
+    # Instances are execute wrappers (callable); templates must not call them
+    do_not_call_in_templates = True
+
+    def __init__(self, repeat_threshold=None):
+        self.queries = []
+        self.repeat_threshold = repeat_threshold or getattr(settings, 'SQL_PROFILER_REPEAT_THRESHOLD', 3)
+        self._recording = True
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self._recording:
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': params if not many else None,
+                'many': many,
+                'alias': context['connection'].alias,
+                'duration': (time.perf_counter() - start) * 1000,
+            })
+
+    def install(self):
+        """Wrap every configured connection; returns an ExitStack to close"""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+    def explain(self, query):
+        """EXPLAIN QUERY PLAN rows for a SELECT, or [] for anything else"""
+        if query['many'] or not query['sql'].lstrip().upper().startswith(('SELECT', 'WITH')):
+            return []
+
+        connection = connections[query['alias']]
+        if connection.vendor != 'sqlite':
+            return []
+
+        self._recording = False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'], query['params'] or ())
+                return [row[-1] for row in cursor.fetchall()]
+        except Exception as e:
+            return [f'(EXPLAIN failed: {e})']
+        finally:
+            self._recording = True
+
+    @cached_property
+    def report(self):
+        """Summary for the profiler panel; EXPLAIN runs once per query shape"""
+        shapes = {}
+        plans = {}
+        statements = []
+
+        for index, query in enumerate(self.queries, start=1):
+            shape = query_shape(query['sql'])
+            group = shapes.setdefault(shape, {'shape': shape, 'count': 0, 'duration': 0.0, 'first': index})
+            group['count'] += 1
+            group['duration'] += query['duration']
+
+            if shape not in plans:
+                plans[shape] = self.explain(query)
+            full_scans = [m.group(1) for m in (_FULL_SCAN.match(d) for d in plans[shape]) if m]
+
+            statements.append({
+                'index': index,
+                'shape': shape,
+                'sql': query['sql'],
+                'params': query['params'],
+                'alias': query['alias'],
+                'duration': query['duration'],
+                'plan': plans[shape],
+                'full_scans': full_scans,
+                'repeated': False,
+            })
+
+        repeated = [g for g in shapes.values() if g['count'] >= self.repeat_threshold]
+        repeated_shapes = {g['shape'] for g in repeated}
+        for statement in statements:
+            statement['repeated'] = statement['shape'] in repeated_shapes
+
+        return {
+            'count': len(statements),
+            'total_ms': sum(s['duration'] for s in statements),
+            'statements': statements,
+            'repeated': sorted(repeated, key=lambda g: -g['count']),
+            'full_scans': sorted({t for s in statements for t in s['full_scans']}),
+        }
+
+
+def profiling_requested(request):
+    user = getattr(request, 'user', None)
+    return (
+        PROFILE_PARAM in request.GET
+        and user is not None
+        and user.is_authenticated
+        and user.is_staff
+    )
@@ -0,0 +1,393 @@
+"""
+Prefix-Sum Range Index
+
+Per product, cumulative daily revenue, cost, quantity and transaction
+count over hot and archived sales:
+
+    cumulative[field][row, i] = sum of field on days before start + i
+
+so the total of any date range for any product (or any set of products,
+e.g. a category) is two lookups and a subtraction, without touching the
+sales tables.
+
+The index covers closed days (up to yesterday) and is stored with joblib
+at RANGE_INDEX_PATH.  It is kept current from the change feed
+(changelog.py) instead of being rebuilt:
+
+- days that closed since the last refresh are appended;
+- sales created, changed or deleted since the stored feed position mark
+  their day dirty (for an update, the earliest day the row ever had), and
+  only the columns from the earliest dirty day on are recomputed;
+- archive operations move sales between tiers without changing totals and
+  are skipped;
+- a deleted product takes its archived days with it (a cascade the feed
+  does not log), so its rows are zeroed.
+
+Today's (still open) sales are summed live, which is a small indexed query.
+The sales version is checked first, so an unchanged database costs one
+query per lookup.  `manage.py build_range_index` rebuilds from scratch,
+e.g. after raw SQL writes that bypassed the change feed.
+"""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from .models import ChangeLog, DailySalesArchive, Product, SalesData
+from . import versioning
+
+
+FIELDS = ('revenue', 'cost', 'quantity', 'transactions')
+CHUNK_SIZE = 500   # object ids per IN (...) lookup
+
+
+def index_path():
+    return Path(getattr(settings, 'RANGE_INDEX_PATH', Path(tempfile.gettempdir()) / 'dashboard-range-index.joblib'))
+
+
+def daily_sums(start, end):
+    """
+    Per product and day sums of FIELDS for start..end (either may be None),
+    hot and archived.  Returns (product_ids, days, {field: values}).
+    """
+    rows = []
+    for model, transactions in ((SalesData, Count('id')), (DailySalesArchive, Sum('transactions'))):
+        qs = model.objects.all()
+        if start:
+            qs = qs.filter(date__gte=start)
+        if end:
+            qs = qs.filter(date__lte=end)
+        rows += list(
+            qs.order_by().values('product_id', 'date')
+            .annotate(revenue=Sum('revenue'), cost=Sum('cost'), quantity=Sum('quantity'), transactions=transactions)
+            .values_list('product_id', 'date', *FIELDS)
+        )
+
+    product_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    days = np.array([r[1] for r in rows], dtype='datetime64[D]')
+    values = {field: np.array([float(r[2 + i] or 0) for r in rows]) for i, field in enumerate(FIELDS)}
+    return product_ids, days, values
+
+
+class RangeIndex:
+    """Cumulative daily sums per product from `start` through `last_day`"""
+
+    def __init__(self, start, product_ids, cumulative, seq=0, version=None):
+        self.start = start
+        self.product_ids = list(product_ids)
+        self.rows = {pk: i for i, pk in enumerate(self.product_ids)}
+        self.cumulative = cumulative     # {field: (products, days + 1) array}
+        self.seq = seq                   # last change feed entry applied
+        self.version = version           # sales version the index was checked at
+
+    @property
+    def days(self):
+        return self.cumulative['revenue'].shape[1] - 1
+
+    @property
+    def last_day(self):
+        return self.start + timedelta(days=self.days - 1)
+
+    @classmethod
+    def build(cls, end=None):
+        """Index every closed day from the first sale to `end` (yesterday)"""
+        end = end or date.today() - timedelta(days=1)
+        seq = ChangeLog.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+        version = versioning.current(versioning.SALES)[0]
+        product_ids = sorted(Product.objects.values_list('id', flat=True))
+
+        first = min(
+            (d for d in (
+                SalesData.objects.order_by('date').values_list('date', flat=True).first(),
+                DailySalesArchive.objects.order_by('date').values_list('date', flat=True).first(),
+            ) if d),
+            default=end,
+        )
+        start = min(first, end)
+        days = (end - start).days + 1
+        cumulative = {field: np.zeros((len(product_ids), days + 1)) for field in FIELDS}
+        index = cls(start, product_ids, cumulative, seq, version)
+        index.recompute(start)
+        return index
+
+    def offset(self, day):
+        """Column of the cumulative arrays holding the sums before `day`, clipped to the index"""
+        return min(max((day - self.start).days, 0), self.days)
+
+    def add_products(self, product_ids):
+        new = [pk for pk in product_ids if pk not in self.rows]
+        if not new:
+            return
+        for pk in new:
+            self.rows[pk] = len(self.product_ids)
+            self.product_ids.append(pk)
+        for field in FIELDS:
+            self.cumulative[field] = np.vstack([self.cumulative[field], np.zeros((len(new), self.days + 1))])
+
+    def extend(self, end):
+        """Append columns for the days up to `end` (as empty days); recompute() fills them"""
+        extra = (end - self.last_day).days
+        if extra <= 0:
+            return
+        for field in FIELDS:
+            cum = self.cumulative[field]
+            self.cumulative[field] = np.hstack([cum, np.repeat(cum[:, -1:], extra, axis=1)])
+
+    def recompute(self, day):
+        """Rebuild the columns from `day` through last_day from the sales tables"""
+        first = self.offset(day)
+        if first >= self.days:
+            return
+        day = self.start + timedelta(days=first)
+        product_ids, days, values = daily_sums(day, self.last_day)
+        self.add_products(set(product_ids.tolist()))
+
+        rows = np.array([self.rows[pk] for pk in product_ids.tolist()], dtype=np.int64)
+        cols = (days - np.datetime64(day)).astype(np.int64)
+        width = self.days - first
+        for field in FIELDS:
+            daily = np.zeros((len(self.product_ids), width))
+            np.add.at(daily, (rows, cols), values[field])
+            cum = self.cumulative[field]
+            cum[:, first + 1:] = cum[:, first:first + 1] + np.cumsum(daily, axis=1)
+
+    def dirty_since(self, head):
+        """
+        Earliest day changed by sales feed entries after self.seq up to
+        head, or None.  Updates count from the earliest date the row ever
+        had, since the feed only holds values after each change.
+        """
+        dirty = None
+        updated = []
+        changes = (
+            ChangeLog.objects.filter(entity='sales', seq__gt=self.seq, seq__lte=head)
+            .exclude(op='archive').values_list('op', 'object_id', 'data')
+        )
+        for op, object_id, data in changes.iterator(chunk_size=2000):
+            day = datetime.strptime(data['date'], '%Y-%m-%d').date()
+            dirty = day if dirty is None else min(dirty, day)
+            if op == 'update':
+                updated.append(object_id)
+
+        for i in range(0, len(updated), CHUNK_SIZE):
+            history = ChangeLog.objects.filter(
+                entity='sales', object_id__in=updated[i:i + CHUNK_SIZE], seq__lte=head,
+            ).values_list('data', flat=True)
+            for data in history:
+                day = datetime.strptime(data['date'], '%Y-%m-%d').date()
+                dirty = min(dirty, day)
+        return dirty
+
+    def deleted_products(self, head):
+        """Ids of products deleted by feed entries after self.seq up to head"""
+        return list(
+            ChangeLog.objects.filter(entity='product', op='delete', seq__gt=self.seq, seq__lte=head)
+            .values_list('object_id', flat=True)
+        )
+
+    def refresh(self):
+        """
+        Bring the index up to date.  Returns True when its arrays changed
+        (and should be saved), or a new RangeIndex when it had to be
+        rebuilt.
+        """
+        version = versioning.current(versioning.SALES)[0]
+        yesterday = date.today() - timedelta(days=1)
+        if version == self.version and self.last_day >= yesterday:
+            return False
+
+        head = ChangeLog.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+        if head < self.seq:
+            return RangeIndex.build(yesterday)   # the feed was reset
+
+        dirty = self.dirty_since(head)
+        if dirty is not None and dirty < self.start:
+            return RangeIndex.build(yesterday)   # back-dated before the first indexed day
+
+        # Before any recompute, which carries each row on from its last
+        # unchanged column
+        deleted = [self.rows[pk] for pk in self.deleted_products(head) if pk in self.rows]
+        for field in FIELDS:
+            self.cumulative[field][deleted] = 0
+
+        old_last = self.last_day
+        self.extend(yesterday)
+        changed = self.last_day > old_last or bool(deleted)
+        candidates = [d for d in (dirty, old_last + timedelta(days=1) if changed else None) if d]
+        if candidates and min(candidates) <= self.last_day:
+            self.recompute(min(candidates))
+            changed = True
+        self.seq, self.version = head, version
+        return changed
+
+    def totals(self, start, end, product_ids=None):
+        """
+        Sums of FIELDS over start..end for the given products (all when
+        None), over the indexed days only.
+        """
+        first, last = self.offset(start), self.offset(end + timedelta(days=1))
+        rows = slice(None) if product_ids is None else [self.rows[pk] for pk in product_ids if pk in self.rows]
+        return {
+            field: float((self.cumulative[field][rows, last] - self.cumulative[field][rows, first]).sum())
+            for field in FIELDS
+        }
+
+    def bucket_totals(self, boundaries, field='revenue', product_ids=None):
+        """
+        Sums of `field` between consecutive days in `boundaries` (each
+        bucket from one boundary up to the day before the next).
+        """
+        cum = self.cumulative[field]
+        if product_ids is not None:
+            cum = cum[[self.rows[pk] for pk in product_ids if pk in self.rows]]
+        columns = [self.offset(day) for day in boundaries]
+        return np.diff(cum[:, columns].sum(axis=0))
+
+
+def _load():
+    try:
+        return joblib.load(index_path())
+    except (FileNotFoundError, EOFError, ValueError):
+        return None
+
+
+def _dump(index):
+    # Write to a temp file and rename, so readers never see a partial file
+    path = index_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    os.close(fd)
+    joblib.dump(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+@contextmanager
+def current_index():
+    """
+    The process-wide index, loaded from disk (or built) once and refreshed
+    on entry.  Lookups happen inside the block, while no other thread can
+    be refreshing it.
+    """
+    global _index
+    with _lock:
+        if _index is None:
+            _index = _load()
+            if _index is None:
+                _index = RangeIndex.build()
+                _dump(_index)
+        result = _index.refresh()
+        if isinstance(result, RangeIndex):
+            _index = result
+        if result:
+            _dump(_index)
+        yield _index
+
+
+def rebuild():
+    """Rebuild the index from the sales tables and save it"""
+    global _index
+    with _lock:
+        _index = RangeIndex.build()
+        _dump(_index)
+        return _index
+
+
+def _open_totals(start, end, product_ids):
+    """Live sums for days after the index (today)"""
+    totals = dict.fromkeys(FIELDS, 0.0)
+    if start > end:
+        return totals
+    for model, transactions in ((SalesData, Count('id')), (DailySalesArchive, Sum('transactions'))):
+        qs = model.objects.filter(date__gte=start, date__lte=end)
+        if product_ids is not None:
+            qs = qs.filter(product_id__in=product_ids)
+        sums = qs.aggregate(
+            revenue=Sum('revenue'), cost=Sum('cost'), quantity=Sum('quantity'), transactions=transactions,
+        )
+        for field in FIELDS:
+            totals[field] += float(sums[field] or 0)
+    return totals
+
+
+def resolve_products(product_ids=None, category=None, product_name=None):
+    """Product ids narrowed by category and/or product name (None for all products)"""
+    if not category and not product_name:
+        return product_ids
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    if category:
+        products = products.filter(category__iexact=category)
+    if product_name:
+        products = products.filter(name__iexact=product_name)
+    return list(products.values_list('id', flat=True))
+
+
+def range_totals(start=None, end=None, product_ids=None, category=None, product_name=None):
+    """
+    Revenue, cost, profit, quantity and transaction count over start..end
+    (from the first sale / through today when None) for some products
+    (all by default), a category or a product name, with averages per day
+    and per transaction.
+    """
+    product_ids = resolve_products(product_ids, category, product_name)
+
+    with current_index() as index:
+        start = start or index.start
+        end = end or date.today()
+        if start > end:
+            start, end = end, start
+        totals = index.totals(start, end, product_ids)
+        tail_start = max(start, index.last_day + timedelta(days=1))
+    for field, value in _open_totals(tail_start, end, product_ids).items():
+        totals[field] += value
+
+    days = (end - start).days + 1
+    totals['start'] = start
+    totals['end'] = end
+    totals['profit'] = totals['revenue'] - totals['cost']
+    totals['days'] = days
+    totals['daily_revenue'] = totals['revenue'] / days
+    totals['average_revenue'] = totals['revenue'] / totals['transactions'] if totals['transactions'] else 0.0
+    return totals
+
+
+def revenue_series(granularity, start, end, product_name=None):
+    """
+    Same result as periods.revenue_series (periods, labels, values), with
+    the bucket totals read from the index instead of a GROUP BY.
+    """
+    from .periods import periods_in_range, period_label
+
+    periods = periods_in_range(granularity, start, end)
+    if not periods:
+        return [], [], []
+    product_ids = resolve_products(product_name=product_name)
+
+    # Bucket i covers periods[i]..periods[i + 1] - 1, clipped to start..end
+    boundaries = [max(p, start) for p in periods] + [end + timedelta(days=1)]
+    with current_index() as index:
+        values = index.bucket_totals(boundaries, 'revenue', product_ids)
+        tail_start = max(start, index.last_day + timedelta(days=1))
+
+    if tail_start <= end:
+        # Open days after the index, added to their buckets
+        tail_products, tail_days, tail_values = daily_sums(tail_start, end)
+        keep = np.ones(len(tail_days), dtype=bool) if product_ids is None else np.isin(tail_products, product_ids)
+        buckets = np.searchsorted(np.array(boundaries, dtype='datetime64[D]'), tail_days[keep], side='right') - 1
+        np.add.at(values, buckets, tail_values['revenue'][keep])
+
+    labels = [period_label(p, granularity) for p in periods]
+    return periods, labels, [float(round(v, 2)) for v in values]
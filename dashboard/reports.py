@@ -5,11 +5,16 @@ This module demonstrates OOP concepts:
 - Inheritance: Child classes extend GenericReport parent class
 - Encapsulation: Data and methods bundled in classes
 - Code Reusability: Common functionality in parent class
+
+Reports that declare their data needs (data_needs()) don't query the
+sales tables themselves: ReportBatch works out the columns, groupings and
+date range the reports need together, reads the hot and archived sales
+once, and hands each report its slice before process_data().
 """
 
 import numpy as np
 from datetime import datetime
-from .models import SalesData, Product
+from .models import SalesData, Product, DailySalesArchive
 
 
 class GenericReport:
@@ -33,15 +38,216 @@ class GenericReport:
         """Return formatted generation timestamp"""
         return self.generated_at.strftime("%Y-%m-%d %H:%M:%S")
     
+    def data_needs(self):
+        """DataNeeds read through ReportBatch; empty for reports with their own queries"""
+        return []
+    
+    def receive_data(self, slices):
+        """Build self.data from the slices for data_needs(), in the same order"""
+        raise NotImplementedError("Reports with data_needs() must implement receive_data()")
+    
     def fetch_data(self):
-        """Abstract method - to be overridden by child classes"""
-        raise NotImplementedError("Subclasses must implement fetch_data()")
+        """Fetch this report's data needs (override for hand-written queries)"""
+        if not self.data_needs():
+            raise NotImplementedError("Subclasses must implement fetch_data()")
+        ReportBatch([self]).fetch()
+        return self.data
     
     def process_data(self):
         """Abstract method - to be overridden by child classes"""
         raise NotImplementedError("Subclasses must implement process_data()")
 
 
+class DataNeed:
+    """
+    Declaration of the sales data a report reads.
+    
+    - measures: summed columns, from MEASURES
+    - group_by: () for grand totals, ('product',), ('period',) or
+      ('product', 'period')
+    - rows: per-transaction values of these columns instead of sums
+      (hot sales only; archived sales are already compacted per day)
+    - granularity, start, end: period bucketing and date bounds
+      (None for all time; period groupings default like resolve_period)
+    """
+    
+    MEASURES = ('quantity', 'revenue', 'cost', 'transactions')
+    
+    def __init__(self, measures=('revenue',), group_by=(), rows=(), granularity=None, start=None, end=None):
+        unknown = set(measures) | set(rows)
+        unknown -= set(self.MEASURES)
+        if unknown:
+            raise ValueError(f"Unknown measures: {', '.join(sorted(unknown))}")
+        if 'period' in group_by:
+            from .periods import resolve_period
+            if granularity is None:
+                raise ValueError("Grouping by period needs a granularity")
+            granularity, start, end = resolve_period(granularity, start, end)
+        self.measures = tuple(measures)
+        self.group_by = tuple(group_by)
+        self.rows = tuple(rows)
+        self.granularity = granularity
+        self.start = start
+        self.end = end
+
+
+class ReportBatch:
+    """
+    Shared-scan executor for reports that declare DataNeeds.
+    
+        batch = ReportBatch([SalesReport(), MarketShareReport(), PredictionReport()])
+        results = batch.run()   # each report's process_data() result
+    
+    The needs of all reports are merged into one read per storage tier
+    over the union of their date ranges:
+    
+    - hot sales: one GROUP BY product and day for the summed measures;
+    - archived sales: one scan of the (daily) archive rows;
+    - per-transaction values, only when a report declares rows: one
+      narrow scan of those hot columns, kept apart from the sums.
+    
+    Every slice is then cut from these arrays with NumPy: a date mask, and
+    np.bincount over product and period keys for the sums.
+    """
+    
+    def __init__(self, reports):
+        self.reports = list(reports)
+        self.queries = 0
+    
+    def needs(self):
+        return [need for report in self.reports for need in report.data_needs()]
+    
+    def fetch(self):
+        """Read the merged needs once and hand every report its slices"""
+        needs = self.needs()
+        facts = self.scan(needs) if needs else None
+        for report in self.reports:
+            report_needs = report.data_needs()
+            if report_needs:
+                report.receive_data([self.slice(facts, need) for need in report_needs])
+        return self.reports
+    
+    def run(self):
+        """fetch(), then process_data() for every report; returns their results"""
+        self.fetch()
+        return [report.process_data() for report in self.reports]
+    
+    def scan(self, needs):
+        """
+        Hot and archived sales for the merged needs as parallel arrays:
+        product ids, days, a hot-tier flag and one array per measure.
+        Needs with rows get a separate 'rows' entry of hot transactions.
+        """
+        from django.db.models import Count, Sum
+        
+        def date_range(group):
+            starts = [n.start for n in group]
+            ends = [n.end for n in group]
+            return (None if None in starts else min(starts)), (None if None in ends else max(ends))
+        
+        def bounded(qs, start, end):
+            if start:
+                qs = qs.filter(date__gte=start)
+            if end:
+                qs = qs.filter(date__lte=end)
+            return qs.order_by()
+        
+        self.queries = 0
+        facts = {}
+        sum_needs = [n for n in needs if not n.rows]
+        row_needs = [n for n in needs if n.rows]
+        
+        if sum_needs:
+            measures = [m for m in DataNeed.MEASURES if any(m in n.measures for n in sum_needs)]
+            columns = [m for m in measures if m != 'transactions']
+            start, end = date_range(sum_needs)
+            sums = {column: Sum(column) for column in columns}
+            hot_rows = list(
+                bounded(SalesData.objects.all(), start, end)
+                .values('product_id', 'date').annotate(**sums, n=Count('id'))
+                .values_list('product_id', 'date', *columns, 'n')
+            )
+            cold_rows = list(
+                bounded(DailySalesArchive.objects.all(), start, end)
+                .values_list('product_id', 'date', *columns, 'transactions')
+            )
+            self.queries += 2
+            
+            rows = hot_rows + cold_rows
+            fields = list(zip(*rows)) if rows else [()] * (len(columns) + 3)
+            facts.update({
+                'product': np.array(fields[0], dtype=np.int64),
+                'day': np.array(fields[1], dtype='datetime64[D]'),
+                'hot': np.arange(len(rows)) < len(hot_rows),
+                'transactions': np.array(fields[-1], dtype=float),
+            })
+            for i, column in enumerate(columns):
+                facts[column] = np.array([float(v or 0) for v in fields[2 + i]])
+        
+        if row_needs:
+            # Only the reports that need single transactions pay for them;
+            # the sums above stay one GROUP BY
+            columns = [m for m in DataNeed.MEASURES if m != 'transactions' and any(m in n.rows for n in row_needs)]
+            start, end = date_range(row_needs)
+            rows = list(
+                bounded(SalesData.objects.all(), start, end)
+                .values_list('date', *columns).iterator(chunk_size=5000)
+            )
+            self.queries += 1
+            
+            fields = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+            facts['rows'] = {'day': np.array(fields[0], dtype='datetime64[D]')}
+            for i, column in enumerate(columns):
+                facts['rows'][column] = np.array([float(v or 0) for v in fields[1 + i]])
+            facts['rows']['transactions'] = np.ones(len(rows))
+        return facts
+    
+    def slice(self, facts, need):
+        """The part of the scanned arrays one need asked for"""
+        from .periods import periods_in_range
+        
+        days = facts['rows']['day'] if need.rows else facts['day']
+        mask = np.ones(len(days), dtype=bool)
+        if need.start:
+            mask &= days >= np.datetime64(need.start)
+        if need.end:
+            mask &= days <= np.datetime64(need.end)
+        
+        if need.rows:
+            return {column: facts['rows'][column][mask] for column in need.rows}
+        
+        keys = []
+        if 'product' in need.group_by:
+            product_ids, product_index = np.unique(facts['product'][mask], return_inverse=True)
+            keys.append((product_ids.tolist(), product_index))
+        if 'period' in need.group_by:
+            periods = periods_in_range(need.granularity, need.start, need.end)
+            starts = np.array(periods, dtype='datetime64[D]')
+            period_index = np.searchsorted(starts, facts['day'][mask], side='right') - 1
+            keys.append((periods, period_index))
+        
+        # One flat bucket index over the grouping keys, summed with bincount
+        labels = [()]
+        flat = np.zeros(int(mask.sum()), dtype=np.int64)
+        for values, index in keys:
+            labels = [label + (value,) for label in labels for value in values]
+            flat = flat * len(values) + index
+        sums = {
+            measure: np.bincount(flat, weights=facts[measure][mask], minlength=len(labels))
+            for measure in need.measures
+        }
+        
+        def key(label):
+            return label[0] if len(label) == 1 else label
+        
+        if not need.group_by:
+            return {measure: float(total[0]) for measure, total in sums.items()}
+        return {
+            key(label): {measure: float(sums[measure][i]) for measure in need.measures}
+            for i, label in enumerate(labels)
+        }
+
+
 class SalesReport(GenericReport):
     """
     Child Class: Sales Report
@@ -54,24 +260,29 @@ class SalesReport(GenericReport):
         super().__init__("Sales Analysis Report")
         self.statistics = {}
     
-    def fetch_data(self):
-        """Fetch sales data from database"""
-        self.data = SalesData.objects.all()
-        return self.data
+    def data_needs(self):
+        """Every transaction's revenue"""
+        return [DataNeed(rows=('revenue',))]
+    
+    def receive_data(self, slices):
+        self.data = slices[0]['revenue']
     
     def process_data(self):
         """Process sales data using NumPy"""
-        if not self.data:
+        if self.data is None:
             self.fetch_data()
         
-        revenues = np.array([float(s.revenue) for s in self.data])
+        revenues = self.data
+        if len(revenues) == 0:
+            # No hot transactions (e.g. everything archived): report zeros, not NaN
+            revenues = np.zeros(1)
         
         self.statistics = {
             'total': np.sum(revenues),
             'mean': np.mean(revenues),
             'median': np.median(revenues),
             'std': np.std(revenues),
-            'count': len(revenues)
+            'count': len(self.data)
         }
         
         return self.statistics
@@ -104,17 +315,21 @@ class MarketShareReport(GenericReport):
         super().__init__("Market Share Analysis Report")
         self.market_data = {}
     
-    def fetch_data(self):
-        """Fetch product sales data"""
-        from django.db.models import Sum
-        self.data = Product.objects.annotate(
-            total_sales=Sum('sales__revenue')
-        ).order_by('-total_sales')
-        return self.data
+    def data_needs(self):
+        """Revenue and units per product, hot and archived"""
+        return [DataNeed(measures=('revenue', 'quantity'), group_by=('product',))]
+    
+    def receive_data(self, slices):
+        totals = slices[0]
+        products = list(Product.objects.all())
+        for product in products:
+            product.total_sales = totals.get(product.id, {}).get('revenue', 0)
+            product.units_sold = int(totals.get(product.id, {}).get('quantity', 0))
+        self.data = sorted(products, key=lambda p: p.total_sales, reverse=True)
     
     def process_data(self):
         """Calculate market share percentages"""
-        if not self.data:
+        if self.data is None:
             self.fetch_data()
         
         total_revenue = sum([float(p.total_sales or 0) for p in self.data])
@@ -151,63 +366,65 @@ class PredictionReport(GenericReport):
     Child Class: Prediction Report
     
     Inherits from GenericReport and adds ML predictions.
-    Uses scikit-learn for Linear Regression (Numerical Prediction).
+    Forecasts revenue with a linear trend (default), seasonal naive or
+    Holt-Winters model (forecasting.py).  Fitted models are persisted by
+    model_store.py and only refitted after new sales change the series.
+    Revenue is bucketed by day, week, month or quarter over start..end
+    (default: the last 12 months).
     """
     
-    def __init__(self):
-        super().__init__("Sales Prediction Report (Linear Regression)")
+    def __init__(self, granularity='month', start=None, end=None, model='linear'):
+        from .forecasting import MODELS, DEFAULT_MODEL
+        from .periods import resolve_period
+        self.model_name = model if model in MODELS else DEFAULT_MODEL
+        super().__init__(f"Sales Prediction Report ({MODELS[self.model_name].label})")
+        self.granularity, self.start, self.end = resolve_period(granularity, start, end)
         self.predictions = {}
     
-    def fetch_data(self):
-        """Fetch historical sales data for prediction"""
-        from django.db.models import Sum
-        from django.db.models.functions import TruncMonth
-        from datetime import datetime, timedelta
-        
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=365)
-        
-        # Get monthly aggregated data
-        self.data = SalesData.objects.filter(
-            date__gte=start_date,
-            date__lte=end_date
-        ).annotate(
-            month=TruncMonth('date')
-        ).values('month').annotate(
-            total=Sum('revenue')
-        ).order_by('month')
-        
-        return self.data
+    def data_needs(self):
+        """Revenue per period over the range (hot and archived, zero-filled)"""
+        return [DataNeed(
+            measures=('revenue',), group_by=('period',),
+            granularity=self.granularity, start=self.start, end=self.end,
+        )]
+    
+    def receive_data(self, slices):
+        self.data = [
+            {'period': period, 'total': totals['revenue']}
+            for period, totals in slices[0].items()
+        ]
     
     def process_data(self):
-        """Apply Linear Regression for future prediction"""
-        from sklearn.linear_model import LinearRegression
+        """Load (or fit) the forecasting model and predict the next 3 periods"""
+        from .forecasting import MODELS, SEASON_LENGTHS
+        from .model_store import fitted_models
         
-        if not self.data:
-            self.fetch_data()
-        
-        if len(self.data) < 2:
-            return None
+        def load_series():
+            if not self.data:
+                self.fetch_data()
+            return {'total': [d['total'] for d in self.data]}
         
-        # Prepare data for regression
-        X = np.array(range(len(self.data))).reshape(-1, 1)
-        y = np.array([float(d['total']) for d in self.data])
+        models, _ = fitted_models(
+            ('total', self.granularity), self.model_name,
+            load_series, SEASON_LENGTHS[self.granularity], window=(self.start, self.end),
+        )
+        model = models['total']
         
-        # Train model
-        model = LinearRegression()
-        model.fit(X, y)
+        if model.n_periods < 2:
+            return None
         
-        # Predict next 3 months
-        future_X = np.array([len(self.data), len(self.data)+1, len(self.data)+2]).reshape(-1, 1)
-        future_predictions = model.predict(future_X)
+        # Predict next 3 periods
+        future_predictions = model.predict(3)
         
         self.predictions = {
             'next_month': float(future_predictions[0]),
             'second_month': float(future_predictions[1]),
             'third_month': float(future_predictions[2]),
-            'slope': float(model.coef_[0]),
-            'intercept': float(model.intercept_),
-            'model_type': 'Linear Regression (Continuous Prediction)'
+            'slope': model.slope,
+            'intercept': getattr(model, 'intercept', None),
+            'granularity': self.granularity,
+            'model': self.model_name,
+            'model_type': f'{MODELS[self.model_name].label} (Continuous Prediction)'
         }
         
         return self.predictions
@@ -226,6 +443,500 @@ class PredictionReport(GenericReport):
             'next_month_prediction': f"₱{self.predictions['next_month']:,.2f}",
             'second_month_prediction': f"₱{self.predictions['second_month']:,.2f}",
             'third_month_prediction': f"₱{self.predictions['third_month']:,.2f}",
-            'trend_slope': f"₱{self.predictions['slope']:,.2f} per month",
+            'trend_slope': f"₱{self.predictions['slope']:,.2f} per {self.granularity}",
             'model_info': self.predictions['model_type']
         }
+
+
+
+class ProductForecastReport(GenericReport):
+    """
+    Child Class: Per-Product Forecast Report
+    
+    Inherits from GenericReport and forecasts the next 3 periods (months by
+    default) for every product with the chosen model.  Linear trends are
+    solved for all products at once with closed-form NumPy least squares
+    (forecasting.forecast_linear).  The other models are persisted
+    (model_store.py): the products x periods revenue matrix is only built
+    when they are out of date, and then only products whose series changed
+    are refitted.
+    """
+    
+    def __init__(self, horizon=3, granularity='month', start=None, end=None, model='linear'):
+        from .forecasting import MODELS, DEFAULT_MODEL
+        from .periods import resolve_period
+        self.model_name = model if model in MODELS else DEFAULT_MODEL
+        super().__init__(f"Per-Product Sales Forecast ({MODELS[self.model_name].label})")
+        self.horizon = horizon
+        self.granularity, self.start, self.end = resolve_period(granularity, start, end)
+        self.products = []
+        self.periods = []
+        self.forecasts = {}
+        self.model_stats = {}
+    
+    def fetch_data(self):
+        """Build the products x periods revenue matrix for the range"""
+        from .periods import periods_in_range, revenue_by_period
+        
+        totals = revenue_by_period(self.granularity, self.start, self.end, by_product=True)
+        self.products = list(Product.objects.values_list('id', 'name'))
+        self.periods = periods_in_range(self.granularity, self.start, self.end)
+        
+        row_of = {product_id: i for i, (product_id, _) in enumerate(self.products)}
+        col_of = {period: j for j, period in enumerate(self.periods)}
+        
+        self.data = np.zeros((len(self.products), len(self.periods)))
+        for (product_id, period), total in totals.items():
+            if product_id in row_of and period in col_of:
+                self.data[row_of[product_id], col_of[period]] = float(total)
+        
+        return self.data
+    
+    def process_data(self):
+        """Forecast every product in one batched solve, or with its persisted model"""
+        from .forecasting import SEASON_LENGTHS
+        from .model_store import fitted_models
+        from .periods import periods_in_range
+        
+        if self.model_name == 'linear':
+            return self._process_linear()
+        
+        if self.data is None:
+            self.products = list(Product.objects.values_list('id', 'name'))
+            self.periods = periods_in_range(self.granularity, self.start, self.end)
+        
+        if len(self.periods) < 2:
+            return None
+        
+        def load_series():
+            if self.data is None:
+                self.fetch_data()
+            return {product_id: self.data[i] for i, (product_id, _) in enumerate(self.products)}
+        
+        models, self.model_stats = fitted_models(
+            ('products', self.granularity), self.model_name,
+            load_series, SEASON_LENGTHS[self.granularity], window=(self.start, self.end),
+        )
+        
+        self.forecasts = {}
+        for product_id, name in self.products:
+            model = models.get(product_id)
+            if model is None:
+                continue
+            self.forecasts[name] = {
+                'predictions': model.predict(self.horizon).tolist(),
+                'slope': model.slope,
+                'intercept': getattr(model, 'intercept', None),
+            }
+        
+        return self.forecasts
+    
+    def _process_linear(self):
+        """Fit every product's trend in one vectorized solve"""
+        from .forecasting import forecast_linear
+        
+        if self.data is None:
+            self.fetch_data()
+        
+        if len(self.periods) < 2:
+            return None
+        
+        result = forecast_linear(self.data, horizon=self.horizon)
+        self.model_stats = {'loaded': 0, 'fitted': len(self.products), 'kept': 0}
+        
+        self.forecasts = {
+            name: {
+                'predictions': result['predictions'][i].tolist(),
+                'slope': float(result['slopes'][i]),
+                'intercept': float(result['intercepts'][i]),
+            }
+            for i, (_, name) in enumerate(self.products)
+        }
+        
+        return self.forecasts
+    
+    def get_summary(self):
+        """Return formatted per-product forecasts"""
+        from .forecasting import MODELS
+        
+        if not self.forecasts:
+            self.process_data()
+        
+        if not self.forecasts:
+            return None
+        
+        return {
+            'title': self.get_title(),
+            'timestamp': self.get_timestamp(),
+            'products': [
+                {
+                    'product': name,
+                    'next_period_prediction': f"₱{f['predictions'][0]:,.2f}",
+                    'trend_slope': f"₱{f['slope']:,.2f} per {self.granularity}",
+                }
+                for name, f in self.forecasts.items()
+            ],
+            'model_info': MODELS[self.model_name].label,
+        }
+
+
+class MoversReport(GenericReport):
+    """
+    Child Class: Top Movers Report
+    
+    Inherits from GenericReport and compares every product's revenue over
+    the last `days` days with the `days` before them.  The comparison,
+    ranking and category totals come from one windowed SQL query (LAG and
+    RANK) in movers.py.
+    """
+    
+    def __init__(self, days=30, end=None, top_k=5):
+        super().__init__("Top Movers Report")
+        from .movers import comparison_periods
+        self.days = days
+        self.top_k = top_k
+        (self.start, self.end), (self.previous_start, self.previous_end) = comparison_periods(days, end)
+        self.movers = {}
+    
+    def fetch_data(self):
+        """Fetch the ranked period-over-period comparison"""
+        from .movers import top_movers
+        self.data = top_movers(self.days, self.end, self.top_k)
+        return self.data
+    
+    def process_data(self):
+        """Split the ranked rows into gainers, losers and categories"""
+        if self.data is None:
+            self.fetch_data()
+        
+        ranked = [row for row in self.data if row['in_top_k']]
+        gainers = sorted([r for r in ranked if r['delta'] > 0], key=lambda r: r['gain_rank'])
+        losers = sorted([r for r in ranked if r['delta'] < 0], key=lambda r: r['loss_rank'])
+        
+        categories = {}
+        for row in self.data:
+            categories.setdefault(row['category'], {
+                'name': row['category'],
+                'revenue': row['category_revenue'],
+                'previous_revenue': row['category_previous_revenue'],
+                'delta': row['category_delta'],
+                'percent': row['category_percent'],
+            })
+        
+        self.movers = {
+            'gainers': gainers[:self.top_k],
+            'losers': losers[:self.top_k],
+            'categories': sorted(categories.values(), key=lambda c: c['delta'], reverse=True),
+        }
+        return self.movers
+    
+    def get_summary(self):
+        """Return formatted top movers"""
+        if not self.movers:
+            self.process_data()
+        
+        def describe(row):
+            percent = f"{row['percent']:+.1f}%" if row['percent'] is not None else 'new'
+            return {
+                'name': row['name'],
+                'revenue': f"₱{row['revenue']:,.2f}",
+                'previous_revenue': f"₱{row['previous_revenue']:,.2f}",
+                'delta': f"₱{row['delta']:+,.2f}",
+                'percent': percent,
+            }
+        
+        return {
+            'title': self.get_title(),
+            'timestamp': self.get_timestamp(),
+            'current_period': f"{self.start} to {self.end}",
+            'previous_period': f"{self.previous_start} to {self.previous_end}",
+            'top_gainers': [describe(r) for r in self.movers['gainers']],
+            'top_losers': [describe(r) for r in self.movers['losers']],
+            'categories': [describe(c) for c in self.movers['categories']],
+        }
+
+
+class AnomalyReport(GenericReport):
+    """
+    Child Class: Anomaly Report
+    
+    Inherits from GenericReport and lists product days whose revenue is
+    far from both the rolling mean and the same-weekday mean.  All
+    products are scored at once on a NumPy day matrix (anomalies.py).
+    Ranges longer than ANOMALY_MAX_DAYS keep their last days only.
+    """
+    
+    def __init__(self, start=None, end=None, window=None, threshold=None, product_ids=None):
+        super().__init__("Sales Anomaly Report")
+        from .anomalies import DEFAULT_DAYS, DEFAULT_WINDOW, DEFAULT_THRESHOLD, max_days
+        from datetime import date, timedelta
+        self.end = end or date.today()
+        self.start = start or self.end - timedelta(days=DEFAULT_DAYS - 1)
+        if self.start > self.end:
+            self.start, self.end = self.end, self.start
+        # Longer ranges are cut to their last ANOMALY_MAX_DAYS days
+        self.clamped = (self.end - self.start).days >= max_days()
+        if self.clamped:
+            self.start = self.end - timedelta(days=max_days() - 1)
+        self.window = window or DEFAULT_WINDOW
+        self.threshold = threshold or DEFAULT_THRESHOLD
+        self.product_ids = product_ids
+        self.anomalies = None
+    
+    def fetch_data(self):
+        """Score every product day in the range"""
+        from .anomalies import detect_anomalies
+        self.data = detect_anomalies(
+            self.start, self.end, self.window, self.threshold, self.product_ids
+        )
+        return self.data
+    
+    def process_data(self):
+        """Split anomalies into spikes and drops"""
+        if self.data is None:
+            self.fetch_data()
+        
+        self.anomalies = {
+            'all': self.data,
+            'spikes': [a for a in self.data if a['kind'] == 'spike'],
+            'drops': [a for a in self.data if a['kind'] == 'drop'],
+        }
+        return self.anomalies
+    
+    def get_summary(self):
+        """Return formatted anomalies"""
+        if self.anomalies is None:
+            self.process_data()
+        
+        return {
+            'title': self.get_title(),
+            'timestamp': self.get_timestamp(),
+            'period': f"{self.start} to {self.end}",
+            'window_days': self.window,
+            'threshold': self.threshold,
+            'spikes': len(self.anomalies['spikes']),
+            'drops': len(self.anomalies['drops']),
+            'anomalies': [
+                {
+                    'date': str(a['date']),
+                    'product': a['product'],
+                    'kind': a['kind'],
+                    'revenue': f"₱{a['revenue']:,.2f}",
+                    'expected': f"₱{a['expected']:,.2f}",
+                    'zscore': f"{a['zscore']:+.2f}",
+                }
+                for a in self.anomalies['all']
+            ],
+        }
+
+
+class PriceSimulationReport(GenericReport):
+    """
+    Child Class: Price Simulation Report
+    
+    Inherits from GenericReport and projects revenue, cost and profit for
+    a grid of price changes and elasticities.  All scenarios are computed
+    in one broadcast over (elasticities, changes, products) (whatif.py).
+    """
+    
+    def __init__(self, changes, elasticities, days=None, category=None, product_id=None):
+        super().__init__("Price What-If Report")
+        from .whatif import DEFAULT_DAYS
+        self.changes = changes
+        self.elasticities = elasticities
+        self.days = days or DEFAULT_DAYS
+        self.category = category
+        self.product_id = product_id
+        self.result = None
+        self.simulation = None
+    
+    def fetch_data(self):
+        """Baseline units, prices and costs per product"""
+        from .whatif import cached_baseline
+        self.data = cached_baseline(self.days)
+        return self.data
+    
+    def process_data(self):
+        """Run every scenario and pick the most profitable changes"""
+        if self.data is None:
+            self.fetch_data()
+        from .whatif import simulate, scope_mask, best_changes, product_profit
+        
+        mask = scope_mask(self.data, self.category, self.product_id)
+        self.result = simulate(self.data, self.changes, self.elasticities, mask)
+        best = best_changes(self.data, self.result)
+        profit_by_product = product_profit(self.data, self.result)
+        totals = self.result['totals']
+        changes = self.result['changes']
+        
+        self.simulation = {
+            'baseline': self.result['baseline'],
+            'scope_products': int(mask.sum()),
+            'curves': [
+                {
+                    'elasticity': float(e),
+                    'revenue': totals['revenue'][i].round(2).tolist(),
+                    'cost': totals['cost'][i].round(2).tolist(),
+                    'profit': totals['profit'][i].round(2).tolist(),
+                    'units': totals['units'][i].round(2).tolist(),
+                }
+                for i, e in enumerate(self.result['elasticities'])
+            ],
+            'best': [
+                {
+                    'elasticity': float(e),
+                    'change': float(changes[best['totals'][i]]),
+                    'revenue': float(totals['revenue'][i, best['totals'][i]]),
+                    'profit': float(totals['profit'][i, best['totals'][i]]),
+                    'profit_delta': float(totals['profit'][i, best['totals'][i]]) - self.result['baseline']['profit'],
+                }
+                for i, e in enumerate(self.result['elasticities'])
+            ],
+            # Each product's own best change under the first elasticity
+            'products': [
+                {
+                    'id': self.data['ids'][p],
+                    'name': self.data['names'][p],
+                    'category': self.data['categories'][p],
+                    'in_scope': bool(mask[p]),
+                    'price': float(self.data['price'][p]),
+                    'units': float(self.data['units'][p]),
+                    'best_change': float(changes[best['products'][p]]),
+                    'best_price': float(self.data['price'][p] * (1 + changes[best['products'][p]] / 100)),
+                    'profit': float(self.data['units'][p] * (self.data['price'][p] - self.data['cost'][p])),
+                    'best_profit': float(profit_by_product[best['products'][p], p]),
+                }
+                for p in range(len(self.data['ids']))
+            ],
+        }
+        return self.simulation
+    
+    def get_summary(self):
+        """Return formatted best scenarios"""
+        if self.simulation is None:
+            self.process_data()
+        
+        baseline = self.simulation['baseline']
+        return {
+            'title': self.get_title(),
+            'timestamp': self.get_timestamp(),
+            'period': f"{self.data['start']} to {self.data['end']}",
+            'scenarios': len(self.changes) * len(self.elasticities),
+            'baseline_profit': f"₱{baseline['profit']:,.2f}",
+            'best': [
+                {
+                    'elasticity': f"{b['elasticity']:+.2f}",
+                    'change': f"{b['change']:+.1f}%",
+                    'profit': f"₱{b['profit']:,.2f}",
+                    'profit_delta': f"₱{b['profit_delta']:+,.2f}",
+                }
+                for b in self.simulation['best']
+            ],
+        }
+
+
+class BacktestReport(GenericReport):
+    """
+    Child Class: Forecast Backtest Report
+    
+    Inherits from GenericReport and measures how well each forecasting
+    model would have predicted past revenue, replaying history with a
+    rolling origin (backtest.py).  The replays run in parallel through
+    ParallelReportRunner; results are cached per data version.  History
+    ends at the last sale, so the cache key does not change with the date,
+    and ranges over BACKTEST_MAX_PERIODS raise ValueError.
+    """
+    
+    def __init__(self, granularity='month', start=None, end=None, models=None, horizon=None, runner=None):
+        super().__init__("Forecast Backtest Report")
+        from .backtest import DEFAULT_HORIZON, MAX_HORIZON, first_sale_date, last_sale_date, max_periods
+        from .forecasting import MODELS
+        from .periods import resolve_period, periods_in_range
+        self.granularity, self.start, self.end = resolve_period(granularity, start or first_sale_date(), end)
+        last_sale = last_sale_date()
+        if last_sale and self.start <= last_sale < self.end:
+            self.end = last_sale   # later periods would only add zeros
+        self.models = [m for m in (models or MODELS) if m in MODELS]
+        self.horizon = min(max(horizon or DEFAULT_HORIZON, 1), MAX_HORIZON)
+        self.runner = runner
+        self.periods = []
+        self.results = None
+        
+        n_periods = len(periods_in_range(self.granularity, self.start, self.end))
+        if n_periods > max_periods():
+            raise ValueError(
+                f"{self.start} to {self.end} is {n_periods} {self.granularity}s; a backtest covers at most "
+                f"{max_periods()}. Choose a shorter range or a coarser granularity."
+            )
+    
+    def fetch_data(self):
+        """Revenue per period for every product and in total"""
+        from .backtest import revenue_series_by_product
+        self.periods, self.data = revenue_series_by_product(self.granularity, self.start, self.end)
+        return self.data
+    
+    def cache_key(self):
+        from .versioning import data_version
+        return (
+            f'backtest:{self.granularity}:{self.start}:{self.end}:{",".join(self.models)}:'
+            f'{self.horizon}:{data_version()}'
+        )
+    
+    def cached_results(self):
+        """The stored results for the current data, or None (never replays)"""
+        from .backtest import result_cache
+        self.results = result_cache().get(self.cache_key())
+        return self.results
+    
+    def process_data(self):
+        """Replay every model on every series (cached until the data changes)"""
+        from .backtest import run_backtest, result_cache, cache_timeout
+        from .forecasting import SEASON_LENGTHS
+        
+        def compute():
+            if self.data is None:
+                self.fetch_data()
+            return run_backtest(
+                self.data, self.models, SEASON_LENGTHS[self.granularity], self.horizon, runner=self.runner,
+            )
+        
+        self.results = result_cache().get_or_set(self.cache_key(), compute, cache_timeout())
+        return self.results
+    
+    def store(self, results):
+        """Save results replayed elsewhere (backtest_forecasts) for the eval page"""
+        from .backtest import result_cache, cache_timeout
+        self.results = results
+        result_cache().set(self.cache_key(), results, cache_timeout())
+    
+    def get_summary(self):
+        """Return formatted accuracy per model"""
+        if self.results is None:
+            self.process_data()
+        
+        def percent(value):
+            return f"{value:.1f}%" if value is not None else 'n/a'
+        
+        def peso(value):
+            return f"₱{value:,.2f}" if value is not None else 'n/a'
+        
+        return {
+            'title': self.get_title(),
+            'timestamp': self.get_timestamp(),
+            'period': f"{self.start} to {self.end}",
+            'granularity': self.granularity,
+            'horizon': self.horizon,
+            'models': {
+                model: {
+                    'mae': peso(overall['mae']),
+                    'mape': percent(overall['mape']),
+                    'rmse': peso(overall['rmse']),
+                    'forecasts': overall['forecasts'],
+                    'by_horizon': [
+                        {'horizon': h['horizon'], 'mae': peso(h['mae']), 'mape': percent(h['mape']), 'rmse': peso(h['rmse'])}
+                        for h in self.results['by_horizon'][model]
+                    ],
+                }
+                for model, overall in self.results['overall'].items()
+            },
+        }
@@ -0,0 +1,62 @@
+"""
+Database Routing: Read Replica for Reports
+
+Report and export views only read from the database, so they can be served
+from a read-only replica connection while CRUD views keep using the primary.
+The routing decision is made per request by ReportReadMiddleware, which marks
+the current request as a report read.  The router itself only looks at that
+mark, so any query made outside a report view still goes to the primary.
+"""
+
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+REPLICA_ALIAS = 'replica'
+PRIMARY_ALIAS = 'default'
+
+# Set to True by ReportReadMiddleware while a report view is running
+_report_read = ContextVar('report_read', default=False)
+
+
+def use_replica(enabled=True):
+    """Mark the current context as a report read; returns a reset token"""
+    return _report_read.set(enabled)
+
+
+def reset_replica(token):
+    """Undo a previous use_replica() call"""
+    _report_read.reset(token)
+
+
+def replica_available():
+    """Return True if a replica alias is configured"""
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+class ReportReadRouter:
+    """
+    Sends report reads to the replica and everything else to the primary.
+
+    Writes always go to the primary.  Both aliases point at the same data,
+    so relations between objects loaded from either are allowed, and
+    migrations only run against the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _report_read.get() and replica_available():
+            return REPLICA_ALIAS
+        return PRIMARY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_ALIAS
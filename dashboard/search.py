@@ -0,0 +1,120 @@
+"""
+Full-Text Product Search (SQLite FTS5)
+
+dashboard_product_fts is an FTS5 index over product name and category.  It
+is an external-content table - the text itself lives in dashboard_product -
+kept in sync by triggers, so every write path (ORM saves, bulk operations,
+raw SQL) updates it.
+
+Searches return matching product ids, which the views then use to filter
+SalesData through the indexed product_id column instead of a LIKE scan
+joined across every sale.  On databases without FTS5 the search falls back
+to a case-insensitive name/category match.
+"""
+
+import re
+
+from django.db import connections, router, OperationalError, DatabaseError
+from django.db.models import Q
+
+from .models import Product
+
+
+FTS_TABLE = 'dashboard_product_fts'
+
+INSTALL_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, category,
+        content='dashboard_product', content_rowid='id',
+        tokenize='unicode61', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON dashboard_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, category)
+        VALUES (new.id, new.name, new.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON dashboard_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON dashboard_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, name, category)
+        VALUES (new.id, new.name, new.category);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+UNINSTALL_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def install_search_index(connection):
+    """
+    Create the FTS5 table and sync triggers if missing, then rebuild.
+
+    Safe to run repeatedly.  It also runs after every migrate, because
+    SQLite drops a table's triggers when a migration rebuilds that table.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for sql in INSTALL_SQL:
+            cursor.execute(sql)
+
+
+def uninstall_search_index(connection):
+    """Drop the FTS5 table and its triggers"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for sql in UNINSTALL_SQL:
+            cursor.execute(sql)
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term ("gam"* matches "gaming") and
+    terms are ANDed, so "gam lap" finds "Gaming Laptop Pro".  Quoting keeps
+    user input from being parsed as FTS5 syntax.
+    """
+    terms = re.findall(r'\w+', text.lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_product_ids(text):
+    """Return the ids of products whose name or category match ``text``"""
+    match = build_match_query(text)
+    if not match:
+        return []
+
+    connection = connections[router.db_for_read(Product)]
+    if connection.vendor == 'sqlite':
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                    [match],
+                )
+                return [row[0] for row in cursor.fetchall()]
+        except (OperationalError, DatabaseError):
+            pass  # FTS5 not available; fall back below
+
+    query = Q()
+    for term in re.findall(r'\w+', text):
+        query &= Q(name__icontains=term) | Q(category__icontains=term)
+    return list(Product.objects.filter(query).values_list('id', flat=True))
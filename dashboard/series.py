@@ -0,0 +1,58 @@
+"""
+Chart Series
+
+Builds the data series shown by the dashboard charts.  The same functions
+feed the Chart.js pages (views.py) and the server-side matplotlib renderer
+(charts.py), so both always show identical numbers.  Revenue trends are
+built by periods.revenue_series().
+"""
+
+import numpy as np
+
+from .models import Product, SalesData
+from .archive import annotate_product_totals
+
+
+MARKET_COLORS = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6']
+
+
+def transaction_revenues(product_name=None):
+    """NumPy array of per-transaction revenue (hot detail rows)"""
+    sales_qs = SalesData.objects.all()
+    if product_name:
+        sales_qs = sales_qs.filter(product__name__iexact=product_name)
+    return np.array([float(r) for r in sales_qs.values_list('revenue', flat=True)])
+
+
+def revenue_distribution(revenues, bins=10):
+    """Histogram of transaction revenue: (labels, counts)"""
+    if len(revenues) == 0:
+        return [], []
+
+    hist, bin_edges = np.histogram(revenues, bins=bins)
+    labels = [f'₱{int(bin_edges[i])}-{int(bin_edges[i+1])}' for i in range(len(hist))]
+    return labels, hist.tolist()
+
+
+def market_share(product_sales=None):
+    """
+    Revenue share per product, largest first.
+
+    product_sales is a Product queryset annotated with total_sales; it is
+    built here when not given.  Returns (products, revenues, percentages),
+    only including products that have sales.
+    """
+    if product_sales is None:
+        product_sales = annotate_product_totals(Product.objects.all()).order_by('-total_sales')
+
+    products = []
+    revenues = []
+    for product in product_sales:
+        if product.total_sales:
+            products.append(product.name)
+            revenues.append(float(product.total_sales))
+
+    total = sum(revenues) if revenues else 1
+    percentages = [(rev / total * 100) for rev in revenues]
+
+    return products, revenues, percentages
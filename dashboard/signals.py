@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Product, SalesData, DailySalesArchive
+from . import versioning, live, changelog
+from .auth import forget_user
+
+
+@receiver([post_save, post_delete], sender=SalesData)
+@receiver([post_save, post_delete], sender=DailySalesArchive)
+def sales_changed(sender, using, **kwargs):
+    """Invalidate caches built from sales data and wake live dashboards"""
+    versioning.bump_once(versioning.SALES, using)
+    live.notify_on_commit(using)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def catalog_changed(sender, using, **kwargs):
+    """Invalidate caches built from the product catalog and wake live dashboards"""
+    versioning.bump_once(versioning.CATALOG, using)
+    live.notify_on_commit(using)
+
+
+@receiver(post_save, sender=SalesData)
+@receiver(post_save, sender=Product)
+def log_save(sender, instance, created, using, **kwargs):
+    """Append the write to the change feed"""
+    changelog.record(instance, 'create' if created else 'update', using)
+
+
+@receiver(post_delete, sender=SalesData)
+@receiver(post_delete, sender=Product)
+def log_delete(sender, instance, using, **kwargs):
+    """Append the delete (or archive) to the change feed"""
+    changelog.record(instance, changelog.delete_op(), using)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    """Drop the cached copy used by CachedModelBackend"""
+    forget_user(instance.pk)
@@ -1,3 +1,1389 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.paginator import EmptyPage
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.db.backends.utils import CursorWrapper
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .middleware import PRIMARY_PIN_COOKIE
+from .models import Product, SalesData, DailySalesArchive, CalendarDate, ExportJob, ChangeLog
+from .pagination import EstimatedCountPaginator
+from .profiling import QueryProfiler, query_shape
+from .management.commands import bench_writes
+from .reports import ReportBatch, SalesReport, MarketShareReport, PredictionReport, ProductForecastReport, BacktestReport
+from .writequeue import WriteQueue, WriteQueueFull, WriteTimeout
+from . import anomalies, archive, auth, changelog, exports, forecasting, live, model_store, movers, periods, rangeindex, routers, search, versioning, whatif, writequeue
+
+
+def make_product(name='Widget', category='Tools', price='10.00', cost='6.00'):
+    return Product.objects.create(name=name, category=category, price=Decimal(price), cost=Decimal(cost))
+
+
+def make_sale(product, day, quantity=1, revenue='10.00', cost='6.00'):
+    return SalesData.objects.create(
+        product=product, date=day, quantity=quantity, revenue=Decimal(revenue), cost=Decimal(cost),
+    )
+
+
+class CompactSalesTests(TestCase):
+    def setUp(self):
+        self.widget = make_product()
+        self.cutoff = date(2024, 3, 1)
+        for day in (date(2024, 1, 5), date(2024, 1, 5), date(2024, 2, 10), date(2024, 3, 2)):
+            make_sale(self.widget, day, quantity=2, revenue='20.00', cost='12.00')
+
+    def test_totals_survive_compaction(self):
+        before = archive.period_totals()
+
+        rows, days = archive.compact_sales(self.cutoff)
+
+        self.assertEqual((rows, days), (3, 2))
+        self.assertEqual(archive.period_totals(), before)
+        self.assertEqual(SalesData.objects.count(), 1)
+        january = DailySalesArchive.objects.get(date=date(2024, 1, 5))
+        self.assertEqual((january.quantity, january.transactions), (4, 2))
+
+    def test_merges_into_existing_archive_rows(self):
+        archive.compact_sales(self.cutoff)
+        make_sale(self.widget, date(2024, 1, 5), quantity=1)
+
+        archive.compact_sales(self.cutoff)
+
+        january = DailySalesArchive.objects.get(date=date(2024, 1, 5))
+        self.assertEqual((january.quantity, january.transactions), (5, 3))
+
+    def test_rows_inserted_during_compaction_are_kept(self):
+        # A sale committed after the rollup was read must not be deleted
+        # unarchived by the delete that follows it
+        bulk_create = DailySalesArchive.objects.bulk_create
+
+        def insert_meanwhile(*args, **kwargs):
+            make_sale(self.widget, date(2024, 1, 20))
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(DailySalesArchive.objects, 'bulk_create', side_effect=insert_meanwhile):
+            rows, _ = archive.compact_sales(self.cutoff)
+
+        self.assertEqual(rows, 3)
+        self.assertTrue(SalesData.objects.filter(date=date(2024, 1, 20)).exists())
+        self.assertEqual(archive.period_totals()['transactions'], 5)
+
+
+class ModelStoreTests(TestCase):
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir, ignore_errors=True)
+        override = override_settings(FORECAST_MODEL_DIR=Path(self.model_dir))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def model_files(self):
+        return sorted(p.name for p in Path(self.model_dir).glob('*.joblib'))
+
+    @override_settings(FORECAST_MODEL_WINDOWS=3)
+    def test_windows_are_capped_per_group(self):
+        for end in range(4, 10):
+            model_store.fitted_models(
+                ('total', 'month'), 'holt_winters', lambda: {'total': list(range(end))}, window=(0, end),
+            )
+        model_store.fitted_models(('products', 'month'), 'holt_winters', lambda: {}, window=(0, 4))
+
+        self.assertEqual(len(self.model_files()), 4)
+
+    def test_windows_do_not_replace_each_other(self):
+        load = mock.Mock(return_value={'total': [1.0, 2.0, 3.0]})
+        with mock.patch.object(model_store, 'prune') as prune:
+            for window in [('a', 'b'), ('a', 'c')] * 3:
+                model_store.fitted_models(('total', 'month'), 'linear', load, window=window)
+
+        self.assertEqual(load.call_count, 2)
+        self.assertEqual(len(self.model_files()), 2)
+        prune.assert_not_called()
+
+    def test_same_version_and_window_skips_loading(self):
+        load = mock.Mock(return_value={'total': [1.0, 2.0, 3.0]})
+        model_store.fitted_models(('total', 'month'), 'linear', load, window=('a', 'b'))
+        models, stats = model_store.fitted_models(('total', 'month'), 'linear', load, window=('a', 'b'))
+
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(stats['loaded'], 1)
+        self.assertEqual(models['total'].predict(1)[0], 4.0)
+
+        _, stats = model_store.fitted_models(('total', 'month'), 'linear', load, window=('a', 'c'))
+        self.assertEqual(load.call_count, 2)
+        self.assertEqual(stats['kept'], 1)
+
+    def test_prune_removes_stale_files(self):
+        model_store.fitted_models(('total', 'month'), 'linear', lambda: {'total': [1.0, 2.0]})
+        stale = Path(self.model_dir) / 'linear-0000000000000000.joblib'
+        stale.write_bytes(b'')
+        old = time.time() - 3600
+        os.utime(stale, (old, old))
+
+        call_command('prune_forecast_models', max_age=60, stdout=StringIO())
+        self.assertFalse(stale.exists())
+        self.assertEqual(len(self.model_files()), 1)
+
+    def test_linear_product_forecasts_are_batched(self):
+        widget, gadget = make_product('Widget'), make_product('Gadget')
+        for month, (a, b) in enumerate([(10, 50), (20, 40), (30, 30)], start=1):
+            make_sale(widget, date(2024, month, 15), revenue=a)
+            make_sale(gadget, date(2024, month, 15), revenue=b)
+
+        report = ProductForecastReport(granularity='month', start=date(2024, 1, 1), end=date(2024, 3, 31))
+        with mock.patch.object(model_store, 'fitted_models') as store:
+            forecasts = report.process_data()
+
+        store.assert_not_called()
+        self.assertEqual(self.model_files(), [])
+        for name, values in (('Widget', [10, 20, 30]), ('Gadget', [50, 40, 30])):
+            expected = forecasting.fit_model('linear', values).predict(3)
+            np.testing.assert_allclose(forecasts[name]['predictions'], expected)
+
+
+class ExportJobTests(TestCase):
+    def setUp(self):
+        self.export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_dir, ignore_errors=True)
+        override = override_settings(EXPORT_DIR=Path(self.export_dir), EXPORT_RUN_IN_PROCESS=False)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        make_sale(make_product(), date(2024, 1, 5))
+
+    def test_pending_job_is_reused_for_its_user(self):
+        job, created = exports.request_export('csv', user=self.alice)
+        again, created_again = exports.request_export('csv', user=self.alice)
+        other, created_other = exports.request_export('csv', user=self.bob)
+
+        self.assertTrue(created)
+        self.assertEqual((again.pk, created_again), (job.pk, False))
+        self.assertTrue(created_other)
+        self.assertNotEqual(other.pk, job.pk)
+
+    def test_stale_jobs_are_failed_and_requeued(self):
+        job, _ = exports.request_export('csv', user=self.alice)
+        long_ago = timezone.now() - timedelta(hours=2)
+        ExportJob.objects.filter(pk=job.pk).update(created_at=long_ago)
+
+        fresh, created = exports.request_export('csv', user=self.alice)
+
+        self.assertTrue(created)
+        self.assertNotEqual(fresh.pk, job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_expired_running_job_does_not_finish(self):
+        job, _ = exports.request_export('csv', user=self.alice)
+        self.assertTrue(exports.claim(job.pk))
+        ExportJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+        exports.expire_stale_jobs()
+
+        exports.run_job(ExportJob.objects.get(pk=job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(list(Path(self.export_dir).iterdir()), [])
+
+    def test_jobs_are_private_to_their_user(self):
+        job, _ = exports.request_export('csv', user=self.alice)
+        self.assertTrue(exports.claim(job.pk))
+        exports.run_job(ExportJob.objects.get(pk=job.pk))
+
+        self.client.force_login(self.bob)
+        self.assertEqual(self.client.get(reverse('export_status', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export_download', args=[job.pk])).status_code, 404)
+
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(reverse('export_status', args=[job.pk])).status_code, 200)
+        response = self.client.get(reverse('export_download', args=[job.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Widget', b''.join(response.streaming_content))
+
+    def test_old_export_files_are_pruned(self):
+        old_job, _ = exports.request_export('csv', user=self.alice)
+        exports.claim(old_job.pk)
+        exports.run_job(ExportJob.objects.get(pk=old_job.pk))
+        old_job.refresh_from_db()
+        week_ago = time.time() - 8 * 24 * 3600
+        os.utime(old_job.file_path, (week_ago, week_ago))
+
+        job, _ = exports.request_export('json', user=self.alice)
+        exports.claim(job.pk)
+        exports.run_job(ExportJob.objects.get(pk=job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual([p.name for p in Path(self.export_dir).iterdir()], [Path(job.file_path).name])
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(reverse('export_download', args=[old_job.pk])).status_code, 404)
+        again, created = exports.request_export('csv', user=self.alice)
+        self.assertTrue(created)
+
+
+def use_temp_range_index(test):
+    """Point the range index at a fresh file for the duration of a test"""
+    index_dir = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, index_dir, ignore_errors=True)
+    override = override_settings(RANGE_INDEX_PATH=Path(index_dir) / 'range_index.joblib')
+    override.enable()
+    test.addCleanup(override.disable)
+    rangeindex._index = None
+    test.addCleanup(setattr, rangeindex, '_index', None)
+
+
+class SetBasedUpdateFeedTests(TransactionTestCase):
+    # Real commits: inside one test transaction versioning.bump_once bumps
+    # only for the first write
+    def setUp(self):
+        self.widget = make_product()
+        self.sales = [make_sale(self.widget, date(2024, 1, day)) for day in (1, 2, 3)]
+
+    def test_update_is_logged_and_bumps_the_version(self):
+        head = ChangeLog.objects.order_by('-seq').first().seq
+        version = versioning.current(versioning.SALES)[0]
+
+        rows = SalesData.objects.filter(date__lte=date(2024, 1, 2)).update(revenue=Decimal('99.00'))
+
+        self.assertEqual(rows, 2)
+        changes = list(ChangeLog.objects.filter(seq__gt=head))
+        self.assertEqual(sorted(c.object_id for c in changes), [self.sales[0].pk, self.sales[1].pk])
+        self.assertEqual({c.op for c in changes}, {'update'})
+        self.assertEqual({c.data['revenue'] for c in changes}, {'99.00'})
+        self.assertGreater(versioning.current(versioning.SALES)[0], version)
+
+    def test_bulk_update_is_logged(self):
+        head = ChangeLog.objects.order_by('-seq').first().seq
+        version = versioning.current(versioning.CATALOG)[0]
+        self.widget.price = Decimal('12.50')
+
+        Product.objects.bulk_update([self.widget], ['price'])
+
+        change = ChangeLog.objects.get(seq__gt=head)
+        self.assertEqual((change.entity, change.op, change.data['price']), ('product', 'update', '12.50'))
+        self.assertGreater(versioning.current(versioning.CATALOG)[0], version)
+
+    def test_range_index_sees_set_based_updates(self):
+        use_temp_range_index(self)
+        self.assertEqual(rangeindex.range_totals(date(2024, 1, 1), date(2024, 1, 3))['revenue'], 30.0)
+
+        SalesData.objects.filter(date=date(2024, 1, 2)).update(revenue=Decimal('1.00'))
+
+        self.assertEqual(rangeindex.range_totals(date(2024, 1, 1), date(2024, 1, 3))['revenue'], 21.0)
+        self.assertEqual(rangeindex.range_totals(date(2024, 1, 2), date(2024, 1, 2))['revenue'], 1.0)
+
+
+class RangeIndexTests(TransactionTestCase):
+    # Real commits, so every write bumps the sales version the index checks
+    def setUp(self):
+        self.today = date.today()
+        # TransactionTestCase truncates the calendar the migration filled
+        periods.build_calendar(self.today - timedelta(days=400), self.today)
+        use_temp_range_index(self)
+        self.widget = make_product()
+        self.gadget = make_product(name='Gadget', category='Toys')
+        for days_ago in range(10, 70, 3):
+            day = self.today - timedelta(days=days_ago)
+            make_sale(self.widget, day, quantity=2, revenue='20.00', cost='12.00')
+            make_sale(self.gadget, day, quantity=1, revenue='35.00', cost='20.00')
+        rangeindex.rebuild()
+
+    def days_ago(self, days):
+        return self.today - timedelta(days=days)
+
+    def assert_matches_sales_tables(self):
+        ranges = [
+            (self.days_ago(200), self.today), (self.days_ago(70), self.days_ago(40)),
+            (self.days_ago(12), self.days_ago(12)), (self.days_ago(5), self.today),
+        ]
+        for start, end in ranges:
+            for name in (None, 'Widget', 'Gadget'):
+                with self.subTest(start=start, end=end, product=name):
+                    expected = archive.period_totals(start, end, name)
+                    totals = rangeindex.range_totals(start, end, product_name=name)
+                    for field in ('revenue', 'cost', 'quantity', 'transactions'):
+                        self.assertAlmostEqual(totals[field], float(expected[field]))
+        for granularity in ('day', 'week', 'month'):
+            for name in (None, 'Widget'):
+                with self.subTest(granularity=granularity, product=name):
+                    start = self.days_ago(120)
+                    self.assertEqual(
+                        rangeindex.revenue_series(granularity, start, self.today, name),
+                        periods.revenue_series(granularity, start, self.today, name),
+                    )
+
+    def test_matches_after_build(self):
+        self.assert_matches_sales_tables()
+
+    def test_backdated_creates(self):
+        make_sale(self.widget, self.days_ago(30), quantity=5, revenue='50.00', cost='30.00')
+        self.assert_matches_sales_tables()
+
+        # Before the first indexed day: the index is rebuilt
+        make_sale(self.gadget, self.days_ago(150), quantity=1, revenue='7.00', cost='3.00')
+        self.assert_matches_sales_tables()
+        with rangeindex.current_index() as index:
+            self.assertEqual(index.start, self.days_ago(150))
+
+    def test_moves_and_deletes(self):
+        self.assert_matches_sales_tables()
+        sale = SalesData.objects.filter(product=self.widget, date=self.days_ago(13)).get()
+        sale.date = self.days_ago(61)
+        sale.save()
+        self.assert_matches_sales_tables()
+
+        # Moved back forward again: both days it ever had are recomputed
+        sale.date = self.days_ago(25)
+        sale.save()
+        self.assert_matches_sales_tables()
+
+        SalesData.objects.filter(product=self.gadget, date=self.days_ago(40)).get().delete()
+        SalesData.objects.filter(date=self.days_ago(52)).update(date=self.days_ago(10))
+        self.assert_matches_sales_tables()
+
+    def test_compaction_keeps_totals(self):
+        archive.compact_sales(self.days_ago(30))
+
+        self.assertFalse(SalesData.objects.filter(date__lt=self.days_ago(30)).exists())
+        self.assert_matches_sales_tables()
+
+    def test_deleted_product_with_archived_sales_only(self):
+        archive.compact_sales(self.days_ago(5))
+        self.assert_matches_sales_tables()
+        self.assertFalse(SalesData.objects.filter(product=self.gadget).exists())
+
+        self.gadget.delete()
+
+        self.assertFalse(DailySalesArchive.objects.filter(product_id=self.gadget.pk).exists())
+        self.assert_matches_sales_tables()
+
+    def test_new_days_and_open_day(self):
+        # An index last refreshed a few days ago is extended to yesterday
+        with rangeindex._lock:
+            rangeindex._index = rangeindex.RangeIndex.build(self.days_ago(20))
+        make_sale(self.widget, self.days_ago(3), quantity=1, revenue='11.00', cost='5.00')
+        make_sale(self.gadget, self.today, quantity=4, revenue='44.00', cost='22.00')
+
+        self.assert_matches_sales_tables()
+        with rangeindex.current_index() as index:
+            self.assertEqual(index.last_day, self.days_ago(1))
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=10)
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        widget = make_product()
+        for day in range(1, 31):
+            make_sale(widget, date(2024, 1, day))
+        self.filtered = SalesData.objects.filter(quantity=1).order_by('date')
+
+    def test_small_results_are_exact(self):
+        paginator = EstimatedCountPaginator(self.filtered.filter(date__lte=date(2024, 1, 5)), 2)
+
+        self.assertEqual((paginator.count, paginator.estimated), (5, False))
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
+
+    def test_pages_past_an_estimated_count_are_served(self):
+        paginator = EstimatedCountPaginator(self.filtered, 5)
+        self.assertEqual((paginator.count, paginator.estimated), (11, True))
+
+        last = paginator.page(6)
+
+        self.assertEqual([s.date.day for s in last], [26, 27, 28, 29, 30])
+        with self.assertRaises(EmptyPage):
+            paginator.page(7)
+
+    def test_page_range_continues_while_rows_follow(self):
+        paginator = EstimatedCountPaginator(self.filtered, 5)
+
+        self.assertEqual(list(paginator.get_elided_page_range(3)), [1, 2, 3, 4])
+        self.assertEqual(list(paginator.get_elided_page_range(5)), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(list(paginator.get_elided_page_range(6)), [1, 2, 3, 4, 5, 6])
+
+
+class LargeTableAdminTests(TestCase):
+    def setUp(self):
+        cache.clear()   # date buckets are cached per data version, which restarts every test
+        self.widget = make_product()
+        self.sales = [make_sale(self.widget, date(2024, 1, day)) for day in (1, 2, 3)]
+        self.request = RequestFactory().get('/admin/dashboard/salesdata/')
+        self.request.user = User.objects.create_superuser('admin', password='pw')
+
+    def test_admin_updates_reach_the_change_feed(self):
+        head = ChangeLog.objects.order_by('-seq').first().seq
+        qs = admin.site._registry[SalesData].get_queryset(self.request)
+
+        qs.filter(date__lte=date(2024, 1, 2)).update(quantity=5)
+
+        changes = ChangeLog.objects.filter(seq__gt=head)
+        self.assertEqual(sorted(c.object_id for c in changes), [self.sales[0].pk, self.sales[1].pk])
+        self.assertEqual({c.op for c in changes}, {'update'})
+
+    def test_date_buckets_are_cached(self):
+        qs = admin.site._registry[SalesData].get_queryset(self.request)
+        self.assertEqual(list(qs.dates('date', 'day')), [date(2024, 1, d) for d in (1, 2, 3)])
+
+        with self.assertNumQueries(1):   # the version check only
+            self.assertEqual(len(qs.dates('date', 'day')), 3)
+        archived = admin.site._registry[DailySalesArchive].get_queryset(self.request)
+        self.assertEqual(list(archived.dates('date', 'day')), [])
+
+
+class WriteQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.widget = make_product()
+
+    def test_run_acknowledges_after_commit(self):
+        write_queue = WriteQueue(max_delay=0)
+
+        sale = write_queue.run(make_sale, self.widget, date(2024, 1, 5))
+
+        self.assertTrue(SalesData.objects.filter(pk=sale.pk).exists())
+        self.assertEqual((write_queue.batches, write_queue.writes), (1, 1))
+
+    def test_failing_write_does_not_undo_its_batch(self):
+        write_queue = WriteQueue(max_delay=0.2)
+        gate = threading.Event()
+        blocker = write_queue.submit(gate.wait)   # holds the writer so the next writes share a batch
+        good = write_queue.submit(make_sale, self.widget, date(2024, 1, 5))
+        bad = write_queue.submit(make_sale, self.widget, date(2024, 1, 5), quantity=None)
+        gate.set()
+
+        self.assertTrue(blocker.result(timeout=5))
+        self.assertIsNotNone(good.result(timeout=5).pk)
+        with self.assertRaises(IntegrityError):
+            bad.result(timeout=5)
+        self.assertEqual(SalesData.objects.count(), 1)
+
+    def test_backpressure_and_timeout(self):
+        write_queue = WriteQueue(max_pending=1, max_delay=0)
+        gate = threading.Event()
+        write_queue.submit(gate.wait)
+        while not write_queue.pending.empty():   # the writer has taken it
+            time.sleep(0.01)
+
+        with self.assertRaises(WriteTimeout):
+            write_queue.run(make_sale, self.widget, date(2024, 1, 5), timeout=0.1)
+        with self.assertRaises(WriteQueueFull):
+            write_queue.submit(make_sale, self.widget, date(2024, 1, 5))
+
+        # The timed out write still commits once the writer gets to it
+        gate.set()
+        deadline = time.monotonic() + 5
+        while write_queue.writes < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(SalesData.objects.count(), 1)
+
+    def test_form_saves_go_through_the_queue(self):
+        self.client.force_login(User.objects.create_user('alice', password='pw'))
+        data = {'name': 'Gadget', 'category': 'Toys', 'price': '5.00', 'cost': '3.00'}
+
+        with mock.patch('dashboard.views.writequeue.write', side_effect=WriteQueueFull) as write:
+            response = self.client.post(reverse('product_create'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(write.call_count, 1)
+        self.assertFalse(Product.objects.filter(name='Gadget').exists())
+
+        with mock.patch('dashboard.views.writequeue.write', wraps=writequeue.write) as write:
+            response = self.client.post(reverse('product_create'), data)
+        self.assertRedirects(response, reverse('sales'), fetch_redirect_response=False)
+        self.assertEqual(write.call_count, 1)
+        self.assertTrue(Product.objects.filter(name='Gadget').exists())
+
+    def test_queue_raises_throughput_under_contention(self):
+        # Same load as bench_writes, scaled down: every thread saves sales as
+        # fast as it can, directly (one transaction each) or through a queue
+        bench = bench_writes.Command()
+        bench.created = []
+        threads, writes = 16, 20
+
+        direct = bench.measure('direct', self.widget, threads, writes)
+        queued = bench.measure('queued', self.widget, threads, writes)
+
+        self.assertEqual(queued['failures'], 0)
+        self.assertEqual(queued['writes'], threads * writes)
+        self.assertLess(queued['batches'], threads * writes)
+        self.assertGreater(queued['writes'], direct['writes'])
+        self.assertGreater(queued['per_second'], direct['per_second'])
+
+        bench.cleanup()
+        self.assertFalse(SalesData.objects.exists())
+
+
+class PriceWhatIfApiTests(TransactionTestCase):
+    # Report views read through the replica connection, which only sees
+    # committed rows
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()   # baselines are cached per data version, which restarts every test
+        self.widget = make_product()
+        make_sale(self.widget, date.today(), quantity=10, revenue='100.00', cost='60.00')
+        self.client.force_login(User.objects.create_user('alice', password='pw'))
+
+    def get(self, **params):
+        return self.client.get(reverse('whatif_api'), params)
+
+    def test_parse_grid_rejects_non_finite_values(self):
+        for value in ('nan', '1,inf', '-inf:0:1', '0:nan:1'):
+            with self.assertRaises(ValueError):
+                whatif.parse_grid(value, whatif.DEFAULT_CHANGES, whatif.MAX_CHANGES)
+
+    def test_scenarios_are_finite_json(self):
+        response = self.get(changes='-10,0,10', elasticity='-1.5')
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content, parse_constant=self.fail)
+        self.assertEqual(data['scope_products'], 1)
+        self.assertEqual(data['curves'][0]['revenue'][1], 100.0)
+
+    def test_baseline_skips_products_created_during_the_read(self):
+        late = make_product(name='Late')
+        make_sale(late, date.today(), quantity=3, revenue='30.00', cost='18.00')
+        with mock.patch('dashboard.whatif.Product') as product:
+            product.objects.order_by.return_value = Product.objects.exclude(pk=late.pk).order_by('name')
+            data = whatif.baseline()
+
+        self.assertEqual(data['ids'], [self.widget.pk])
+        self.assertEqual(data['units'].tolist(), [10.0])
+
+    def test_invalid_scenarios_are_rejected(self):
+        for params in (
+            {'changes': 'nan'},
+            {'changes': '-99.9', 'elasticity': '-300'},
+            {'changes': '-100'},
+            {'changes': '5000'},
+            {'product': str(self.widget.pk + 1)},
+            {'category': 'No Such Category'},
+        ):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class ReportBatchTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, model_dir, ignore_errors=True)
+        override = override_settings(FORECAST_MODEL_DIR=Path(model_dir))
+        override.enable()
+        self.addCleanup(override.disable)
+
+        today = date.today()
+        # TransactionTestCase truncates the calendar the migration filled
+        periods.build_calendar(today - timedelta(days=400), today)
+        self.widget = make_product()
+        self.gadget = make_product(name='Gadget')
+        for months_ago in range(1, 6):
+            day = today - timedelta(days=30 * months_ago)
+            make_sale(self.widget, day, quantity=2, revenue='20.00', cost='12.00')
+            make_sale(self.gadget, day, quantity=1, revenue='50.00', cost='30.00')
+        archive.compact_sales(today - timedelta(days=90))
+        make_sale(self.widget, today, quantity=3, revenue='30.00', cost='18.00')
+
+    def reports(self):
+        return [SalesReport(), MarketShareReport(), PredictionReport()]
+
+    def test_shared_scan_matches_separate_reports(self):
+        shared = self.reports()
+        ReportBatch(shared).run()
+
+        for report, alone in zip(shared, self.reports()):
+            alone.fetch_data()
+            alone.process_data()
+            with self.subTest(report=report.title):
+                self.assertEqual(report.get_summary()
+                                 | {'timestamp': None}, alone.get_summary() | {'timestamp': None})
+
+    def test_rows_are_read_apart_from_the_grouped_sums(self):
+        batch = ReportBatch(self.reports())
+        periods.ensure_calendar()
+        with CaptureQueriesContext(connection) as captured:
+            batch.fetch()
+
+        self.assertEqual(batch.queries, 3)
+        hot_scans = [q['sql'] for q in captured.captured_queries if 'FROM "dashboard_salesdata"' in q['sql']]
+        self.assertEqual(sum('GROUP BY' not in sql for sql in hot_scans), 1)
+
+        market = MarketShareReport()
+        ReportBatch([market]).fetch()
+        self.assertEqual({p.name: p.units_sold for p in market.data}, {'Widget': 13, 'Gadget': 5})
+        self.assertEqual(sorted(SalesReport().fetch_data().tolist()), [20.0] * 3 + [30.0] + [50.0] * 3)
+
+    def test_market_page_shows_batched_reports(self):
+        self.client.force_login(User.objects.create_user('alice', password='pw'))
+
+        response = self.client.get(reverse('market'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['sales_summary']['record_count'], '7')
+        self.assertIsNotNone(response.context['prediction_summary'])
+        self.assertEqual(response.context['product_data'][0].name, 'Gadget')
+
+    def test_market_page_skips_the_batch_until_data_changes(self):
+        self.client.force_login(User.objects.create_user('alice', password='pw'))
+        self.client.get(reverse('market'))
+
+        with mock.patch.object(ReportBatch, 'run') as run:
+            response = self.client.get(reverse('market'))
+        run.assert_not_called()
+        self.assertEqual(response.context['sales_summary']['record_count'], '7')
+        self.assertContains(response, 'Gadget')
+
+        make_sale(self.widget, date.today(), quantity=1, revenue='10.00', cost='6.00')
+        response = self.client.get(reverse('market'))
+        self.assertEqual(response.context['sales_summary']['record_count'], '8')
+
+
+@override_settings(BACKTEST_CACHE_ALIAS='default', BACKTEST_RUN_IN_PROCESS=False)
+class BacktestPageTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.today = date.today()
+        # TransactionTestCase truncates the calendar the migration filled
+        periods.build_calendar(self.today - timedelta(days=800), self.today)
+        widget = make_product()
+        for months_ago in range(1, 13):
+            make_sale(widget, self.today - timedelta(days=30 * months_ago + 5), revenue=f'{10 + months_ago}.00')
+        self.last_sale = self.today - timedelta(days=35)
+        self.client.force_login(User.objects.create_user('alice', password='pw'))
+
+    def test_history_ends_at_the_last_sale(self):
+        report = BacktestReport()
+        later = BacktestReport(end=self.today + timedelta(days=40))
+
+        self.assertEqual(report.end, self.last_sale)
+        self.assertEqual(report.cache_key(), later.cache_key())
+
+    def test_page_shows_stored_results_only(self):
+        with mock.patch('dashboard.backtest.run_backtest', side_effect=AssertionError('replayed in the request')):
+            response = self.client.get(reverse('eval'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['backtest'])
+        self.assertContains(response, 'being computed in the background')
+
+        call_command('backtest_forecasts', stdout=StringIO())
+        response = self.client.get(reverse('eval'))
+        self.assertEqual(response.context['backtest']['horizon'], 3)
+        self.assertTrue(response.context['backtest_models'])
+
+    @override_settings(BACKTEST_RUN_IN_PROCESS=True)
+    def test_missing_results_are_replayed_in_the_background(self):
+        response = self.client.get(reverse('eval'), {'granularity': 'week'})
+        self.assertIsNone(response.context['backtest'])
+
+        report = BacktestReport(granularity='week')
+        for _ in range(300):
+            if report.cached_results() is not None:
+                break
+            time.sleep(0.1)
+        self.assertIsNotNone(report.results)
+        self.assertIsNotNone(self.client.get(reverse('eval'), {'granularity': 'week'}).context['backtest'])
+
+    def test_long_day_ranges_are_rejected(self):
+        with self.assertRaises(ValueError):
+            BacktestReport(granularity='day', start=date(2000, 1, 1))
+
+        with mock.patch('dashboard.backtest.run_backtest', side_effect=AssertionError('replayed in the request')):
+            response = self.client.get(reverse('eval'), {'granularity': 'day', 'from': '2000-01-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('at most 400', response.context['backtest_error'])
+        with self.assertRaises(CommandError):
+            call_command('backtest_forecasts', granularity='day', date_from='2000-01-01', stdout=StringIO())
+
+
+class AnomalyPageTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.widget = make_product()
+        make_sale(self.widget, date.today() - timedelta(days=3))
+        self.client.force_login(User.objects.create_user('alice', password='pw'))
+
+    def test_year_one_dates_are_served(self):
+        response = self.client.get(reverse('anomalies'), {'from': '0001-01-05', 'to': '0001-01-20'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['date_from'], '0001-01-05')
+
+    @override_settings(ANOMALY_MAX_DAYS=90)
+    def test_long_ranges_are_clamped(self):
+        with mock.patch('dashboard.anomalies.daily_revenue_matrix', wraps=anomalies.daily_revenue_matrix) as matrix:
+            response = self.client.get(reverse('anomalies'), {'from': '1900-01-01', 'to': '2024-06-30'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['clamped'])
+        self.assertEqual(response.context['date_from'], '2024-04-02')
+        start, end, _ = matrix.call_args.args
+        self.assertLessEqual((end - start).days, 90 + anomalies.DEFAULT_WINDOW)
+
+    def test_products_created_during_the_scan_are_skipped(self):
+        late = make_product(name='Late')
+        make_sale(late, date.today() - timedelta(days=2))
+        with mock.patch('dashboard.anomalies.Product') as product:
+            product.objects.order_by.return_value = Product.objects.exclude(pk=late.pk).order_by('name')
+            products, _, matrix = anomalies.daily_revenue_matrix(date.today() - timedelta(days=10), date.today())
+
+        self.assertEqual(products, [self.widget])
+        self.assertEqual(matrix.sum(), 10.0)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])   # Basic auth on every request
+class BulkIngestTests(TestCase):
+    def setUp(self):
+        self.widget = make_product()
+        self.gadget = make_product(name='Gadget')
+        User.objects.create_user('alice', password='pw')
+        token = base64.b64encode(b'alice:pw').decode()
+        self.auth = {'HTTP_AUTHORIZATION': f'Basic {token}'}
+
+    def post(self, payload, **extra):
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        return self.client.post(
+            reverse('salesdata_bulk_create'), body, content_type='application/json', **{**self.auth, **extra},
+        )
+
+    def record(self, product, **fields):
+        return {'product': product, 'date': '2024-01-05', 'quantity': 2, 'revenue': '20.00', 'cost': '12.00', **fields}
+
+    def test_records_by_id_and_name_are_created_and_logged(self):
+        head = ChangeLog.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+        response = self.post({'records': [self.record(self.widget.pk), self.record('gadget', quantity=3)]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'created': 2})
+        self.assertEqual(
+            sorted(SalesData.objects.values_list('product__name', 'quantity')), [('Gadget', 3), ('Widget', 2)],
+        )
+        self.assertEqual(ChangeLog.objects.filter(seq__gt=head, entity='sales', op='create').count(), 2)
+
+    def test_one_invalid_row_saves_nothing(self):
+        response = self.post([
+            self.record(self.widget.pk),
+            self.record('Nope'),
+            self.record(self.widget.pk, quantity=0, date='2024-13-01'),
+            'not an object',
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        errors = {e['index']: e['errors'] for e in response.json()['errors']}
+        self.assertEqual(sorted(errors), [1, 2, 3])
+        self.assertIn('product', errors[1])
+        self.assertEqual(sorted(errors[2]), ['date', 'quantity'])
+        self.assertFalse(SalesData.objects.exists())
+
+    def test_failed_insert_rolls_back(self):
+        with mock.patch('dashboard.views.changelog.record_many', side_effect=RuntimeError('feed down')):
+            with self.assertRaises(RuntimeError):
+                self.post([self.record(self.widget.pk)] * 3)
+
+        self.assertFalse(SalesData.objects.exists())
+
+    @override_settings(BULK_INGEST_MAX_ROWS=2)
+    def test_bad_payloads_are_rejected(self):
+        for payload in ('{not json', [], {'records': {}}, [self.record(self.widget.pk)] * 3):
+            with self.subTest(payload=payload):
+                response = self.post(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_authentication(self):
+        self.assertEqual(self.post([], HTTP_AUTHORIZATION='').status_code, 401)
+        bad = base64.b64encode(b'alice:wrong').decode()
+        self.assertEqual(self.post([], HTTP_AUTHORIZATION=f'Basic {bad}').status_code, 401)
+
+        # Session logins still need the CSRF token
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(User.objects.get(username='alice'))
+        response = client.post(
+            reverse('salesdata_bulk_create'), json.dumps([self.record(self.widget.pk)]),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(SalesData.objects.exists())
+
+
+class GeneratedColumnTests(TestCase):
+    def setUp(self):
+        self.widget = make_product()
+
+    def test_save_reloads_profit_and_margin(self):
+        sale = make_sale(self.widget, date(2024, 1, 5), revenue='80.00', cost='60.00')
+        self.assertEqual((sale.profit, sale.margin), (Decimal('20.00'), Decimal('25.00')))
+
+        sale.cost = Decimal('100.00')
+        sale.save()
+
+        self.assertEqual((sale.profit, sale.margin), (Decimal('-20.00'), Decimal('-25.00')))
+
+    def test_set_based_writes_keep_them_correct(self):
+        SalesData.objects.bulk_create([
+            SalesData(product=self.widget, date=date(2024, 1, 5), quantity=1, revenue=Decimal('50.00'), cost=Decimal('10.00')),
+            SalesData(product=self.widget, date=date(2024, 1, 6), quantity=1, revenue=Decimal('0.00'), cost=Decimal('5.00')),
+        ])
+        self.assertEqual(
+            list(SalesData.objects.order_by('date').values_list('profit', 'margin')),
+            [(Decimal('40.00'), Decimal('80.00')), (Decimal('-5.00'), Decimal('0.00'))],
+        )
+
+        SalesData.objects.filter(date=date(2024, 1, 5)).update(revenue=Decimal('20.00'))
+        sale = SalesData.objects.get(date=date(2024, 1, 5))
+        self.assertEqual((sale.profit, sale.margin), (Decimal('10.00'), Decimal('50.00')))
+        self.assertEqual(SalesData.objects.filter(profit__lt=0).count(), 1)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.laptop = make_product(name='Gaming Laptop Pro', category='Electronics')
+        self.headset = make_product(name='Gaming Headset', category='Audio')
+        self.chair = make_product(name='Office Chair', category='Furniture')
+
+    def search(self, text):
+        return sorted(search.search_product_ids(text))
+
+    def test_match_query_quotes_prefix_terms(self):
+        self.assertEqual(search.build_match_query('Gam-LAP!'), '"gam"* "lap"*')
+        self.assertEqual(search.build_match_query('name:x OR "y'), '"name"* "x"* "or"* "y"*')
+        self.assertEqual(search.build_match_query('  --  '), '')
+
+    def test_prefixes_of_every_word_are_anded(self):
+        self.assertEqual(self.search('gam'), sorted([self.laptop.pk, self.headset.pk]))
+        self.assertEqual(self.search('gam lap'), [self.laptop.pk])
+        self.assertEqual(self.search('laptop'), [self.laptop.pk])
+        self.assertEqual(self.search('electro'), [self.laptop.pk])
+        self.assertEqual(self.search('g'), sorted([self.laptop.pk, self.headset.pk]))
+        self.assertEqual(self.search('aming'), [])
+        self.assertEqual(self.search('"'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.chair.name = 'Gaming Chair'
+        self.chair.save()
+        Product.objects.filter(pk=self.headset.pk).update(category='Peripherals')
+        self.laptop.delete()
+
+        self.assertEqual(self.search('gaming'), sorted([self.headset.pk, self.chair.pk]))
+        self.assertEqual(self.search('office'), [])
+        self.assertEqual(self.search('audio'), [])
+        self.assertEqual(self.search('periph'), [self.headset.pk])
+        self.assertEqual(self.search('laptop'), [])
+
+    def test_falls_back_without_fts(self):
+        def fail_fts(self, sql, params=None):
+            if search.FTS_TABLE in sql:
+                raise OperationalError('no such module: fts5')
+            return original(self, sql, params)
+        original = CursorWrapper.execute
+        with mock.patch.object(CursorWrapper, 'execute', fail_fts):
+            self.assertEqual(self.search('gaming lap'), [self.laptop.pk])
+
+
+class SQLProfilerTests(TestCase):
+    def test_query_shape_ignores_values(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id = 12 AND name = 'O''Neil'"),
+            query_shape('SELECT *  FROM t\nWHERE id = %s AND name = %s'),
+        )
+        self.assertEqual(query_shape('SELECT 1 FROM t WHERE id IN (1, 2, 3)'), 'SELECT ? FROM t WHERE id IN (...)')
+
+    def test_report_flags_repeated_shapes_and_full_scans(self):
+        products = [make_product(name=f'Widget {i}') for i in range(3)]
+
+        profiler = QueryProfiler()
+        with profiler.install():
+            for product in products:
+                list(SalesData.objects.filter(product_id=product.pk))
+            list(Product.objects.filter(cost__gt=1).order_by())
+
+        report = profiler.report
+        self.assertEqual(report['count'], 4)
+        self.assertEqual(len(report['repeated']), 1)
+        self.assertEqual(report['repeated'][0]['count'], 3)
+        self.assertEqual(report['repeated'][0]['first'], 1)
+        self.assertEqual([s['repeated'] for s in report['statements']], [True, True, True, False])
+        self.assertEqual(report['full_scans'], ['dashboard_product'])
+        self.assertTrue(all(s['plan'] for s in report['statements']))
+        self.assertEqual({s['alias'] for s in report['statements']}, {'default'})
+
+    def test_explain_is_not_recorded(self):
+        profiler = QueryProfiler()
+        with profiler.install():
+            list(Product.objects.all())
+        profiler.report
+        self.assertEqual(len(profiler.queries), 1)
+
+    def test_panel_is_staff_only(self):
+        product = make_product()
+        url = reverse('product_update', args=[product.pk]) + '?sql_profile=1'
+        user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(user)
+        response = self.client.get(url)
+        self.assertNotIn('sql_profiler', response.wsgi_request.__dict__)
+        self.assertNotContains(response, 'SQL Profile')
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'SQL Profile')
+        self.assertContains(response, 'dashboard_product')
+        self.assertGreater(response.wsgi_request.sql_profiler.report['count'], 0)
+        self.assertNotContains(self.client.get(reverse('product_update', args=[product.pk])), 'SQL Profile')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedUserTests(TestCase):
+    def setUp(self):
+        caches[settings.USER_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.backend = auth.CachedModelBackend()
+        self.url = reverse('product_create')
+
+    def test_user_is_served_from_cache(self):
+        self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk).username, 'alice')
+        self.assertIsNone(self.backend.get_user(self.user.pk + 1))
+
+    def test_save_drops_cached_user(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertIsNotNone(caches[settings.USER_CACHE_ALIAS].get(auth.user_cache_key(self.user.pk)))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(caches[settings.USER_CACHE_ALIAS].get(auth.user_cache_key(self.user.pk)))
+        self.assertRedirects(self.client.get(self.url), reverse('login') + '?next=' + self.url, fetch_redirect_response=False)
+
+    def test_staff_change_applies_on_next_request(self):
+        self.client.force_login(self.user)
+        self.assertFalse(self.client.get(self.url).wsgi_request.user.is_staff)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertTrue(self.client.get(self.url).wsgi_request.user.is_staff)
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        self.user.set_password('new-pw')
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_delete_drops_cached_user(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        key = auth.user_cache_key(self.user.pk)
+        self.user.delete()
+        self.assertIsNone(caches[settings.USER_CACHE_ALIAS].get(key))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class PeriodBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.widget = make_product()
+        self.gadget = make_product(name='Gadget')
+        make_sale(self.widget, date(2024, 3, 31), revenue='10.00')   # Sunday, end of Q1
+        make_sale(self.gadget, date(2024, 4, 1), revenue='20.00')    # Monday, start of Q2
+        DailySalesArchive.objects.create(
+            product=self.widget, date=date(2024, 4, 2), quantity=1,
+            revenue=Decimal('5.00'), cost=Decimal('3.00'), profit=Decimal('2.00'), transactions=1,
+        )
+
+    def revenue(self, granularity, **kwargs):
+        return periods.revenue_by_period(granularity, date(2024, 1, 1), date(2024, 12, 31), **kwargs)
+
+    def test_sales_land_in_their_bucket(self):
+        self.assertEqual(self.revenue('day'), {
+            date(2024, 3, 31): Decimal('10.00'), date(2024, 4, 1): Decimal('20.00'), date(2024, 4, 2): Decimal('5.00'),
+        })
+        self.assertEqual(self.revenue('week'), {date(2024, 3, 25): Decimal('10.00'), date(2024, 4, 1): Decimal('25.00')})
+        self.assertEqual(self.revenue('month'), {date(2024, 3, 1): Decimal('10.00'), date(2024, 4, 1): Decimal('25.00')})
+        self.assertEqual(self.revenue('quarter'), {date(2024, 1, 1): Decimal('10.00'), date(2024, 4, 1): Decimal('25.00')})
+        self.assertEqual(self.revenue('quarter', by_product=True), {
+            (self.widget.pk, date(2024, 1, 1)): Decimal('10.00'),
+            (self.widget.pk, date(2024, 4, 1)): Decimal('5.00'),
+            (self.gadget.pk, date(2024, 4, 1)): Decimal('20.00'),
+        })
+        self.assertEqual(self.revenue('month', product_name='widget'), {
+            date(2024, 3, 1): Decimal('10.00'), date(2024, 4, 1): Decimal('5.00'),
+        })
+
+    def test_series_is_zero_filled(self):
+        _, labels, values = periods.revenue_series('month', date(2024, 1, 15), date(2024, 5, 1))
+        self.assertEqual(labels, ['Jan 2024', 'Feb 2024', 'Mar 2024', 'Apr 2024', 'May 2024'])
+        self.assertEqual(values, [0, 0, 10, 25, 0])
+
+    def test_bucket_starts_match_the_calendar(self):
+        for day in (date(2024, 1, 1), date(2024, 2, 29), date(2024, 12, 30), date(2021, 1, 3)):
+            row = CalendarDate.objects.get(date=day)
+            for granularity, field in periods.GRANULARITIES.items():
+                self.assertEqual(periods.bucket_start(day, granularity), getattr(row, field))
+
+    def test_calendar_extends_to_out_of_range_sales(self):
+        first_year = settings.CALENDAR_FIRST_YEAR
+        old = date(first_year - 3, 6, 15)
+        future = date(date.today().year + settings.CALENDAR_YEARS_AHEAD + 2, 1, 5)
+        make_sale(self.widget, old, revenue='7.00')
+        DailySalesArchive.objects.create(
+            product=self.gadget, date=future, quantity=1,
+            revenue=Decimal('9.00'), cost=Decimal('3.00'), profit=Decimal('6.00'), transactions=1,
+        )
+
+        totals = periods.revenue_by_period('quarter', old, future)
+        self.assertEqual(totals[date(first_year - 3, 4, 1)], Decimal('7.00'))
+        self.assertEqual(totals[date(future.year, 1, 1)], Decimal('9.00'))
+        self.assertEqual(sum(totals.values()), Decimal('51.00'))
+        self.assertTrue(CalendarDate.objects.filter(date=old).exists())
+        self.assertTrue(CalendarDate.objects.filter(date=future).exists())
+
+        months = periods.periods_in_range('month', old, future)
+        self.assertEqual(months[0], date(first_year - 3, 6, 1))
+        self.assertEqual(months[-1], date(future.year, 1, 1))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(periods.ensure_calendar(), 0)
+
+
+class TopMoversTests(TestCase):
+    end = date(2024, 6, 30)
+
+    def setUp(self):
+        self.widget = make_product(name='Widget', category='Tools')
+        self.gadget = make_product(name='Gadget', category='Tools')
+        self.gizmo = make_product(name='Gizmo', category='Toys')
+        (current_start, _), (previous_start, previous_end) = movers.comparison_periods(30, self.end)
+
+        make_sale(self.widget, current_start, quantity=4, revenue='60.00')
+        make_sale(self.widget, self.end, quantity=2, revenue='40.00')
+        make_sale(self.widget, previous_end, quantity=1, revenue='40.00')
+        make_sale(self.gadget, previous_start, quantity=5, revenue='30.00')
+        DailySalesArchive.objects.create(
+            product=self.gadget, date=previous_start + timedelta(days=1), quantity=2,
+            revenue=Decimal('20.00'), cost=Decimal('12.00'), profit=Decimal('8.00'), transactions=2,
+        )
+        # Outside both periods
+        make_sale(self.gizmo, previous_start - timedelta(days=1), revenue='99.00')
+        make_sale(self.gizmo, self.end + timedelta(days=1), revenue='99.00')
+
+    def test_comparison_periods(self):
+        self.assertEqual(
+            movers.comparison_periods(30, self.end),
+            ((date(2024, 6, 1), self.end), (date(2024, 5, 2), date(2024, 5, 31))),
+        )
+
+    def test_products_are_ranked_by_revenue_change(self):
+        rows = movers.top_movers(days=30, end=self.end)
+        by_name = {row['name']: row for row in rows}
+
+        self.assertEqual([row['name'] for row in rows], ['Widget', 'Gizmo', 'Gadget'])
+        self.assertEqual(
+            {name: (row['revenue'], row['previous_revenue'], row['units'], row['previous_units']) for name, row in by_name.items()},
+            {'Widget': (100.0, 40.0, 6, 1), 'Gadget': (0.0, 50.0, 0, 7), 'Gizmo': (0.0, 0.0, 0, 0)},
+        )
+        self.assertEqual(by_name['Widget']['percent'], 150.0)
+        self.assertEqual(by_name['Gadget']['percent'], -100.0)
+        self.assertIsNone(by_name['Gizmo']['percent'])
+        self.assertEqual([by_name[n]['gain_rank'] for n in ('Widget', 'Gizmo', 'Gadget')], [1, 2, 3])
+        self.assertEqual([by_name[n]['loss_rank'] for n in ('Widget', 'Gizmo', 'Gadget')], [3, 2, 1])
+        self.assertEqual((by_name['Widget']['category_rank'], by_name['Gadget']['category_rank']), (1, 2))
+        self.assertEqual(by_name['Gadget']['category_revenue'], 100.0)
+        self.assertEqual(by_name['Gadget']['category_delta'], 10.0)
+        self.assertTrue(all(row['in_top_k'] for row in rows))
+
+    def test_top_k_keeps_one_row_per_category(self):
+        rows = movers.top_movers(days=30, end=self.end, top_k=1)
+        self.assertEqual({row['name']: row['in_top_k'] for row in rows}, {'Widget': True, 'Gadget': True, 'Gizmo': False})
+
+        self.gizmo.category = 'Tools'
+        self.gizmo.save()
+        rows = movers.top_movers(days=30, end=self.end, top_k=1)
+        self.assertEqual([row['name'] for row in rows], ['Widget', 'Gadget'])
+
+    def test_values_are_bound_as_parameters(self):
+        executed = []
+        original = CursorWrapper.execute
+
+        def record(self, sql, params=None):
+            executed.append((sql, params))
+            return original(self, sql, params)
+
+        with mock.patch.object(CursorWrapper, 'execute', record):
+            movers.top_movers(days=30, end=self.end, top_k=2)
+            movers.top_movers(days=7, end=date(2024, 1, 31))
+
+        self.assertEqual([sql for sql, _ in executed], [movers.MOVERS_SQL] * 2)
+        self.assertEqual(executed[0][1], {
+            'current_start': '2024-06-01', 'previous_start': '2024-05-02', 'end': '2024-06-30', 'top_k': 2,
+        })
+        self.assertEqual(executed[1][1]['top_k'], None)
+
+
+def read_event(message):
+    """(event, data) of one SSE message"""
+    fields = dict(line.split(': ', 1) for line in message.strip().splitlines() if not line.startswith('retry:'))
+    return fields['event'], json.loads(fields['data'])
+
+
+@override_settings(LIVE_POLL_INTERVAL=0.05)
+class LiveUpdatesTests(TransactionTestCase):
+    def setUp(self):
+        today = date.today()
+        periods.build_calendar(today.replace(day=1), today)
+        cache.clear()
+        self.widget = make_product()
+        make_sale(self.widget, today, quantity=1, revenue='10.00', cost='6.00')
+
+    def run_stream(self, write):
+        """The first two messages of a fresh stream, with `write` run in between"""
+        notifier = live.Notifier()
+
+        async def scenario():
+            stream = live.event_stream()
+            first = await stream.__anext__()
+            await sync_to_async(write)()
+            second = await asyncio.wait_for(stream.__anext__(), 5)
+            await stream.aclose()
+            # Let the watcher see there are no subscribers left and stop
+            await asyncio.sleep(0.2)
+            return first, second
+
+        with mock.patch.object(live, 'notifier', notifier):
+            first, second = async_to_sync(scenario)()
+        self.assertEqual(notifier.subscribers, set())
+        self.assertIsNone(notifier._task)
+        return first, second
+
+    def test_snapshot_delta_keeps_only_changes(self):
+        old = {'totals': {'revenue': 10, 'cost': 6}, 'current_month': {'revenue': 10}, 'market_share': {'A': 1, 'B': 2}}
+        new = {'totals': {'revenue': 15, 'cost': 6}, 'current_month': {'revenue': 10}, 'market_share': {'A': 1, 'C': 3}}
+        self.assertEqual(live.snapshot_delta(None, new), new)
+        self.assertEqual(live.snapshot_delta(old, new), {'totals': {'revenue': 15}, 'market_share': {'C': 3, 'B': None}})
+        self.assertEqual(live.snapshot_delta(new, new), {})
+        self.assertEqual(live.format_event('delta', {'a': 1}, '3.1'), 'event: delta\nid: 3.1\ndata: {"a":1}\n\n')
+
+    def test_stream_sends_snapshot_then_delta(self):
+        gadget = make_product(name='Gadget')
+        first, second = self.run_stream(lambda: make_sale(gadget, date.today(), quantity=2, revenue='30.00', cost='10.00'))
+
+        self.assertTrue(first.startswith('retry: 5000\n'))
+        event, snapshot = read_event(first)
+        self.assertEqual(event, 'snapshot')
+        self.assertEqual(snapshot['totals'], {'revenue': 10.0, 'cost': 6.0, 'profit': 4.0, 'margin': 40.0, 'transactions': 1})
+        self.assertEqual(snapshot['market_share'], {'Widget': {'revenue': 10.0, 'percent': 100.0}})
+
+        event, delta = read_event(second)
+        self.assertEqual(event, 'delta')
+        self.assertEqual(delta['totals'], {'revenue': 40.0, 'cost': 16.0, 'profit': 24.0, 'margin': 60.0, 'transactions': 2})
+        self.assertEqual(delta['current_month']['revenue'], 40.0)
+        self.assertEqual(delta['market_share'], {
+            'Widget': {'revenue': 10.0, 'percent': 25.0}, 'Gadget': {'revenue': 30.0, 'percent': 75.0},
+        })
+
+    def test_writes_from_other_processes_are_polled(self):
+        # With notify() stubbed out, only the version poll can pick the write up
+        with mock.patch.object(live, 'notify'):
+            _, second = self.run_stream(lambda: SalesData.objects.update(revenue=Decimal('12.00')))
+
+        event, delta = read_event(second)
+        self.assertEqual(event, 'delta')
+        self.assertEqual(delta['totals'], {'revenue': 12.0, 'profit': 6.0, 'margin': 50.0})
+        self.assertEqual(delta['current_month']['revenue'], 12.0)
+        self.assertEqual(delta['market_share'], {'Widget': {'revenue': 12.0, 'percent': 100.0}})
+
+    @override_settings(LIVE_QUEUE_SIZE=2)
+    def test_slow_subscriber_is_resynced(self):
+        notifier = live.Notifier()
+
+        async def scenario():
+            queue, snapshot = await notifier.subscribe()
+            for n in range(3):
+                notifier.broadcast('delta', {'n': n})
+            pending = [queue.get_nowait() for _ in range(queue.qsize())]
+            notifier.unsubscribe(queue)
+            await asyncio.sleep(0.2)
+            return snapshot, pending
+
+        snapshot, pending = async_to_sync(scenario)()
+        self.assertEqual(pending, [('snapshot', snapshot, notifier.version)])
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_wsgi_request_gets_one_snapshot(self):
+        url = reverse('live_updates')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user('alice', password='pw'))
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        event, snapshot = read_event(response.content.decode())
+        self.assertEqual((event, snapshot['totals']['revenue']), ('snapshot', 10.0))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ChangesFeedTests(TestCase):
+    def setUp(self):
+        self.start = ChangeLog.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+        self.widget = make_product()
+        self.sale_ids = [make_sale(self.widget, date(2024, 1, day)).pk for day in (1, 2, 3)]
+        self.widget.price = Decimal('12.00')
+        self.widget.save()
+        SalesData.objects.get(pk=self.sale_ids[0]).delete()
+        self.seqs = list(ChangeLog.objects.filter(seq__gt=self.start).order_by('seq').values_list('seq', flat=True))
+        self.client.force_login(User.objects.create_user('alice', password='pw'))
+
+    def get(self, **params):
+        return self.client.get(reverse('changes_feed'), {'since': self.start, **params})
+
+    def test_pages_cover_every_change_once(self):
+        self.assertEqual(len(self.seqs), 6)
+        since, pages = self.start, []
+        while True:
+            page = self.get(since=since, limit=2).json()
+            pages.append([c['seq'] for c in page['changes']])
+            since = page['next_since']
+            if not page['has_more']:
+                break
+
+        self.assertEqual(pages, [self.seqs[0:2], self.seqs[2:4], self.seqs[4:6]])
+        self.assertEqual(since, self.seqs[-1])
+        self.assertEqual(self.get(since=since).json(), {'changes': [], 'next_since': since, 'has_more': False})
+
+    def test_changes_are_serialized_oldest_first(self):
+        changes = self.get().json()['changes']
+        self.assertEqual(
+            [(c['entity'], c['op'], c['object_id']) for c in changes],
+            [('product', 'create', self.widget.pk)]
+            + [('sales', 'create', pk) for pk in self.sale_ids]
+            + [('product', 'update', self.widget.pk), ('sales', 'delete', self.sale_ids[0])],
+        )
+        self.assertEqual(set(changes[0]), {'seq', 'entity', 'object_id', 'op', 'data', 'changed_at'})
+
+    def test_entity_filter_skips_other_entities(self):
+        page = self.get(entity='product', limit=1).json()
+        self.assertEqual([c['op'] for c in page['changes']], ['create'])
+        self.assertTrue(page['has_more'])
+
+        page = self.get(entity='product', since=page['next_since']).json()
+        self.assertEqual([c['op'] for c in page['changes']], ['update'])
+        self.assertEqual(page['next_since'], self.seqs[4])
+        self.assertFalse(page['has_more'])
+
+    @override_settings(CHANGES_PAGE_MAX=3)
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self.get(limit=0).json()['changes']), 1)
+        self.assertEqual(len(self.get(limit=100).json()['changes']), 3)
+        self.assertEqual(len(self.get(since=-5).json()['changes']), 3)
+
+    def test_bad_parameters_are_rejected(self):
+        self.assertEqual(self.get(since='abc').status_code, 400)
+        self.assertEqual(self.get(limit='1.5').status_code, 400)
+        self.assertEqual(self.get(entity='orders').status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_consumer_resumes_after_its_last_batch(self):
+        consumer = changelog.ChangeConsumer('warehouse', batch_size=4)
+        consumer.reset(self.start)
+        seen = []
+
+        def fail_second_batch(changes):
+            if seen:
+                raise RuntimeError('warehouse down')
+            seen.extend(c.seq for c in changes)
+
+        with self.assertRaises(RuntimeError):
+            consumer.run(fail_second_batch)
+        self.assertEqual(consumer.position, self.seqs[3])
+
+        self.assertEqual(consumer.run(lambda changes: seen.extend(c.seq for c in changes)), 2)
+        self.assertEqual(seen, self.seqs)
+        self.assertEqual(consumer.position, self.seqs[-1])
+        self.assertEqual(consumer.run(seen.extend), 0)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        today = date.today()
+        periods.build_calendar(today - timedelta(days=400), today)
+        cache.clear()
+        make_sale(make_product(), today, quantity=2, revenue='20.00', cost='12.00')
+        self.client.force_login(User.objects.create_user('alice', password='pw'))
+
+    def aliases_used(self, method, url, data=None):
+        """(response, aliases that ran queries) for one request"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(url, data)
+        used = {alias for alias, queries in (('default', primary), ('replica', replica)) if queries.captured_queries}
+        return response, used
+
+    def test_router_only_sends_marked_reads_to_the_replica(self):
+        router = routers.ReportReadRouter()
+        self.assertEqual(router.db_for_read(SalesData), 'default')
+        token = routers.use_replica()
+        try:
+            self.assertEqual(router.db_for_read(SalesData), 'replica')
+            self.assertEqual(router.db_for_write(SalesData), 'default')
+        finally:
+            routers.reset_replica(token)
+        self.assertEqual(router.db_for_read(SalesData), 'default')
+
+    def test_report_reads_use_the_replica(self):
+        response, used = self.aliases_used('get', reverse('sales'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(used, {'replica'})
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        _, used = self.aliases_used('get', reverse('product_create'))
+        self.assertNotIn('replica', used)
+
+    def test_read_after_post_redirect_goes_to_the_primary(self):
+        response, _ = self.aliases_used('post', reverse('product_create'), {
+            'name': 'Gadget', 'category': 'Tools', 'price': '12.00', 'cost': '7.00',
+        })
+        self.assertRedirects(response, reverse('sales'), fetch_redirect_response=False)
+        cookie = response.cookies[PRIMARY_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertTrue(cookie['httponly'])
+
+        # The browser follows the redirect with the pin cookie it was just given
+        response, used = self.aliases_used('get', response.url)
+        self.assertEqual(used, {'default'})
+        self.assertContains(response, 'Gadget')
+
+        # Once the cookie expires, reads go back to the replica
+        del self.client.cookies[PRIMARY_PIN_COOKIE]
+        _, used = self.aliases_used('get', reverse('sales'))
+        self.assertEqual(used, {'replica'})
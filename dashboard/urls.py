@@ -6,8 +6,19 @@ urlpatterns = [
     path('market/', views.market_share, name='market'), # Button 2
     path('data/', views.raw_data, name='data'),         # Button 3
     path('eval/', views.model_eval, name='eval'),       # Button 4
+    path('movers/', views.movers, name='movers'),       # Top movers
+    path('anomalies/', views.anomalies, name='anomalies'), # Anomaly alerts
+    path('whatif/', views.price_whatif, name='whatif'), # Price what-if simulator
     path('export-csv/', views.export_csv, name='export_csv'), # Export CSV
     path('export-json/', views.export_json, name='export_json'), # Export JSON
+    path('exports/<slug:fmt>/start/', views.export_start, name='export_start'), # Background export
+    path('exports/<int:pk>/', views.export_status, name='export_status'),
+    path('exports/<int:pk>/download/', views.export_download, name='export_download'),
+    path('live/', views.live_updates, name='live_updates'), # Server-Sent Events
+    path('api/forecasts/', views.product_forecasts, name='product_forecasts'), # Per-product forecasts
+    path('api/whatif/', views.price_whatif_api, name='whatif_api'), # Price what-if scenarios
+    path('api/range-totals/', views.range_totals_api, name='range_totals'), # Date-range totals
+    path('charts/<slug:chart>.<slug:fmt>', views.chart_image, name='chart_image'), # Rendered chart images
     
     # Product CRUD
     path('product/create/', views.product_create, name='product_create'),
@@ -16,6 +27,8 @@ urlpatterns = [
     
     # Sales Data CRUD
     path('salesdata/create/', views.salesdata_create, name='salesdata_create'),
+    path('api/salesdata/bulk/', views.salesdata_bulk_create, name='salesdata_bulk_create'),
+    path('api/changes/', views.changes_feed, name='changes_feed'), # Change data feed
     path('salesdata/<int:pk>/update/', views.salesdata_update, name='salesdata_update'),
     path('salesdata/<int:pk>/delete/', views.salesdata_delete, name='salesdata_delete'),
 ]
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Data Versions for Cache Keys
+
+Each key names a group of tables and holds a counter that is bumped on
+every write to them:
+
+    'sales'   - SalesData and DailySalesArchive
+    'catalog' - Product (product changes also affect sales reports)
+
+Cached artifacts (rendered charts, exports, fitted models, template
+fragments) include the current version in their key, so they are reused
+until the underlying data actually changes.  The counters live in the
+database, so every process sees the same version.
+
+Model signals bump the counters for ordinary saves and deletes, and
+QuerySet.update() on SalesData and Product bumps them through the change
+feed (changelog.record_updates); other bulk write paths that bypass
+signals call bump() themselves.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DataVersion
+
+
+SALES = 'sales'
+CATALOG = 'catalog'
+
+
+def bump(*keys):
+    """Increment the version of each key"""
+    for key in keys:
+        updated = DataVersion.objects.filter(key=key).update(version=F('version') + 1)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    DataVersion.objects.create(key=key, version=1)
+            except IntegrityError:
+                # Another writer created it first
+                DataVersion.objects.filter(key=key).update(version=F('version') + 1)
+
+
+def bump_once(key, using='default'):
+    """
+    Bump ``key`` at most once per transaction.
+
+    Used by the model signal handlers: a queryset delete or cascade sends
+    one signal per row, but one bump per transaction is enough.  The bump
+    runs inside the transaction (so it commits or rolls back with the
+    write) and a tagged no-op on_commit callback marks it as done; Django
+    discards that marker on rollback, so the next transaction bumps again.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        bump(key)
+        return
+
+    for _, func, _ in connection.run_on_commit:
+        if getattr(func, 'version_key', None) == key:
+            return
+
+    bump(key)
+
+    def marker():
+        pass
+    marker.version_key = key
+    transaction.on_commit(marker, using=using)
+
+
+def current(*keys):
+    """Return the current version of each key as a tuple (0 if never bumped)"""
+    versions = dict(DataVersion.objects.filter(key__in=keys).values_list('key', 'version'))
+    return tuple(versions.get(key, 0) for key in keys)
+
+
+def data_version():
+    """Combined version of sales and catalog data, as a short string"""
+    sales, catalog = current(SALES, CATALOG)
+    return f"{sales}.{catalog}"
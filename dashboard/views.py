@@ -3,16 +3,29 @@ from django.http import JsonResponse
 from django.db.models import Sum, Count
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Product, SalesData
-from .forms import ProductForm, SalesDataForm
-from .reports import SalesReport, MarketShareReport, PredictionReport
+from django.contrib.auth import authenticate
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_GET
+from functools import wraps
+from .models import Product, SalesData, ExportJob, ChangeLog
+from .forms import ProductForm, SalesDataForm, BulkSalesRowForm
+from .reports import ReportBatch, SalesReport, MarketShareReport, PredictionReport, ProductForecastReport, MoversReport, AnomalyReport, PriceSimulationReport, BacktestReport
+from .archive import period_totals
+from .search import search_product_ids
+from .backtest import submit as submit_backtest
+from . import versioning, series, charts, exports, periods, forecasting, model_store, live, changelog, writequeue, whatif, rangeindex
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')  # Use non-GUI backend
 import matplotlib.pyplot as plt
 from io import BytesIO
 import base64
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from sklearn.metrics import confusion_matrix
 import json
 
@@ -23,20 +36,15 @@ def sales_report(request):
     """Sales Report with NumPy calculations, statistics, and Matplotlib visualizations"""
     
     filter_product = request.GET.get('filter', 'all')
+    product_name = filter_product if filter_product != 'all' else None
     
-    # Get sales data
-    if filter_product != 'all':
-        # Filter by product name (case-insensitive)
-        sales_qs = SalesData.objects.filter(product__name__iexact=filter_product)
-    else:
-        sales_qs = SalesData.objects.all()
-    
-    # NumPy calculations for total revenue, cost, and profit
-    revenues = np.array([float(s.revenue) for s in sales_qs])
-    costs = np.array([float(s.cost) for s in sales_qs])
+    # NumPy array of per-transaction revenue (hot detail rows only)
+    revenues = series.transaction_revenues(product_name)
     
-    total_revenue = np.sum(revenues) if len(revenues) > 0 else 0
-    total_cost = np.sum(costs) if len(costs) > 0 else 0
+    # Totals include archived (compacted) sales as well
+    totals = period_totals(product_name=product_name)
+    total_revenue = float(totals['revenue'])
+    total_cost = float(totals['cost'])
     gross_profit = total_revenue - total_cost
     profit_margin = (gross_profit / total_revenue * 100) if total_revenue > 0 else 0
     
@@ -45,61 +53,43 @@ def sales_report(request):
     median_revenue = np.median(revenues) if len(revenues) > 0 else 0
     std_revenue = np.std(revenues) if len(revenues) > 0 else 0
     
-    # Get monthly data for trend chart and linear regression
-    end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=365)
-    
-    monthly_data = {}
-    month_numbers = []
-    for month_offset in range(12):
-        month_date = end_date - timedelta(days=30 * month_offset)
-        month_start = month_date.replace(day=1)
-        if month_offset == 0:
-            month_end = end_date
-        else:
-            month_end = month_start + timedelta(days=30)
-        
-        month_sales = sales_qs.filter(date__gte=month_start, date__lte=month_end)
-        month_revenue = sum([float(s.revenue) for s in month_sales])
-        monthly_data[month_start.strftime('%b')] = month_revenue
-        month_numbers.append(11 - month_offset)  # 0-11 for regression
-    
-    # Reverse to get chronological order
-    monthly_labels = list(reversed(list(monthly_data.keys())))
-    monthly_values = list(reversed(list(monthly_data.values())))
-    month_numbers = list(reversed(month_numbers))
-    
-    # Linear Regression for Sales Prediction (Regression Model)
-    from sklearn.linear_model import LinearRegression
-    if len(monthly_values) >= 2:
-        X = np.array(month_numbers).reshape(-1, 1)
-        y = np.array(monthly_values)
-        
-        model = LinearRegression()
-        model.fit(X, y)
+    # Revenue per period (?granularity=day|week|month|quarter&from=&to=)
+    # for the trend chart and linear regression, from the prefix-sum index
+    granularity, date_from, date_to = periods.period_params(request.GET)
+    _, trend_labels, trend_values = rangeindex.revenue_series(granularity, date_from, date_to, product_name)
+    range_totals = rangeindex.range_totals(date_from, date_to, product_name=product_name)
+    
+    # Sales prediction with the chosen model (?model=linear|seasonal_naive|holt_winters).
+    # Fitted models are persisted and only refitted when the series changes.
+    model_name = request.GET.get('model', forecasting.DEFAULT_MODEL)
+    if model_name not in forecasting.MODELS:
+        model_name = forecasting.DEFAULT_MODEL
+    # Stored per product id; an unknown ?filter= name has no sales to forecast
+    product_ids = rangeindex.resolve_products(product_name=product_name)
+    if len(trend_values) >= 2 and product_ids != []:
+        models, _ = model_store.fitted_models(
+            ('sales', product_ids[0] if product_ids else None, granularity), model_name,
+            lambda: {'total': trend_values}, forecasting.SEASON_LENGTHS[granularity],
+            window=(date_from, date_to),
+        )
+        model = models['total']
         
-        # Predict next 3 months
-        future_months = np.array([12, 13, 14]).reshape(-1, 1)
-        predictions = model.predict(future_months)
+        # Predict next 3 periods
+        predictions = model.predict(3)
         
         predicted_value = float(predictions[0])
-        slope = float(model.coef_[0])
-        intercept = float(model.intercept_)
+        slope = model.slope
+        intercept = getattr(model, 'intercept', 0)
     else:
         predicted_value = 0
         slope = 0
         intercept = 0
     
     # Get distribution data (histogram bins)
-    if len(revenues) > 0:
-        hist, bin_edges = np.histogram(revenues, bins=10)
-        distribution_labels = [f'₱{int(bin_edges[i])}-{int(bin_edges[i+1])}' for i in range(len(hist))]
-        distribution_values = hist.tolist()
-    else:
-        distribution_labels = []
-        distribution_values = []
+    distribution_labels, distribution_values = series.revenue_distribution(revenues)
     
     # Get all available products for filter buttons
+    # (lazy: only queried when the cached fragment is missing)
     all_products = Product.objects.all().order_by('name')
     
     context = {
@@ -111,16 +101,25 @@ def sales_report(request):
         'mean_revenue': f'₱{mean_revenue:,.2f}',
         'median_revenue': f'₱{median_revenue:,.2f}',
         'std_revenue': f'₱{std_revenue:,.2f}',
-        'monthly_labels': json.dumps(monthly_labels),
-        'monthly_values': json.dumps(monthly_values),
+        'trend_labels': json.dumps(trend_labels),
+        'trend_values': json.dumps(trend_values),
+        'granularity': granularity,
+        'granularities': list(periods.GRANULARITIES),
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'period_query': periods.period_query(request.GET),
+        'range_totals': range_totals,
         'distribution_labels': json.dumps(distribution_labels),
         'distribution_values': json.dumps(distribution_values),
         'current_filter': filter_product,
-        'total_records': f'{len(sales_qs):,}',
+        'total_records': f'{len(revenues):,}',
         'predicted_next_month': f'₱{predicted_value:,.2f}',
+        'forecast_model': model_name,
+        'forecast_models': [(name, model.label) for name, model in forecasting.MODELS.items()],
         'regression_slope': f'{slope:,.2f}',
         'regression_intercept': f'{intercept:,.2f}',
         'all_products': all_products,
+        'catalog_version': versioning.current(versioning.CATALOG)[0],
     }
     
     return render(request, 'dashboard/sales.html', context)
@@ -130,43 +129,262 @@ def sales_report(request):
 def market_share(request):
     """Market Share visualization showing product performance"""
     
-    # Get sales by product - show ALL products
-    product_sales = Product.objects.annotate(
-        total_sales=Sum('sales__revenue'),
-        units_sold=Sum('sales__quantity')
-    ).order_by('-total_sales')
+    # The page only changes with the data (and the forecast with the day),
+    # so a cache hit skips the report batch as well as the table fragment
+    data_version = versioning.data_version()
+    key = f'market-page:{date.today().isoformat()}:{data_version}'
+    context = cache.get_or_set(key, market_context, getattr(settings, 'MARKET_PAGE_CACHE_SECONDS', 600))
+    
+    return render(request, 'dashboard/market.html', {
+        **context,
+        'active_page': 'market',
+        'data_version': data_version,
+    })
+
+
+def market_context():
+    """Chart series, product table and summary cards of the market page"""
     
-    products = []
-    revenues = []
-    colors = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6']
+    # Market share, transaction statistics and the revenue forecast are
+    # cut from one shared read of the sales tables
+    sales_report, market_report, prediction_report = SalesReport(), MarketShareReport(), PredictionReport()
+    ReportBatch([sales_report, market_report, prediction_report]).run()
     
-    # Calculate total revenue for percentage calculation
-    total_revenue = 0
-    for product in product_sales:
-        if product.total_sales:
-            total_revenue += float(product.total_sales)
+    # Get sales by product - show ALL products
+    product_sales = market_report.data
     
-    # Only include products with sales in the chart
-    for idx, product in enumerate(product_sales):
-        if product.total_sales:
-            products.append(product.name)
-            revenues.append(float(product.total_sales))
+    # Calculate total revenue for percentage calculation
+    total_revenue = sum(float(product.total_sales) for product in product_sales)
     
-    # Calculate percentages
-    total = sum(revenues) if revenues else 1
-    percentages = [(rev / total * 100) for rev in revenues]
+    # Only products with sales are included in the chart
+    products, revenues, percentages = series.market_share(product_sales)
+    colors = series.MARKET_COLORS
     
-    context = {
-        'active_page': 'market',
+    return {
         'products': json.dumps(products),
         'revenues': json.dumps(revenues),
         'percentages': json.dumps(percentages),
         'colors': json.dumps(colors[:len(products)]),
         'product_data': product_sales,  # All products for the table
         'total_revenue': total_revenue if total_revenue > 0 else 1,  # Prevent division by zero
+        'sales_summary': sales_report.get_summary() if sales_report.statistics['count'] else None,
+        'prediction_summary': prediction_report.get_summary(),
     }
+
+
+@login_required(login_url='login')
+def movers(request):
+    """Top movers: products that grew or shrank most against the previous period"""
+    
+    def int_param(name, default, low, high):
+        try:
+            return min(max(int(request.GET.get(name, default)), low), high)
+        except ValueError:
+            return default
+    
+    days = int_param('days', 30, 1, 3650)
+    top_k = int_param('k', 5, 1, 100)
+    try:
+        end = datetime.strptime(request.GET.get('to', ''), '%Y-%m-%d').date()
+    except ValueError:
+        end = None
+    
+    report = MoversReport(days=days, end=end, top_k=top_k)
+    movers_data = report.process_data()
     
-    return render(request, 'dashboard/market.html', context)
+    context = {
+        'active_page': 'movers',
+        'days': days,
+        'top_k': top_k,
+        'date_to': report.end.isoformat(),
+        'period_presets': [7, 30, 90, 365],
+        'current_period': (report.start, report.end),
+        'previous_period': (report.previous_start, report.previous_end),
+        'gainers': movers_data['gainers'],
+        'losers': movers_data['losers'],
+        'categories': movers_data['categories'],
+    }
+    
+    return render(request, 'dashboard/movers.html', context)
+
+
+@login_required(login_url='login')
+def anomalies(request):
+    """Product days whose revenue broke sharply from the recent pattern"""
+    def date_param(name):
+        try:
+            return datetime.strptime(request.GET.get(name, ''), '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    
+    date_from, date_to = date_param('from'), date_param('to')
+    try:
+        window = min(max(int(request.GET.get('window', 28)), 7), 365)
+    except ValueError:
+        window = 28
+    try:
+        threshold = min(max(float(request.GET.get('threshold', 3)), 1.0), 10.0)
+    except ValueError:
+        threshold = 3.0
+    
+    report = AnomalyReport(start=date_from, end=date_to, window=window, threshold=threshold)
+    anomaly_data = report.process_data()
+    
+    context = {
+        'active_page': 'anomalies',
+        'date_from': report.start.isoformat(),
+        'date_to': report.end.isoformat(),
+        'clamped': report.clamped,
+        'window': window,
+        'threshold': threshold,
+        'anomalies': anomaly_data['all'],
+        'spike_count': len(anomaly_data['spikes']),
+        'drop_count': len(anomaly_data['drops']),
+    }
+    
+    return render(request, 'dashboard/anomalies.html', context)
+
+
+def whatif_report(params):
+    """PriceSimulationReport from request parameters; raises ValueError for bad input"""
+    changes = whatif.parse_grid(params.get('changes'), whatif.DEFAULT_CHANGES, whatif.MAX_CHANGES)
+    elasticities = whatif.parse_grid(
+        params.get('elasticity'), whatif.DEFAULT_ELASTICITIES, whatif.MAX_ELASTICITIES
+    )
+    try:
+        days = min(max(int(params.get('days', whatif.DEFAULT_DAYS)), 1), 3650)
+    except ValueError:
+        days = whatif.DEFAULT_DAYS
+    try:
+        product_id = int(params['product']) if params.get('product') else None
+    except ValueError:
+        raise ValueError('product must be a product id')
+    return PriceSimulationReport(
+        changes, elasticities, days=days,
+        category=params.get('category') or None, product_id=product_id,
+    )
+
+
+@login_required(login_url='login')
+def price_whatif(request):
+    """Price what-if: projected revenue, cost and profit for a grid of price changes"""
+    context = {
+        'active_page': 'whatif',
+        'changes': request.GET.get('changes', whatif.DEFAULT_CHANGES),
+        'elasticity': request.GET.get('elasticity', whatif.DEFAULT_ELASTICITIES),
+        'days': request.GET.get('days', whatif.DEFAULT_DAYS),
+        'category': request.GET.get('category', ''),
+        'product': request.GET.get('product', ''),
+        'categories': Product.objects.order_by('category').values_list('category', flat=True).distinct(),
+        'all_products': Product.objects.order_by('name').values_list('id', 'name'),
+    }
+    
+    try:
+        report = whatif_report(request.GET)
+        simulation = report.process_data()
+    except ValueError as exc:
+        messages.error(request, f'Invalid what-if parameters: {exc}')
+        return render(request, 'dashboard/whatif.html', context)
+    
+    context.update({
+        'simulation': simulation,
+        'period': (report.data['start'], report.data['end']),
+        'scenario_count': len(report.changes) * len(report.elasticities),
+        'chart_changes': json.dumps(report.changes.round(4).tolist()),
+        'chart_curves': json.dumps([
+            {'elasticity': c['elasticity'], 'profit': c['profit'], 'revenue': c['revenue']}
+            for c in simulation['curves']
+        ]),
+    })
+    return render(request, 'dashboard/whatif.html', context)
+
+
+@login_required(login_url='login')
+def price_whatif_api(request):
+    """Price what-if scenarios (JSON API)"""
+    try:
+        report = whatif_report(request.GET)
+        simulation = report.process_data()
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    data = {
+        'generated_at': report.generated_at.isoformat(),
+        'period': [report.data['start'].isoformat(), report.data['end'].isoformat()],
+        'changes': report.changes.tolist(),
+        **simulation,
+    }
+    return JsonResponse(data)
+
+
+@login_required(login_url='login')
+async def live_updates(request):
+    """Server-Sent Events: totals, current month and market share as they change"""
+    from asgiref.sync import sync_to_async
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import HttpResponse, StreamingHttpResponse
+    
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker can't be held by an open stream: send the current
+        # snapshot and let the browser reconnect after the retry delay
+        snapshot = await sync_to_async(live.build_snapshot)()
+        body = live.retry_line() + live.format_event('snapshot', snapshot)
+        return HttpResponse(body, content_type='text/event-stream')
+    
+    response = StreamingHttpResponse(live.event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+
+@login_required(login_url='login')
+def chart_image(request, chart, fmt):
+    """Server-side Matplotlib rendering of a dashboard chart (PNG or SVG)"""
+    from django.http import HttpResponse, Http404
+    
+    if chart not in charts.CHARTS or fmt not in charts.FORMATS:
+        raise Http404('Unknown chart or format')
+    
+    filter_product = request.GET.get('filter', 'all').lower()
+    product_name = filter_product if filter_product != 'all' else None
+    granularity, date_from, date_to = periods.period_params(request.GET)
+    if chart == 'market':
+        params = {}
+    elif chart == 'trend':
+        params = {'filter': filter_product, 'granularity': granularity, 'from': date_from, 'to': date_to}
+    else:
+        params = {'filter': filter_product}
+    
+    # Reuse the rendered image until the data changes
+    path = charts.cache_path(chart, fmt, params, versioning.data_version())
+    if path.exists():
+        content = path.read_bytes()
+    else:
+        if chart == 'trend':
+            _, labels, values = periods.revenue_series(granularity, date_from, date_to, product_name)
+            data = {'labels': labels, 'values': values, 'title': f'Sales Trend by {granularity.title()}'}
+        elif chart == 'distribution':
+            labels, values = series.revenue_distribution(series.transaction_revenues(product_name))
+            data = {'labels': labels, 'values': values}
+        else:
+            products, revenues, _ = series.market_share()
+            palette = series.MARKET_COLORS
+            data = {
+                'labels': products,
+                'values': revenues,
+                'colors': [palette[i % len(palette)] for i in range(len(products))],
+            }
+        
+        try:
+            content = charts.render(chart, fmt, data, path)
+        except charts.ChartBusy as e:
+            response = HttpResponse(str(e), status=503, content_type='text/plain')
+            response['Retry-After'] = '2'
+            return response
+    
+    response = HttpResponse(content, content_type=charts.FORMATS[fmt])
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
 
 
 @login_required(login_url='login')
@@ -182,9 +400,9 @@ def raw_data(request):
     # Start with all sales data with related product info (SQL JOIN)
     sales_data = SalesData.objects.select_related('product').order_by('-date')
     
-    # Apply search filter (search in product name)
+    # Apply search filter (full-text index over product name and category)
     if search_query:
-        sales_data = sales_data.filter(product__name__icontains=search_query)
+        sales_data = sales_data.filter(product_id__in=search_product_ids(search_query))
     
     # Apply category filter
     if category_filter != 'all':
@@ -196,6 +414,21 @@ def raw_data(request):
     if date_to:
         sales_data = sales_data.filter(date__lte=date_to)
     
+    # Totals for a custom date range, from the prefix-sum index
+    range_totals = None
+    if date_from or date_to:
+        try:
+            start = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+            end = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+        except ValueError:
+            start = end = None
+        else:
+            range_totals = rangeindex.range_totals(
+                start, end,
+                product_ids=search_product_ids(search_query) if search_query else None,
+                category=category_filter if category_filter != 'all' else None,
+            )
+    
     # Get unique categories for filter dropdown
     categories = Product.objects.values_list('category', flat=True).distinct().order_by('category')
     
@@ -205,7 +438,10 @@ def raw_data(request):
     # Get summary statistics (based on filtered results)
     total_records = SalesData.objects.count()
     total_products = Product.objects.count()
-    filtered_count = sales_data.count() if sales_data else 0
+    filtered_count = sales_data.count()
+    
+    # Versions for the cached table and dropdown fragments
+    sales_version, catalog_version = versioning.current(versioning.SALES, versioning.CATALOG)
     
     context = {
         'active_page': 'data',
@@ -218,6 +454,9 @@ def raw_data(request):
         'category_filter': category_filter,
         'date_from': date_from,
         'date_to': date_to,
+        'range_totals': range_totals,
+        'data_version': f'{sales_version}.{catalog_version}',
+        'catalog_version': catalog_version,
     }
     
     return render(request, 'dashboard/data.html', context)
@@ -291,6 +530,61 @@ def export_json(request):
     return response
 
 
+@login_required(login_url='login')
+@require_POST
+def export_start(request, fmt):
+    """Queue a full background export (or reuse one for unchanged data)"""
+    from django.http import Http404
+    
+    if fmt not in dict(ExportJob.FORMAT_CHOICES):
+        raise Http404('Unknown export format')
+    
+    job, created = exports.request_export(fmt, user=request.user)
+    if created:
+        messages.success(request, f'Export #{job.pk} queued. The file will be ready shortly.')
+    else:
+        messages.info(request, f'Data has not changed since export #{job.pk}; reusing it.')
+    return redirect('export_status', pk=job.pk)
+
+
+@login_required(login_url='login')
+def export_status(request, pk):
+    """Status page for a background export (JSON when polled)"""
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+    
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'id': job.pk,
+            'status': job.status,
+            'progress': job.progress,
+            'processed_rows': job.processed_rows,
+            'total_rows': job.total_rows,
+            'error': job.error,
+        })
+    
+    context = {
+        'active_page': 'data',
+        'job': job,
+        'recent_jobs': ExportJob.objects.filter(user=request.user)[:10],
+    }
+    return render(request, 'dashboard/export_status.html', context)
+
+
+@login_required(login_url='login')
+def export_download(request, pk):
+    """Download the file produced by a finished export"""
+    from django.http import FileResponse, Http404
+    
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user, status='done')
+    try:
+        handle = open(job.file_path, 'rb')
+    except (FileNotFoundError, TypeError):
+        raise Http404('Export file is no longer available')
+    
+    content_type = 'text/csv' if job.format == 'csv' else 'application/json'
+    return FileResponse(handle, as_attachment=True, filename=f'sales_data.{job.format}', content_type=content_type)
+
+
 @login_required(login_url='login')
 def model_eval(request):
     """Model Evaluation with confusion matrix for sales predictions"""
@@ -334,8 +628,60 @@ def model_eval(request):
         tn, fp, fn, tp = 0, 0, 0, 0
         accuracy = precision = recall = f1_score = 0
     
+    # Rolling-origin backtest of the revenue forecasting models
+    # (?granularity=day|week|month|quarter&from=&to=&horizon=&model=)
+    def date_param(name):
+        try:
+            return datetime.strptime(request.GET.get(name, ''), '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    
+    granularity = request.GET.get('granularity', 'month')
+    date_from, date_to = date_param('from'), date_param('to')
+    try:
+        horizon = int(request.GET.get('horizon', 3))
+    except ValueError:
+        horizon = 3
+    model_labels = {name: model.label for name, model in forecasting.MODELS.items()}
+    product_model = request.GET.get('model', forecasting.DEFAULT_MODEL)
+    if product_model not in model_labels:
+        product_model = forecasting.DEFAULT_MODEL
+    
+    # Replays are too slow for a request: show stored results only, and
+    # start the replay in the background when there are none yet
+    backtest_error = None
+    backtest_results = None
+    try:
+        backtest = BacktestReport(granularity=granularity, start=date_from, end=date_to, horizon=horizon)
+    except ValueError as e:
+        backtest_error = str(e)
+        backtest = None
+    else:
+        backtest_results = backtest.cached_results()
+        if backtest_results is None and getattr(settings, 'BACKTEST_RUN_IN_PROCESS', True):
+            submit_backtest(backtest)
+    
     context = {
         'active_page': 'eval',
+        'backtest': backtest_results,
+        'backtest_error': backtest_error,
+        'backtest_granularity': backtest.granularity if backtest else granularity,
+        'backtest_from': backtest.start.isoformat() if backtest else request.GET.get('from', ''),
+        'backtest_to': backtest.end.isoformat() if backtest else request.GET.get('to', ''),
+        'backtest_horizon': backtest.horizon if backtest else horizon,
+        'granularities': list(periods.GRANULARITIES),
+        'backtest_models': [
+            (name, model_labels[name], backtest_results['overall'][name], backtest_results['by_horizon'][name])
+            for name in backtest.models
+        ] if backtest_results else [],
+        'product_model': product_model,
+        'product_model_label': model_labels[product_model],
+        'product_accuracy': backtest_results['by_product'][product_model] if backtest_results else {},
+        'forecast_models': list(model_labels.items()),
+        'mape_chart': json.dumps({
+            model_labels[name]: [h['mape'] for h in backtest_results['by_horizon'][name]]
+            for name in backtest.models
+        } if backtest_results else {}),
         'tn': tn,
         'fp': fp,
         'fn': fn,
@@ -349,6 +695,62 @@ def model_eval(request):
     return render(request, 'dashboard/eval.html', context)
 
 
+@login_required(login_url='login')
+def product_forecasts(request):
+    """Next-periods revenue forecast for every product (JSON API)"""
+    granularity, date_from, date_to = periods.period_params(request.GET)
+    report = ProductForecastReport(
+        granularity=granularity, start=date_from, end=date_to,
+        model=request.GET.get('model', forecasting.DEFAULT_MODEL),
+    )
+    forecasts = report.process_data() or {}
+    
+    data = {
+        'generated_at': report.generated_at.isoformat(),
+        'model': report.model_name,
+        'granularity': report.granularity,
+        'periods': [p.isoformat() for p in report.periods],
+        'horizon': report.horizon,
+        'products': forecasts,
+    }
+    return JsonResponse(data)
+
+
+@login_required(login_url='login')
+def range_totals_api(request):
+    """Totals for a date range, product or category from the prefix-sum index (JSON API)"""
+    def date_param(name):
+        try:
+            return datetime.strptime(request.GET.get(name, ''), '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    
+    product = request.GET.get('product', 'all')
+    totals = rangeindex.range_totals(
+        date_param('from'), date_param('to'),
+        category=request.GET.get('category') or None,
+        product_name=product if product != 'all' else None,
+    )
+    totals['start'] = totals['start'].isoformat()
+    totals['end'] = totals['end'].isoformat()
+    return JsonResponse(totals)
+
+
+def save_form(request, form):
+    """
+    Save a valid ModelForm through the write queue (directly when
+    WRITE_QUEUE_ENABLED is off).  Returns the saved instance, or None
+    after adding an error message when the write was not acknowledged.
+    """
+    try:
+        return writequeue.write(form.save)
+    except writequeue.WriteQueueFull:
+        messages.error(request, 'The server is busy saving other changes. Please try again in a moment.')
+    except writequeue.WriteTimeout:
+        messages.warning(request, 'Saving is taking longer than usual. Check the data page before submitting again.')
+    return None
+
+
 # ============================================================================
 # PRODUCT CRUD OPERATIONS
 # ============================================================================
@@ -359,9 +761,10 @@ def product_create(request):
     if request.method == 'POST':
         form = ProductForm(request.POST)
         if form.is_valid():
-            product = form.save()
-            messages.success(request, f'Product "{product.name}" created successfully!')
-            return redirect('sales')
+            product = save_form(request, form)
+            if product is not None:
+                messages.success(request, f'Product "{product.name}" created successfully!')
+                return redirect('sales')
         else:
             messages.error(request, 'Error creating product. Please check the form.')
     else:
@@ -382,9 +785,10 @@ def product_update(request, pk):
     if request.method == 'POST':
         form = ProductForm(request.POST, instance=product)
         if form.is_valid():
-            product = form.save()
-            messages.success(request, f'Product "{product.name}" updated successfully!')
-            return redirect('sales')
+            saved = save_form(request, form)
+            if saved is not None:
+                messages.success(request, f'Product "{saved.name}" updated successfully!')
+                return redirect('sales')
         else:
             messages.error(request, 'Error updating product. Please check the form.')
     else:
@@ -425,9 +829,9 @@ def salesdata_create(request):
     if request.method == 'POST':
         form = SalesDataForm(request.POST)
         if form.is_valid():
-            sales = form.save()
-            messages.success(request, 'Sales record created successfully!')
-            return redirect('sales')
+            if save_form(request, form) is not None:
+                messages.success(request, 'Sales record created successfully!')
+                return redirect('sales')
         else:
             messages.error(request, 'Error creating sales record. Please check the form.')
     else:
@@ -449,9 +853,9 @@ def salesdata_update(request, pk):
     if request.method == 'POST':
         form = SalesDataForm(request.POST, instance=salesdata)
         if form.is_valid():
-            sales = form.save()
-            messages.success(request, 'Sales record updated successfully!')
-            return redirect('data')
+            if save_form(request, form) is not None:
+                messages.success(request, 'Sales record updated successfully!')
+                return redirect('data')
         else:
             messages.error(request, 'Error updating sales record. Please check the form.')
     else:
@@ -479,4 +883,158 @@ def salesdata_delete(request, pk):
     context = {
         'salesdata': salesdata,
     }
-    return render(request, 'dashboard/salesdata_confirm_delete.html', context)
\ No newline at end of file
+    return render(request, 'dashboard/salesdata_confirm_delete.html', context)
+
+
+# ============================================================================
+# JSON API
+# ============================================================================
+
+def api_login_required(view_func):
+    """
+    Authenticate API requests with HTTP Basic credentials or the session.
+    
+    Session-authenticated requests still go through the CSRF check; Basic
+    auth requests can't be forged by a browser, so they skip it.  Returns a
+    JSON 401/403 instead of redirecting to the login page.
+    """
+    @csrf_exempt
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+        if auth_header.startswith('Basic '):
+            try:
+                decoded = base64.b64decode(auth_header[6:]).decode('utf-8')
+                username, password = decoded.split(':', 1)
+            except (ValueError, UnicodeDecodeError):
+                return JsonResponse({'error': 'Malformed Authorization header.'}, status=401)
+            user = authenticate(request, username=username, password=password)
+            if user is None:
+                return JsonResponse({'error': 'Invalid credentials.'}, status=401)
+            request.user = user
+        elif request.user.is_authenticated:
+            csrf_check = CsrfViewMiddleware(lambda req: None)
+            if csrf_check.process_view(request, None, (), {}) is not None:
+                return JsonResponse({'error': 'CSRF verification failed.'}, status=403)
+        else:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        
+        return view_func(request, *args, **kwargs)
+    
+    return wrapper
+
+
+@api_login_required
+@require_POST
+def salesdata_bulk_create(request):
+    """
+    Bulk sales ingestion: accepts a JSON array of sales records
+    
+    Each record has product (id or name), date, quantity, revenue and cost.
+    All rows are validated together with a single product lookup and then
+    inserted with one bulk_create in one transaction.  If any row is invalid
+    nothing is saved and the per-row errors are returned.
+    """
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Request body must be valid JSON.'}, status=400)
+    
+    records = payload.get('records') if isinstance(payload, dict) else payload
+    if not isinstance(records, list) or not records:
+        return JsonResponse({'error': 'Expected a non-empty array of sales records.'}, status=400)
+    
+    max_rows = getattr(settings, 'BULK_INGEST_MAX_ROWS', 5000)
+    if len(records) > max_rows:
+        return JsonResponse({'error': f'At most {max_rows} records per request.'}, status=400)
+    
+    # One product lookup for the whole batch (by id or by name)
+    product_ids = set()
+    product_names = set()
+    for record in records:
+        ref = record.get('product') if isinstance(record, dict) else None
+        if isinstance(ref, int):
+            product_ids.add(ref)
+        elif isinstance(ref, str) and ref.strip():
+            product_names.add(ref.strip().title())
+    
+    products_by_id = {}
+    products_by_name = {}
+    if product_ids or product_names:
+        for product in Product.objects.filter(Q(pk__in=product_ids) | Q(name__in=product_names)):
+            products_by_id[product.pk] = product
+            products_by_name[product.name.lower()] = product
+    
+    new_sales = []
+    errors = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({'index': index, 'errors': {'__all__': ['Record must be an object.']}})
+            continue
+        
+        row_errors = {}
+        ref = record.get('product')
+        if isinstance(ref, int):
+            product = products_by_id.get(ref)
+        elif isinstance(ref, str):
+            product = products_by_name.get(ref.strip().lower())
+        else:
+            product = None
+        if product is None:
+            row_errors['product'] = [f'Unknown product: {ref!r}']
+        
+        form = BulkSalesRowForm(record)
+        if not form.is_valid():
+            row_errors.update({field: list(msgs) for field, msgs in form.errors.items()})
+        
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+            continue
+        
+        data = form.cleaned_data
+        new_sales.append(SalesData(
+            product=product,
+            date=data['date'],
+            quantity=data['quantity'],
+            revenue=data['revenue'],
+            cost=data['cost'],
+        ))
+    
+    if errors:
+        return JsonResponse({'created': 0, 'errors': errors}, status=400)
+    
+    with transaction.atomic():
+        SalesData.objects.bulk_create(new_sales, batch_size=1000)
+        # bulk_create sends no post_save
+        changelog.record_many(new_sales, 'create')
+        versioning.bump(versioning.SALES)
+    
+    return JsonResponse({'created': len(new_sales)}, status=201)
+
+
+@api_login_required
+@require_GET
+def changes_feed(request):
+    """
+    Change feed for incremental consumers: SalesData and Product writes
+    after ?since=<seq>, oldest first.  Pass next_since back as since to
+    continue; has_more says whether another page is already waiting.
+    """
+    try:
+        since = max(int(request.GET.get('since', 0)), 0)
+        limit = int(request.GET.get('limit', changelog.DEFAULT_BATCH_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'since and limit must be integers.'}, status=400)
+    limit = min(max(limit, 1), getattr(settings, 'CHANGES_PAGE_MAX', 5000))
+    
+    entity = request.GET.get('entity') or None
+    if entity and entity not in dict(ChangeLog.ENTITY_CHOICES):
+        return JsonResponse({'error': f'Unknown entity: {entity!r}'}, status=400)
+    
+    changes, has_more = changelog.changes_since(since, limit, entity)
+    
+    return JsonResponse({
+        'changes': [changelog.serialize(c) for c in changes],
+        'next_since': changes[-1].seq if changes else since,
+        'has_more': has_more,
+    })
@@ -0,0 +1,212 @@
+"""
+Price What-If Simulator
+
+Projects revenue, cost and profit under price changes with a constant
+elasticity demand model:
+
+    units' = units * (1 + change) ** elasticity
+    revenue' = price * (1 + change) * units'
+    cost' = unit cost * units'
+
+Baseline units are each product's sales over the last `days` days (hot and
+archived), prices and unit costs come from Product.  Every combination of
+elasticity x price change is computed at once with NumPy broadcasting into
+(elasticities, changes) arrays, so a sweep of thousands of scenarios is a
+handful of array operations.
+
+A scope (all products, one category or one product) says which products
+the change applies to; the others keep their baseline in the totals.
+product_profit() broadcasts changes x products to find each product's own
+best price change when it is changed alone.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from .models import Product, SalesData, DailySalesArchive
+from . import versioning
+
+
+DEFAULT_CHANGES = '-30:30:5'   # percent, start:stop:step (stop included)
+DEFAULT_ELASTICITIES = '-1.5'
+DEFAULT_DAYS = 90
+MAX_CHANGES = 10000
+MAX_ELASTICITIES = 50
+CHANGE_RANGE = (-100, 1000)       # percent; -100 itself is excluded
+ELASTICITY_RANGE = (-10, 10)
+
+
+def parse_grid(value, default, limit):
+    """
+    Numbers from 'start:stop:step' (stop included) or 'a,b,c'.
+    Raises ValueError for malformed input, non-finite values, an empty
+    grid or more than `limit` values.
+    """
+    value = (value or default).strip()
+    if ':' in value:
+        start, stop, step = (float(part) for part in value.split(':'))
+        if not np.all(np.isfinite([start, stop, step])):
+            raise ValueError('Grid values must be finite numbers')
+        if step <= 0 or stop < start:
+            raise ValueError('Range must be start:stop:step with step > 0 and stop >= start')
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        if count > limit:
+            raise ValueError(f'At most {limit} values per grid')
+        grid = np.round(start + step * np.arange(count), 10)
+    else:
+        grid = np.array([float(part) for part in value.split(',') if part.strip()])
+    if grid.size == 0:
+        raise ValueError('Grid is empty')
+    if not np.all(np.isfinite(grid)):
+        raise ValueError('Grid values must be finite numbers')
+    if grid.size > limit:
+        raise ValueError(f'At most {limit} values per grid')
+    return grid
+
+
+def baseline(days=DEFAULT_DAYS, end=None):
+    """
+    Per-product arrays: ids, names, categories, price, cost and units sold
+    over the `days` days up to `end` (today by default).
+    """
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+
+    products = list(Product.objects.order_by('name').values_list('id', 'name', 'category', 'price', 'cost'))
+    row_of = {row[0]: i for i, row in enumerate(products)}
+
+    units = np.zeros(len(products))
+    for model in (SalesData, DailySalesArchive):
+        sold = (
+            model.objects.filter(date__gte=start, date__lte=end)
+            .order_by().values_list('product_id').annotate(total=Sum('quantity'))
+        )
+        for product_id, total in sold:
+            # Products created after the Product query are left out
+            if product_id in row_of:
+                units[row_of[product_id]] += total or 0
+
+    return {
+        'ids': [row[0] for row in products],
+        'names': [row[1] for row in products],
+        'categories': [row[2] for row in products],
+        'price': np.array([float(row[3]) for row in products]),
+        'cost': np.array([float(row[4]) for row in products]),
+        'units': units,
+        'start': start,
+        'end': end,
+    }
+
+
+def cached_baseline(days=DEFAULT_DAYS, end=None):
+    """
+    baseline() cached per data version, so sweeping different grids over
+    the same window only queries the database once.
+    """
+    end = end or date.today()
+    key = f'whatif-baseline:{days}:{end.isoformat()}:{versioning.data_version()}'
+    return cache.get_or_set(
+        key, lambda: baseline(days, end), getattr(settings, 'WHATIF_BASELINE_CACHE_SECONDS', 600)
+    )
+
+
+def scope_mask(base, category=None, product_id=None):
+    """Boolean array of the products a change applies to; ValueError for an unknown scope"""
+    if product_id is not None:
+        mask = np.array([pid == product_id for pid in base['ids']], dtype=bool)
+        if not mask.any():
+            raise ValueError(f'Unknown product id {product_id}')
+        return mask
+    if category:
+        mask = np.array([c.lower() == category.lower() for c in base['categories']], dtype=bool)
+        if not mask.any():
+            raise ValueError(f'Unknown category {category!r}')
+        return mask
+    return np.ones(len(base['ids']), dtype=bool)
+
+
+def simulate(base, changes, elasticities, mask=None):
+    """
+    Scenario totals for every (elasticity, price change) pair, shaped
+    (elasticities, changes), with the change applied to the products in
+    mask only.  changes are percentages.
+
+    The demand factor depends only on the elasticity and the change, so
+    the totals are outer products of the (E, C) factor grid with sums over
+    the products in scope; the cost is O(E x C + P) however many products
+    there are.
+    """
+    changes = np.asarray(changes, dtype=float)
+    elasticities = np.asarray(elasticities, dtype=float)
+    low, high = CHANGE_RANGE
+    if np.any(changes <= low) or np.any(changes > high):
+        raise ValueError(f'Price changes must be above {low}% and at most {high}%')
+    low, high = ELASTICITY_RANGE
+    if np.any(elasticities < low) or np.any(elasticities > high):
+        raise ValueError(f'Elasticities must be between {low} and {high}')
+
+    price, cost, units = base['price'], base['cost'], base['units']
+    if mask is None:
+        mask = np.ones(len(price), dtype=bool)
+
+    multiplier = 1 + changes / 100                                  # (C,)
+    with np.errstate(over='ignore', invalid='ignore'):
+        demand = multiplier[None, :] ** elasticities[:, None]       # (E, C)
+
+    base_revenue = price * units
+    base_cost = cost * units
+    scoped_units = units[mask].sum()
+    scoped_revenue = base_revenue[mask].sum()
+    scoped_cost = base_cost[mask].sum()
+    fixed_units = units.sum() - scoped_units
+    fixed_revenue = base_revenue.sum() - scoped_revenue
+    fixed_cost = base_cost.sum() - scoped_cost
+
+    with np.errstate(over='ignore', invalid='ignore'):
+        revenue = fixed_revenue + scoped_revenue * multiplier[None, :] * demand
+        total_cost = fixed_cost + scoped_cost * demand
+        profit = revenue - total_cost
+    # Changes just above -100% with strong elasticities can still overflow
+    if not (np.all(np.isfinite(revenue)) and np.all(np.isfinite(profit))):
+        raise ValueError('Scenario totals overflow; use smaller price cuts or elasticities')
+
+    return {
+        'changes': changes,
+        'elasticities': elasticities,
+        'multiplier': multiplier,
+        'demand': demand,
+        'baseline': {
+            'units': float(units.sum()),
+            'revenue': float(base_revenue.sum()),
+            'cost': float(base_cost.sum()),
+            'profit': float((base_revenue - base_cost).sum()),
+        },
+        'totals': {
+            'units': fixed_units + scoped_units * demand,
+            'revenue': revenue,
+            'cost': total_cost,
+            'profit': profit,
+        },
+    }
+
+
+def product_profit(base, result, elasticity_index=0):
+    """
+    Profit of each product if it alone took each price change, shaped
+    (changes, products), for one elasticity of a simulate() result.
+    """
+    demand = result['demand'][elasticity_index]                     # (C,)
+    unit_margin = base['price'][None, :] * result['multiplier'][:, None] - base['cost'][None, :]
+    return base['units'][None, :] * demand[:, None] * unit_margin
+
+
+def best_changes(base, result):
+    """Index of the most profitable change per elasticity, and per product for the first one"""
+    return {
+        'totals': result['totals']['profit'].argmax(axis=1),                 # (E,)
+        'products': product_profit(base, result).argmax(axis=0),             # (P,)
+    }
@@ -0,0 +1,162 @@
+"""
+Write-Behind Queue for SQLite
+
+SQLite allows one writer at a time.  With many concurrent form posts each
+request opens its own write transaction, and the losers wait on the file
+lock until they time out with "database is locked".
+
+With WRITE_QUEUE_ENABLED, write views hand their database work to one
+writer thread instead:
+
+- Batching: the writer takes the first pending write, then keeps
+  collecting for up to WRITE_QUEUE_MAX_DELAY seconds (or
+  WRITE_QUEUE_BATCH_SIZE writes) and commits them in one transaction.
+  Each write runs in its own savepoint, so one failing write does not
+  undo the others.
+- Acknowledgement: run() blocks until the write has committed and returns
+  its result (or raises its exception), so a request only reports success
+  for data that is on disk.
+- Bounded latency: a request waits at most WRITE_QUEUE_ACK_TIMEOUT
+  seconds for its acknowledgement before getting WriteTimeout.
+- Backpressure: at most WRITE_QUEUE_MAX_PENDING writes may wait; beyond
+  that run() raises WriteQueueFull at once instead of queueing more work
+  than the writer can finish in time.
+
+Because writes are committed by the writer thread, signal handlers
+(versioning, change log, live updates) run there too, once per batch where
+they deduplicate per transaction.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+
+class WriteQueueFull(Exception):
+    """Raised when too many writes are already waiting"""
+
+
+class WriteTimeout(Exception):
+    """Raised when a write was not acknowledged in time (it may still commit)"""
+
+
+class WriteQueue:
+    """Single writer thread that commits submitted callables in batches"""
+
+    def __init__(self, max_pending=None, batch_size=None, max_delay=None):
+        self.max_pending = max_pending or getattr(settings, 'WRITE_QUEUE_MAX_PENDING', 200)
+        self.batch_size = batch_size or getattr(settings, 'WRITE_QUEUE_BATCH_SIZE', 100)
+        self.max_delay = max_delay if max_delay is not None else getattr(settings, 'WRITE_QUEUE_MAX_DELAY', 0.01)
+        self.pending = queue.Queue(maxsize=self.max_pending)
+        self.batches = 0
+        self.writes = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) for the writer; returns a Future"""
+        self._ensure_running()
+        future = Future()
+        try:
+            self.pending.put_nowait((future, func, args, kwargs))
+        except queue.Full:
+            raise WriteQueueFull(f'{self.max_pending} writes are already waiting')
+        return future
+
+    def run(self, func, *args, timeout=None, **kwargs):
+        """Submit a write and wait for it to commit; returns its result"""
+        if timeout is None:
+            timeout = getattr(settings, 'WRITE_QUEUE_ACK_TIMEOUT', 5)
+        future = self.submit(func, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise WriteTimeout(f'Write not acknowledged within {timeout}s')
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._writer, name='write-queue', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """The next batch: wait for one write, then gather more until the delay passes"""
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.pending.get(timeout=remaining) if remaining > 0 else self.pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _writer(self):
+        while True:
+            batch = self._collect()
+            try:
+                close_old_connections()
+                self._commit(batch)
+            except Exception as exc:
+                # Never let the writer die with callers still waiting
+                for future, _, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for future, func, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, func(*args, **kwargs), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+        except Exception as exc:
+            # The transaction itself failed: none of the batch was saved
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        self.batches += 1
+        self.writes += len(outcomes)
+        for future, result, exc in outcomes:
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """The shared process-wide queue, created on first use"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteQueue()
+    return _queue
+
+
+def enabled():
+    return getattr(settings, 'WRITE_QUEUE_ENABLED', False)
+
+
+def write(func, *args, **kwargs):
+    """
+    Run a database write: through the shared queue when WRITE_QUEUE_ENABLED,
+    otherwise directly in the calling thread.
+    """
+    if not enabled():
+        return func(*args, **kwargs)
+    return get_queue().run(func, *args, **kwargs)
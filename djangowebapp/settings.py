@@ -56,10 +56,16 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dashboard.middleware.ReportReadMiddleware',
+    'dashboard.middleware.SQLProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'djangowebapp.urls'
 
+# No 'loaders' option is set, so Django wraps the filesystem and app loaders
+# in the cached template loader: templates are compiled once per process.
+# Product tables and filter bars are also cached as fragments, keyed by the
+# data versions in dashboard/versioning.py.
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -85,9 +91,168 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Read-only connection used by report and export views.
+    # Locally this is the same SQLite file opened in read-only mode;
+    # in production point it at a real replica.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['dashboard.routers.ReportReadRouter']
+
+# Views (by URL name) whose queries are sent to the replica
+REPORT_READ_VIEWS = ['sales', 'market', 'data', 'eval', 'movers', 'anomalies', 'whatif', 'whatif_api', 'range_totals', 'export_csv', 'export_json', 'product_forecasts', 'chart_image']
+
+# Seconds a user's reads stay on the primary after they submit a form
+REPLICA_PIN_SECONDS = 5
+
+# Process pool used for per-product report computation.
+# None means one worker per CPU; below the threshold reports run serially.
+REPORT_WORKERS = None
+REPORT_PARALLEL_THRESHOLD = 32
+
+# Forecast backtests on the eval page (dashboard/backtest.py) are cached
+# until the sales data changes, or for this long at most.  The page never
+# replays in the request: on a miss it starts the replay on a background
+# thread (BACKTEST_RUN_IN_PROCESS) or waits for `backtest_forecasts` to
+# fill the cache.  Ranges longer than BACKTEST_MAX_PERIODS are refused.
+BACKTEST_CACHE_SECONDS = 24 * 3600
+BACKTEST_CACHE_ALIAS = 'backtests'
+BACKTEST_RUN_IN_PROCESS = True
+BACKTEST_MAX_PERIODS = 400
+
+# Days scanned at most by the anomaly page (dashboard/anomalies.py); longer
+# ranges keep their last ANOMALY_MAX_DAYS days
+ANOMALY_MAX_DAYS = 366
+
+# Maximum number of records accepted per bulk sales upload
+BULK_INGEST_MAX_ROWS = 5000
+
+# Admin changelists for the large sales tables (dashboard/admin.py): rows
+# are counted exactly up to this many, beyond that the count is estimated
+ADMIN_EXACT_COUNT_LIMIT = 10000
+ADMIN_DATE_HIERARCHY_CACHE_SECONDS = 3600
+
+# Write-behind queue (dashboard/writequeue.py): when enabled, form saves are
+# committed in short batches by one writer thread, so concurrent posts don't
+# fight over SQLite's write lock.  `python manage.py bench_writes` compares.
+WRITE_QUEUE_ENABLED = False
+WRITE_QUEUE_BATCH_SIZE = 100      # writes per transaction at most
+WRITE_QUEUE_MAX_DELAY = 0.01      # seconds the writer waits to fill a batch
+WRITE_QUEUE_MAX_PENDING = 200     # queued writes before new ones are refused
+WRITE_QUEUE_ACK_TIMEOUT = 5       # seconds a request waits for its commit
+
+# Price what-if simulator (dashboard/whatif.py): baseline units per product
+# are cached per data version while a grid of scenarios is being explored
+WHATIF_BASELINE_CACHE_SECONDS = 600
+
+# The market page's report batch is cached per data version and day; the
+# product table fragment in market.html is keyed by the same version
+MARKET_PAGE_CACHE_SECONDS = 600
+
+# Maximum number of changes returned per /api/changes/ page (dashboard/changelog.py)
+CHANGES_PAGE_MAX = 5000
+
+# Server-side chart rendering (dashboard/charts.py)
+CHART_CACHE_DIR = BASE_DIR / 'cache' / 'charts'
+CHART_RENDER_WORKERS = 2
+CHART_MAX_PENDING = 8
+CHART_RENDER_TIMEOUT = 10
+
+# Fitted forecasting models (dashboard/model_store.py), refitted only when
+# the sales series they were fitted on change.  Each group of series keeps
+# its FORECAST_MODEL_WINDOWS most recent date ranges; `prune_forecast_models`
+# (run it from cron) deletes files not rewritten for FORECAST_MODEL_MAX_AGE
+# seconds.
+FORECAST_MODEL_DIR = BASE_DIR / 'cache' / 'models'
+FORECAST_MODEL_WINDOWS = 4
+FORECAST_MODEL_MAX_AGE = 30 * 24 * 3600
+
+# Prefix-sum index of daily sales per product (dashboard/rangeindex.py) for
+# date-range totals; extended from the change feed as days close
+RANGE_INDEX_PATH = BASE_DIR / 'cache' / 'range_index.joblib'
+
+# Live dashboard updates over Server-Sent Events (dashboard/live.py).  Under
+# ASGI the stream stays open; WSGI servers get one snapshot per reconnect.
+LIVE_POLL_INTERVAL = 2      # seconds between data version checks
+LIVE_HEARTBEAT = 15         # seconds between keepalive comments
+LIVE_QUEUE_SIZE = 32        # pending messages per client before it is resynced
+LIVE_RETRY_MS = 5000        # browser reconnect delay
+
+# Background exports (dashboard/exports.py).  With EXPORT_RUN_IN_PROCESS
+# jobs run on a thread pool inside the web process; set it to False and run
+# `python manage.py process_exports` to use a separate worker instead.
+# Jobs pending or running for longer than EXPORT_JOB_TIMEOUT seconds are
+# treated as failed and requested again.  Export files older than
+# EXPORT_MAX_AGE seconds are deleted after each finished export.
+EXPORT_DIR = BASE_DIR / 'cache' / 'exports'
+EXPORT_RUN_IN_PROCESS = True
+EXPORT_WORKERS = 1
+EXPORT_JOB_TIMEOUT = 1800
+EXPORT_MAX_AGE = 7 * 24 * 3600
+
+# Staff can add ?sql_profile=1 to a page to see its queries (dashboard/profiling.py).
+# A query shape run this many times in one request is flagged as a likely N+1.
+SQL_PROFILER_REPEAT_THRESHOLD = 3
+
+# Calendar dimension (dashboard/periods.py), filled by the migration and
+# by `build_calendar`, and extended automatically to sales dated outside
+# this range.  Run `build_calendar --rebuild` after changing the fiscal
+# year start month.
+CALENDAR_FIRST_YEAR = 2000
+CALENDAR_YEARS_AHEAD = 10
+FISCAL_YEAR_START_MONTH = 1
+
+
+# Cache, sessions and authentication
+#
+# SESSION_PROFILE picks where sessions live:
+#   'db'        - Django's default, one session query per request
+#   'cached_db' - read through the cache, database stays the source of truth
+#   'cache'     - cache only; sessions are lost when the cache is cleared
+# The 'auth' cache also holds the cached User rows (dashboard/auth.py).
+# LocMemCache is per process: use 'file' when running several worker
+# processes so that sessions and user invalidations are shared.
+SESSION_PROFILE = 'cached_db'
+AUTH_CACHE_BACKEND = 'locmem'   # 'locmem' or 'file'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dashboard-auth',
+    } if AUTH_CACHE_BACKEND == 'locmem' else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'auth',
+    },
+    # Shared by the web and management command processes
+    'backtests': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'backtests',
+    },
+}
+
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}[SESSION_PROFILE]
+SESSION_CACHE_ALIAS = 'auth'
+
+# CachedModelBackend serves request.user from the 'auth' cache.  Keep it
+# the only backend: the signup view calls login() without naming one.
+AUTHENTICATION_BACKENDS = ['dashboard.auth.CachedModelBackend']
+USER_CACHE_ALIAS = 'auth'
+USER_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators